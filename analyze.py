@@ -0,0 +1,238 @@
+# analyze.py
+"""
+Offline motion analysis of recorded footage with the configured detector.
+
+Each file is split into frame-range chunks that a process pool decodes and
+analyzes in parallel; the hits are then joined into events the way the
+live pipeline starts and extends clips, and written out as JSON or CSV.
+Settings come from the environment/.env like the live app, with
+command-line overrides.
+
+    python analyze.py footage/*.mp4 [--detector diff] [--motion-score 150000]
+                      [--set analysis_width=0 --set temporal_k=1] [--format csv] [--output events.csv]
+"""
+import os
+import sys
+import csv
+import json
+import math
+import time
+import argparse
+import dataclasses
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+from cameras import FRAME_PAIR_INTERVAL, _create_detector, _create_temporal_filter
+
+CHUNK_SECONDS = 60
+WARMUP_SECONDS = 2.0  # frames decoded before a chunk to prime the detector and temporal filter
+CSV_FIELDS = ("file", "start", "end", "duration", "peak_time", "peak_score", "hits", "zones", "boxes")
+
+
+def probe(path):
+    """Returns (fps, frame_count) for a video file, or None if it cannot be opened. frame_count may be 0."""
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None
+        return cap.get(cv2.CAP_PROP_FPS) or 30.0, max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    finally:
+        cap.release()
+
+
+def default_step(fps):
+    """Analyzes every Nth frame so compared frames are as far apart as in the live loop."""
+    return max(1, math.ceil(fps * FRAME_PAIR_INTERVAL - 1e-6))
+
+
+def plan_chunks(frame_count, fps, step, chunk_seconds=CHUNK_SECONDS):
+    """Splits [0, frame_count) into (start, end) ranges on step boundaries; an unknown count is one open chunk."""
+    if frame_count <= 0:
+        return [(0, None)]
+    size = max(step, int(fps * chunk_seconds) // step * step)
+    return [(start, min(start + size, frame_count)) for start in range(0, frame_count, size)]
+
+
+def analyze_chunk(path, start, end, settings, step, warmup):
+    """
+    Decodes frames [start, end) of path (end=None: to the end of the file)
+    and runs the detector and temporal filter on every step-th one. The
+    `warmup` frames before start are analyzed but not reported, so chunks
+    agree with a single pass. Returns the hit frames as (index, score,
+    confirmed, boxes, zone names) and the number of frames decoded.
+    """
+    cv2.setNumThreads(1)  # the pool already uses every core
+    cap = cv2.VideoCapture(path)
+    first = max(0, start - warmup)
+    first -= first % step
+    if first:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    detector = _create_detector(settings)
+    temporal = _create_temporal_filter(settings)
+    hits = []
+    index = first
+    try:
+        while end is None or index < end:
+            if index % step:
+                if not cap.grab():
+                    break
+                index += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            result = detector.analyze(frame)
+            index += 1
+            if result is None:
+                continue
+            zones = detector.fired_zones(result, settings.motion_score)
+            hit = bool(zones) if zones is not None else result.score > settings.motion_score
+            confirmed = temporal.update(hit)
+            if hit and index - 1 >= start:
+                hits.append((index - 1, float(result.score), confirmed, result.boxes, [z.name for z in zones or ()]))
+    finally:
+        detector.close()
+        cap.release()
+    return hits, index - first
+
+
+def build_events(path, fps, hits, gap):
+    """
+    Joins hit frames into events: one starts at a confirmed hit and is
+    extended by any hit less than `gap` seconds after its last one, like a
+    clip that keeps recording while motion continues.
+    """
+    events = []
+    current = None
+    for index, score, confirmed, boxes, zones in sorted(hits, key=lambda hit: hit[0]):
+        t = index / fps
+        if current is not None and t - current["end"] > gap:
+            current = None
+        if current is None:
+            if not confirmed:
+                continue
+            current = {"file": path, "start": t, "end": t, "peak_time": t, "peak_score": score, "hits": 0,
+                       "zones": [], "boxes": boxes}
+            events.append(current)
+        current["end"] = t
+        current["hits"] += 1
+        current["zones"].extend(zone for zone in zones if zone not in current["zones"])
+        if score > current["peak_score"]:
+            current["peak_time"], current["peak_score"], current["boxes"] = t, score, boxes
+    for event in events:
+        for key in ("start", "end", "peak_time"):
+            event[key] = round(event[key], 3)
+        event["duration"] = round(event["end"] - event["start"], 3)
+    return events
+
+
+def analyze_files(paths, settings, step=None, chunk_seconds=CHUNK_SECONDS, warmup_seconds=WARMUP_SECONDS,
+                  gap=None, workers=None):
+    """
+    Analyzes every file on a process pool and returns (events, summary).
+    step=None matches the live loop's frame spacing; gap defaults to
+    CLIP_POST_ROLL_SECONDS.
+    """
+    gap = settings.clip_post_roll_seconds if gap is None else gap
+    started = time.perf_counter()
+    plans = {}
+    for path in paths:
+        info = probe(path)
+        if info is None:
+            print(f"analyze: cannot open {path}; skipping it.", file=sys.stderr)
+            continue
+        fps, frame_count = info
+        file_step = step or default_step(fps)
+        plans[path] = (fps, file_step, plan_chunks(frame_count, fps, file_step, chunk_seconds))
+
+    hits = {path: [] for path in plans}
+    decoded = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=mp.get_context("spawn")) as pool:
+        futures = {}
+        for path, (fps, file_step, chunks) in plans.items():
+            warmup = max(int(fps * warmup_seconds), (settings.temporal_n + 1) * file_step)
+            for start, end in chunks:
+                futures[pool.submit(analyze_chunk, path, start, end, settings, file_step, warmup)] = path
+        for future, path in futures.items():
+            chunk_hits, chunk_frames = future.result()
+            hits[path].extend(chunk_hits)
+            decoded += chunk_frames
+
+    events = []
+    for path, (fps, _, _) in plans.items():
+        events.extend(build_events(path, fps, hits[path], gap))
+    elapsed = time.perf_counter() - started
+    summary = {"files": len(plans), "chunks": sum(len(chunks) for _, _, chunks in plans.values()),
+               "frames_decoded": decoded, "seconds": round(elapsed, 2),
+               "fps": round(decoded / elapsed, 1) if elapsed > 0 else 0.0, "events": len(events)}
+    return events, summary
+
+
+def write_events(events, fmt, stream):
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for event in events:
+            row = dict(event, zones=";".join(event["zones"]), boxes=json.dumps(event["boxes"]))
+            writer.writerow({key: row[key] for key in CSV_FIELDS})
+    else:
+        json.dump(events, stream, indent=2)
+        stream.write("\n")
+
+
+def parse_override(settings, assignment):
+    """Parses a --set key=value against the Settings fields; values are JSON, else plain strings."""
+    key, sep, raw = assignment.partition("=")
+    key = key.strip().lower()
+    if not sep or key not in {field.name for field in dataclasses.fields(settings)}:
+        raise ValueError(f"--set expects <setting>=<value> with a known setting, got '{assignment}'")
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        value = raw
+    if key == "motion_zones" and not isinstance(value, str):
+        value = json.dumps(value)
+    return key, value
+
+
+def main(argv=None):
+    from config import get_settings
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("files", nargs="+", help="video files to analyze")
+    parser.add_argument("--detector", help="MOTION_DETECTOR backend (diff, average, mog2, knn, tiled)")
+    parser.add_argument("--motion-score", type=int, help="MOTION_SCORE threshold")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="override any setting, e.g. analysis_width=0 (repeatable)")
+    parser.add_argument("--step", type=int, help="analyze every Nth frame (default: the live loop's spacing)")
+    parser.add_argument("--chunk-seconds", type=float, default=CHUNK_SECONDS, help="footage per pool task")
+    parser.add_argument("--gap", type=float, help="quiet seconds that end an event (default CLIP_POST_ROLL_SECONDS)")
+    parser.add_argument("--workers", type=int, help="processes (default: all cores)")
+    parser.add_argument("--format", choices=("json", "csv"), default="json")
+    parser.add_argument("--output", help="write events here instead of stdout")
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    try:
+        overrides = dict(parse_override(settings, assignment) for assignment in args.set)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.detector:
+        overrides["motion_detector"] = args.detector
+    if args.motion_score is not None:
+        overrides["motion_score"] = args.motion_score
+    settings = dataclasses.replace(settings, **overrides)
+
+    events, summary = analyze_files(args.files, settings, step=args.step, chunk_seconds=args.chunk_seconds,
+                                    gap=args.gap, workers=args.workers)
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            write_events(events, args.format, f)
+    else:
+        write_events(events, args.format, sys.stdout)
+    print(f"analyze: {summary['events']} events in {summary['files']} files; {summary['frames_decoded']} frames "
+          f"in {summary['seconds']}s ({summary['fps']} fps, {summary['chunks']} chunks).", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
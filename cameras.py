@@ -0,0 +1,430 @@
+# cameras.py
+import json
+import time
+import threading
+import dataclasses
+import cv2
+import tracelog as T
+from capture import FrameRingBuffer, CaptureThread
+from recorder import PreRollBuffer, Recorder, MB
+from motion import create_detector, TemporalFilter
+from zones import parse_zones
+from sources import open_source
+
+RING_BUFFER_FRAMES = 64
+FRAME_PAIR_INTERVAL = 0.05  # minimum spacing between the two frames that are compared
+CAPTURE_STATS_INTERVAL = 60
+DETECTOR_SETTINGS = {"motion_detector", "analysis_width", "pixel_threshold", "bg_alpha", "bg_history",
+                     "bg_var_threshold", "tile_size", "tile_workers", "illumination_shift",
+                     "illumination_coverage", "motion_zones", "temporal_k", "temporal_n"}
+CAMERA_MODE_SETTINGS = {"camera_width", "camera_height", "camera_fps"}
+
+
+class CameraSpec:
+    """One CAMERAS entry: a name, a VideoCapture source and per-camera settings overrides."""
+
+    __slots__ = ("name", "source", "overrides")
+
+    def __init__(self, name, source, overrides=None):
+        self.name = name
+        self.source = source
+        self.overrides = dict(overrides or {})
+
+    def __repr__(self):
+        return f"CameraSpec({self.name!r}, {self.source!r}, {sorted(self.overrides)})"
+
+
+def parse_cameras(spec):
+    """
+    Parses CAMERAS JSON, e.g.
+    [{"name": "porch", "source": 0},
+     {"name": "garage", "source": 2, "motion_score": 150000, "motion_zones": [...]}]
+    source is a device index or a path/URL (default: the entry's position).
+    Any other key overrides that setting for the camera. Returns [] for an
+    empty spec and logs (rather than raises) on malformed input.
+    """
+    from config import Settings
+    if not spec:
+        return []
+    fields = {field.name for field in dataclasses.fields(Settings)} - {"cameras"}
+    try:
+        entries = json.loads(spec) if isinstance(spec, str) else spec
+        cameras = []
+        for i, entry in enumerate(entries):
+            name = str(entry.get("name", f"camera{i}"))
+            overrides = {key.lower(): value for key, value in entry.items() if key not in ("name", "source")}
+            unknown = set(overrides) - fields
+            if unknown:
+                raise ValueError(f"camera '{name}': unknown setting(s) {', '.join(sorted(unknown))}")
+            if not isinstance(overrides.get("motion_zones", ""), str):
+                overrides["motion_zones"] = json.dumps(overrides["motion_zones"])
+            cameras.append(CameraSpec(name, entry.get("source", i), overrides))
+        names = [camera.name for camera in cameras]
+        if len(set(names)) != len(names):
+            raise ValueError("camera names must be unique")
+        return cameras
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        T.error(f"[📷] Ignoring invalid CAMERAS: {e}")
+        return []
+
+
+def thread_cpu_seconds(thread):
+    """CPU time a live thread has used, or None where per-thread clocks are unavailable."""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(thread.ident))
+    except (AttributeError, OSError, TypeError):
+        return None
+
+
+def _create_preroll(cap, settings):
+    """Sizes the pre-roll buffer for the camera's resolution, or returns None when disabled."""
+    return _preroll_for_resolution(settings, int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640,
+                                   int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480, cap.get(cv2.CAP_PROP_FPS) or 30.0)
+
+
+def _preroll_for_resolution(settings, width, height, fps):
+    seconds = settings.pre_roll_seconds
+    if seconds <= 0:
+        T.info("[⏪] Pre-roll disabled.")
+        return None
+    return PreRollBuffer.for_resolution(
+        width, height, fps, seconds,
+        max_bytes=settings.pre_roll_max_mb * MB,
+        scale=settings.pre_roll_scale,
+        jpeg_quality=settings.pre_roll_jpeg_quality,
+    )
+
+
+def _create_detector(settings):
+    """Builds the configured detector backend; ANALYSIS_WIDTH=0 analyzes full-resolution frames."""
+    name = settings.motion_detector
+    common = {"width": settings.analysis_width, "illumination_shift": settings.illumination_shift,
+              "illumination_coverage": settings.illumination_coverage}
+    params = dict(common)
+    if name in ("diff", "average", "tiled"):
+        params["pixel_threshold"] = settings.pixel_threshold
+    if name == "average":
+        params["alpha"] = settings.bg_alpha
+    elif name == "tiled":
+        params["tile"] = settings.tile_size
+        params["workers"] = settings.tile_workers
+    elif name in ("mog2", "knn"):
+        params["history"] = settings.bg_history
+        params["var_threshold"] = settings.bg_var_threshold
+    zones = parse_zones(settings.motion_zones)
+    try:
+        detector = create_detector(name, zones=zones, **params)
+    except ValueError as e:
+        T.error(f"{e}. Falling back to frame diff.")
+        name, detector = "diff", create_detector("diff", zones=zones, **common)
+    width = params["width"]
+    T.info(f"[🔍] Motion detector '{name}' at {f'{width}px wide' if width else 'full resolution'}"
+           f"{f', {len(zones)} zones' if zones else ''}.")
+    return detector
+
+
+def _configure_recorder(recorder, settings):
+    """Applies clip length and writer settings to a recorder; a clip in progress keeps its writer."""
+    recorder.min_seconds = settings.clip_min_seconds
+    recorder.post_roll_seconds = settings.clip_post_roll_seconds
+    recorder.max_seconds = settings.clip_max_seconds
+    recorder.backend = settings.recorder_backend
+    recorder.encoder_options = CameraPipeline._encoder_options(settings)
+
+
+def _create_temporal_filter(settings):
+    """Builds the K-of-N event filter; invalid settings fall back to firing on every hit."""
+    try:
+        temporal = TemporalFilter(settings.temporal_k, settings.temporal_n)
+    except ValueError as e:
+        T.error(f"{e}. Temporal filter disabled.")
+        temporal = TemporalFilter(1, 1)
+    T.info(f"[🔍] Events need {temporal.k} of the last {temporal.n} analyzed frames in motion.")
+    return temporal
+
+
+class CameraPipeline:
+    """
+    One camera's capture thread, frame ring, pre-roll, recorder, detector,
+    temporal filter and cooldown.
+
+    Nothing is shared between pipelines except the callbacks, so cameras
+    never wait on each other: run() is the analysis loop and runs on the
+    caller's thread (start() gives it its own). Settings are the shared
+    ones with the camera's overrides applied, re-derived whenever the
+    shared settings are reloaded.
+
+    on_motion(recorder, cooldown, frame, confidence, result, zones, camera)
+    starts an event and returns True if it did; on_clip and on_frame are
+    handed to the recorder. Given the source cap was opened from, capture
+    reopens it in place after sustained read failures and reports each
+    outage through on_camera_status(camera, connected, incident).
+    """
+
+    def __init__(self, name, cap, overrides=None, on_motion=None, on_clip=None, on_frame=None, clips_dir="clips",
+                 source=None, on_camera_status=None):
+        self.name = name
+        self.cap = cap
+        self.source = source
+        self.overrides = dict(overrides or {})
+        self.on_motion = on_motion
+        self.on_clip = on_clip
+        self.on_frame = on_frame
+        self.on_camera_status = on_camera_status
+        self.clips_dir = clips_dir
+        self.ring = None
+        self.capture = None
+        self.preroll = None
+        self.recorder = None
+        self.detector = None
+        self.temporal = None
+        self.last_result = None  # (timestamp, MotionResult) of the latest frame with boxes
+        self.last_alert_time = 0
+        self.suppressed = 0  # motion seen while in cooldown
+        self._base = None
+        self._settings = None
+        self._thread = None
+        self._analysis_thread = None
+        self._cpu_mark = None
+
+    def settings(self):
+        """Returns the shared settings with this camera's overrides applied."""
+        from config import get_settings
+        base = get_settings()
+        if base is not self._base:
+            self._base = base
+            self._settings = dataclasses.replace(base, **self.overrides) if self.overrides else base
+        return self._settings
+
+    def start(self):
+        """Starts capture and recording. Call once, before run()."""
+        settings = self.settings()
+        self.ring = FrameRingBuffer(RING_BUFFER_FRAMES)
+        self.capture = CaptureThread(self.cap, self.ring, name=f"Capture-{self.name}", luma=settings.capture_luma,
+                                     reopen=self._reopen if self.source is not None else None,
+                                     on_connection=self._on_connection,
+                                     reconnect_after=settings.reconnect_after_seconds,
+                                     reconnect_max_delay=settings.reconnect_max_delay)
+        self.capture.request_mode(settings.camera_width, settings.camera_height, settings.camera_fps)
+        self.capture.start()
+        self.preroll = _create_preroll(self.cap, settings)
+        self.recorder = Recorder(
+            self.ring,
+            preroll=self.preroll,
+            min_seconds=settings.clip_min_seconds,
+            post_roll_seconds=settings.clip_post_roll_seconds,
+            max_seconds=settings.clip_max_seconds,
+            backend=settings.recorder_backend,
+            encoder_options=self._encoder_options(settings),
+            fps_source=lambda: self.capture.fps if self.capture is not None else 0,
+            on_clip=self.on_clip,
+            on_frame=self.on_frame,
+            clips_dir=self.clips_dir,
+            name=f"Recorder-{self.name}",
+        )
+        self.recorder.start()
+        self.detector = _create_detector(settings)
+        self.temporal = _create_temporal_filter(settings)
+        T.info(f"[📷] Camera '{self.name}' pipeline started.")
+
+    def start_thread(self, active_event):
+        """Runs the analysis loop on its own thread. Returns the thread."""
+        self._thread = threading.Thread(target=self.run, args=(active_event,), name=f"Camera-{self.name}",
+                                        daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _reopen(self):
+        """Opens a fresh capture of this camera's source for the capture thread's reconnect."""
+        settings = self.settings()
+        self.cap = open_source(self.source, settings.source_realtime, settings.source_loop)
+        return self.cap
+
+    def _on_connection(self, connected, incident=None):
+        if self.on_camera_status is not None:
+            self.on_camera_status(self.name, connected, incident)
+
+    @staticmethod
+    def _encoder_options(settings):
+        return {"codec": settings.recorder_codec, "preset": settings.recorder_preset, "crf": settings.recorder_crf}
+
+    def _apply_settings(self, old, new):
+        """Applies a settings reload without reopening the camera. Returns True if the detector changed."""
+        changes = old.diff(new)
+        if changes.keys() & CAMERA_MODE_SETTINGS:
+            self.capture.request_mode(new.camera_width, new.camera_height, new.camera_fps)
+        self.capture.reconnect_after = new.reconnect_after_seconds
+        self.capture.reconnect_max_delay = new.reconnect_max_delay
+        _configure_recorder(self.recorder, new)
+        if changes.keys() & DETECTOR_SETTINGS:
+            self.detector.close()
+            self.detector = _create_detector(new)
+            self.temporal = _create_temporal_filter(new)
+            return True
+        return False
+
+    def run(self, active_event):
+        """The motion detection loop for this camera; returns when active_event clears or capture dies."""
+        self._analysis_thread = threading.current_thread()
+        settings = self.settings()
+        reader = self.ring.reader("analysis")
+        previous = None
+        last_stats_ts = time.time()
+        try:
+            while active_event.is_set():
+                current_settings = self.settings()
+                if current_settings is not settings:
+                    if self._apply_settings(settings, current_settings):
+                        previous = None
+                    settings = current_settings
+                if self.cap is None or not hasattr(self.cap, 'read'):
+                    T.error(f"[📷] Camera '{self.name}' lost or invalid. Exiting its detection loop.")
+                    break
+                if not self.capture.is_alive():
+                    if self.capture.ended:
+                        T.info(f"[📷] Source for '{self.name}' ended. Exiting its detection loop.")
+                    else:
+                        T.error(f"[📷] Capture thread for '{self.name}' is not running. Exiting its detection loop.")
+                    break
+
+                current = reader.wait_latest(timeout=1.0)
+                if current is None:
+                    continue
+                if previous is None:
+                    previous = current
+                    self.detector.score(current[2])  # prime the reference frame
+                    continue
+
+                gap = current[1] - previous[1]
+                if gap < FRAME_PAIR_INTERVAL:
+                    # Keep at least the old 50 ms spacing between compared frames
+                    time.sleep(FRAME_PAIR_INTERVAL - gap)
+                    continue
+                previous = current
+
+                if time.time() - last_stats_ts >= CAPTURE_STATS_INTERVAL:
+                    last_stats_ts = time.time()
+                    T.debug(f"[📷] Camera '{self.name}' stats: {self.stats()}")
+
+                self._analyze(current, settings)
+        finally:
+            self.stop()
+
+    def _analyze(self, entry, settings):
+        _, timestamp, frame = entry
+        result = self.detector.analyze(frame)
+        if result is None:
+            return
+        score = result.score
+        if result.boxes:
+            self.last_result = (timestamp, result)
+        recording = self.recorder.is_recording
+        if recording:
+            # Track peak-motion frames for the clip's poster and thumbnail
+            self.recorder.observe(score, frame, timestamp)
+
+        # With include zones, each zone is judged by its own threshold; otherwise the whole frame is
+        zones = self.detector.fired_zones(result, settings.motion_score)
+        hit = bool(zones) if zones is not None else score > settings.motion_score
+        confirmed = self.temporal.update(hit)
+        if not hit:
+            return
+        T.info(f"[DEBUG] Motion detected ({self.name})")
+        now = time.time()
+        cooldown = settings.cooldown
+
+        if recording:
+            self.recorder.notify_motion(now)
+            T.info(f"[🎥] Motion continues on '{self.name}' — extending current clip.")
+        elif not confirmed:
+            T.debug(f"[🔍] Motion candidate on '{self.name}' at {self.temporal.confidence:.0%} — "
+                    f"waiting for {self.temporal.k} of {self.temporal.n} frames.")
+        elif (now - self.last_alert_time) > cooldown:
+            snapshot = frame if settings.snapshot_alerts else None
+            if self.on_motion and self.on_motion(self.recorder, cooldown, snapshot, self.temporal.confidence,
+                                                 result, zones, self.name):
+                self.recorder.observe(score, frame, timestamp)
+                self.last_alert_time = now
+                T.info(f"[✔] Motion recording started on '{self.name}' ({self.temporal.confidence:.0%} confidence"
+                       f"{', zones ' + ', '.join(z.name for z in zones) if zones else ''}). Cooldown started.")
+        else:
+            # Cooldown active: keep scoring and logging so nothing goes unseen
+            self.suppressed += 1
+            T.info(f"[⏳] Motion detected on '{self.name}' but cooldown is active "
+                   f"({cooldown - (now - self.last_alert_time):.0f}s left).")
+
+    def stop(self):
+        """Stops recording and capture. The camera device itself is released by its owner."""
+        if self.recorder is not None:
+            self.recorder.stop()
+        if self.detector is not None:
+            self.detector.close()
+        if self.capture is not None:
+            self.capture.stop()
+
+    def detection_stats(self):
+        """Temporal filter counts, detector (illumination, tile) counts and cooldown suppressions."""
+        stats = self.temporal.stats() if self.temporal is not None else {}
+        if self.detector is not None:
+            stats.update(self.detector.stats())
+        stats["cooldown_suppressed"] = self.suppressed
+        return stats
+
+    def resource_stats(self):
+        """
+        CPU used by this camera's capture, analysis and recorder threads since
+        the last call (percent of one core), and memory held in its frame
+        ring and pre-roll, for sizing hardware per camera.
+        """
+        threads = [t for t in (self.capture, self._analysis_thread, self.recorder) if t is not None and t.is_alive()]
+        cpu = [thread_cpu_seconds(t) for t in threads]
+        now = time.monotonic()
+        stats = {"memory_mb": round(((self.ring.nbytes if self.ring else 0) +
+                                     (self.preroll.nbytes if self.preroll else 0)) / MB, 1)}
+        if cpu and None not in cpu:
+            total = sum(cpu)
+            if self._cpu_mark is not None and now > self._cpu_mark[0]:
+                stats["cpu_percent"] = round(100 * max(0.0, total - self._cpu_mark[1]) / (now - self._cpu_mark[0]), 1)
+            self._cpu_mark = (now, total)
+        return stats
+
+    def stats(self):
+        stats = {"capture": self.capture.stats() if self.capture is not None else None,
+                 "detection": self.detection_stats(),
+                 "preroll": self.preroll.stats() if self.preroll is not None else None}
+        stats.update(self.resource_stats())
+        return stats
+
+
+def format_stats(name, stats):
+    """
+    Human-readable lines for one camera's stats(), for the /status reply:
+    frame counters and outages, CPU and memory, pre-roll, and what the
+    temporal filter, lighting check and cooldown kept from firing.
+    """
+    lines = []
+    capture = stats.get("capture") or {}
+    if capture:
+        dropped = capture.get("dropped", stats.get("analysis_dropped", 0))
+        line = (f"🎥 {name}: {capture.get('fps', 0):.1f} fps, {capture.get('produced', 0)} frames, "
+                f"{dropped} dropped")
+        if capture.get("outages"):
+            line += f", {capture['outages']} outages ({capture.get('downtime_seconds', 0):.0f}s down)"
+        lines.append(line)
+    else:
+        lines.append(f"🎥 {name}: capture not running")
+    resources = [f"memory {stats.get('memory_mb', 0):.0f} MB"]
+    if stats.get("cpu_percent") is not None:
+        resources.insert(0, f"CPU {stats['cpu_percent']:.0f}%")
+    preroll = stats.get("preroll")
+    if preroll:
+        resources.append(f"pre-roll {preroll['bytes'] / MB:.0f} MB ({preroll['seconds']:.1f}s)")
+    lines.append("   " + " · ".join(resources))
+    detection = stats.get("detection") or {}
+    lines.append(f"   events {detection.get('fired', 0)}, rejected {detection.get('rejected', 0)} (encodes saved)"
+                 f" · lighting ignored {detection.get('illumination_rate', 0.0):.1%}"
+                 f" · cooldown suppressed {detection.get('cooldown_suppressed', 0)}")
+    return lines
@@ -0,0 +1,374 @@
+# capture.py
+import time
+import threading
+import cv2
+import tracelog as T
+from sources import FrameSource
+
+RECONNECT_AFTER_SECONDS = 3.0  # sustained read failures before the device is reopened
+RECONNECT_MAX_DELAY = 30.0  # cap on the doubling wait between reopen attempts
+
+
+def is_yuyv(frame):
+    """True for packed YUYV (Y0 U Y1 V) frames from a luma-mode capture: two channels, luma in the first."""
+    return frame.ndim == 3 and frame.shape[2] == 2
+
+
+def to_bgr(frame):
+    """Returns frame as BGR, converting packed YUYV; BGR frames are returned unchanged."""
+    return cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_YUYV) if is_yuyv(frame) else frame
+
+
+class FrameRingBuffer:
+    """
+    Fixed-size ring of timestamped frames written by a single capture thread.
+
+    The producer writes a slot and then publishes it by bumping the sequence
+    counter, so readers never take a lock: a slot whose stored sequence does
+    not match the one a reader expects has been overwritten and is counted
+    as dropped for that reader.
+    """
+
+    def __init__(self, capacity=64):
+        if capacity < 2:
+            raise ValueError("Ring buffer capacity must be at least 2 frames.")
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._next_seq = 0
+        self.produced = 0
+        self._readers = []
+
+    @property
+    def next_seq(self):
+        return self._next_seq
+
+    def push(self, frame, timestamp=None):
+        """Stores a frame and publishes it to readers. Producer thread only."""
+        seq = self._next_seq
+        if timestamp is None:
+            timestamp = time.time()
+        self._slots[seq % self.capacity] = (seq, timestamp, frame)
+        self._next_seq = seq + 1  # publish after the slot is fully written
+        self.produced += 1
+
+    def get(self, seq):
+        """Returns the (seq, timestamp, frame) entry for seq, or None if it was overwritten."""
+        entry = self._slots[seq % self.capacity]
+        if entry is None or entry[0] != seq:
+            return None
+        return entry
+
+    def latest(self):
+        """Returns the newest entry without consuming it, or None if empty."""
+        seq = self._next_seq - 1
+        if seq < 0:
+            return None
+        return self.get(seq)
+
+    @property
+    def nbytes(self):
+        """Memory held by the frames currently in the ring."""
+        return sum(getattr(slot[2], "nbytes", 0) for slot in list(self._slots) if slot is not None)
+
+    def reader(self, name):
+        """Creates a consumer cursor positioned at the next frame to be written."""
+        r = FrameReader(self, name)
+        self._readers.append(r)
+        return r
+
+    def stats(self):
+        """Returns produced/consumed/dropped counters for the buffer and each reader."""
+        readers = {r.name: {"consumed": r.consumed, "dropped": r.dropped} for r in list(self._readers)}
+        return {
+            "capacity": self.capacity,
+            "produced": self.produced,
+            "consumed": sum(r["consumed"] for r in readers.values()),
+            "dropped": sum(r["dropped"] for r in readers.values()),
+            "readers": readers,
+        }
+
+
+class FrameReader:
+    """Independent read cursor into a FrameRingBuffer."""
+
+    def __init__(self, ring, name):
+        self._ring = ring
+        self.name = name
+        self._cursor = ring.next_seq
+        self.consumed = 0
+        self.dropped = 0
+
+    def _skip_to(self, seq):
+        if seq > self._cursor:
+            self.dropped += seq - self._cursor
+            self._cursor = seq
+
+    def skip_to_head(self):
+        """Repositions the cursor at the next frame to be written without counting drops."""
+        self._cursor = self._ring.next_seq
+
+    def read_new(self):
+        """Returns every unread entry still in the ring, oldest first."""
+        head = self._ring.next_seq
+        self._skip_to(head - self._ring.capacity)
+        entries = []
+        while self._cursor < head:
+            entry = self._ring.get(self._cursor)
+            self._cursor += 1
+            if entry is None:
+                self.dropped += 1
+                continue
+            entries.append(entry)
+        self.consumed += len(entries)
+        return entries
+
+    def read_latest(self):
+        """Returns the newest unread entry, skipping (and counting) older ones."""
+        head = self._ring.next_seq
+        if head <= self._cursor:
+            return None
+        self._skip_to(head - 1)
+        entry = self._ring.get(self._cursor)
+        self._cursor += 1
+        if entry is None:
+            self.dropped += 1
+            return None
+        self.consumed += 1
+        return entry
+
+    def wait_latest(self, timeout=1.0, poll_interval=0.005):
+        """Blocks until a new entry is available and returns the newest one, or None on timeout."""
+        deadline = time.time() + timeout
+        while True:
+            entry = self.read_latest()
+            if entry is not None or time.time() >= deadline:
+                return entry
+            time.sleep(poll_interval)
+
+    def wait_new(self, timeout=1.0, poll_interval=0.005):
+        """Blocks until at least one new entry is available and returns all unread entries."""
+        deadline = time.time() + timeout
+        while True:
+            entries = self.read_new()
+            if entries or time.time() >= deadline:
+                return entries
+            time.sleep(poll_interval)
+
+
+class CaptureThread(threading.Thread):
+    """
+    Owns a cv2.VideoCapture-like source and pushes every frame into a ring buffer.
+
+    cap.read() blocks at the camera's native rate, and no consumer work ever
+    runs on this thread, so slow analysis or recording cannot stall capture.
+    Mode changes requested with request_mode() are applied here between
+    reads, since VideoCapture is not safe to reconfigure from another thread.
+
+    With luma=True the device is asked for YUYV and OpenCV's BGR conversion
+    is turned off, so the ring carries packed YUYV frames: the detector reads
+    the Y plane directly and only frames that are recorded or sent are
+    converted with to_bgr(). Drivers that refuse keep delivering BGR, which
+    every consumer also accepts.
+
+    A FrameSource (file replay, image folder, synthetic scene) supplies its
+    own frame timestamps, and the thread exits with `ended` set once a
+    non-looping source runs out.
+
+    When reads keep failing for reconnect_after seconds and a reopen()
+    callable is given, the device is released and reopened in place, with
+    the wait between attempts doubling up to reconnect_max_delay, so a USB
+    hiccup never takes the detection loop down. on_connection(False, None)
+    is called when the outage starts and on_connection(recovered, incident)
+    when it ends: once frames flow again, or (recovered=False) when the
+    thread is stopped first. Each incident (started_at, ended_at, downtime,
+    attempts, recovered) is also kept in `last_outage` and counted in stats().
+    """
+
+    def __init__(self, cap, ring, name="CaptureThread", luma=False, reopen=None, on_connection=None,
+                 reconnect_after=RECONNECT_AFTER_SECONDS, reconnect_max_delay=RECONNECT_MAX_DELAY):
+        super().__init__(name=name, daemon=True)
+        self.cap = cap
+        self.ring = ring
+        self.luma = luma
+        self.reopen = reopen
+        self.on_connection = on_connection
+        self.reconnect_after = reconnect_after
+        self.reconnect_max_delay = reconnect_max_delay
+        self._raw_size = None  # (width, height) for reshaping flat YUYV buffers
+        self._mode = None  # last applied mode, re-applied after a reconnect
+        self.read_failures = 0
+        self.fps = 0.0
+        self.ended = False
+        self.outages = 0
+        self.downtime = 0.0
+        self.last_outage = None
+        self._pending_mode = None
+        self._stop_event = threading.Event()
+
+    def request_mode(self, width=0, height=0, fps=0):
+        """Asks for a new resolution and/or frame rate; 0 leaves that property unchanged."""
+        if width or height or fps:
+            self._pending_mode = (width, height, fps)
+
+    def _apply_mode(self, mode):
+        self._mode = mode
+        width, height, fps = mode
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        T.info(f"[📷] Camera mode requested {width or '-'}x{height or '-'} @ {fps or '-'} fps; driver reports "
+               f"{int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))}x{int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))} @ "
+               f"{self.cap.get(cv2.CAP_PROP_FPS):.0f} fps")
+        if self.luma:
+            self._raw_size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def _enable_luma(self):
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"YUYV"))
+        self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        self._raw_size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def _unpack(self, frame):
+        """Some backends hand unconverted YUYV over as one flat row; give it its (h, w, 2) shape."""
+        if frame.ndim == 2 and frame.shape[0] == 1 and self._raw_size:
+            width, height = self._raw_size
+            if frame.size == width * height * 2:
+                return frame.reshape(height, width, 2)
+        return frame
+
+    def _notify(self, connected, incident=None):
+        if self.on_connection is None:
+            return
+        try:
+            self.on_connection(connected, incident)
+        except Exception as e:
+            T.error(f"[📷] Connection status callback failed: {e}")
+
+    def _reopen_once(self):
+        """Releases the current device and opens a fresh one. Returns True once it delivers a frame."""
+        try:
+            self.cap.release()
+        except Exception:
+            pass
+        cap = self.reopen()
+        if cap is None or not cap.isOpened():
+            return False
+        self.cap = cap
+        if self.luma:
+            self._enable_luma()
+        if self._mode is not None:
+            self._apply_mode(self._mode)
+        ret, frame = cap.read()
+        return ret and frame is not None
+
+    def _reconnect(self, since):
+        """Reopens the device with exponential backoff until it delivers frames or the thread is stopped."""
+        T.error(f"[📷] {self.name}: no frames for {time.time() - since:.0f}s; reconnecting the camera.")
+        self._notify(False)
+        delay = min(1.0, self.reconnect_max_delay)
+        attempts = 0
+        recovered = False
+        while not self._stop_event.is_set():
+            attempts += 1
+            try:
+                recovered = self._reopen_once()
+            except Exception as e:
+                T.warning(f"[📷] {self.name}: reopen failed: {e}")
+            if recovered:
+                break
+            T.warning(f"[📷] {self.name}: reconnect attempt {attempts} failed; retrying in {delay:.0f}s.")
+            self._stop_event.wait(delay)
+            delay = min(delay * 2, self.reconnect_max_delay)
+
+        ended_at = time.time()
+        incident = {"started_at": since, "ended_at": ended_at, "downtime": round(ended_at - since, 1),
+                    "attempts": attempts, "recovered": recovered}
+        self.outages += 1
+        self.downtime += ended_at - since
+        self.last_outage = incident
+        if recovered:
+            T.info(f"[📷] {self.name}: camera reconnected after {incident['downtime']:.1f}s "
+                   f"({attempts} attempt{'s' if attempts != 1 else ''}).")
+        self._notify(recovered, incident)
+        return recovered
+
+    def run(self):
+        T.info(f"[📷] {self.name} started.")
+        if self.luma:
+            try:
+                self._enable_luma()
+            except Exception as e:
+                T.error(f"[📷] Luma capture unavailable: {e}")
+                self.luma = False
+        checked_format = not self.luma
+        last_ts = None
+        failing_since = None
+        while not self._stop_event.is_set():
+            mode, self._pending_mode = self._pending_mode, None
+            if mode is not None:
+                try:
+                    self._apply_mode(mode)
+                except Exception as e:
+                    T.error(f"[📷] Camera mode change failed: {e}")
+            try:
+                ret, frame = self.cap.read()
+            except Exception as e:
+                # A vanished device can raise instead of returning False; treat it as a failed read
+                T.warning(f"[📷] {self.name}: read failed: {e}")
+                ret, frame = False, None
+            now = time.time()
+            if isinstance(self.cap, FrameSource):
+                if self.cap.ended:
+                    self.ended = True
+                    T.info(f"[📷] {self.name}: source ended after {self.cap.frames_read} frames.")
+                    break
+                now = self.cap.timestamp or now
+            if not ret or frame is None:
+                self.read_failures += 1
+                if failing_since is None:
+                    failing_since = now
+                elif self.reopen is not None and now - failing_since >= self.reconnect_after:
+                    if self._reconnect(failing_since):
+                        checked_format = not self.luma
+                        last_ts = None
+                    failing_since = None
+                    continue
+                time.sleep(0.1)
+                continue
+            failing_since = None
+            if self.luma:
+                frame = self._unpack(frame)
+                if not checked_format:
+                    checked_format = True
+                    if is_yuyv(frame):
+                        T.info("[📷] Luma capture active: analyzing the Y plane of YUYV frames.")
+                    elif frame.ndim == 2 and frame.shape[0] == 1:
+                        # Raw buffer in a format we cannot unpack (e.g. MJPEG): let OpenCV decode again
+                        T.warning(f"[📷] Driver did not deliver YUYV (raw buffer {frame.shape}); using BGR.")
+                        self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+                        self.luma = False
+                        continue
+                    else:
+                        T.warning(f"[📷] Driver ignored the YUYV request (frame shape {frame.shape}); using BGR.")
+            self.ring.push(frame, now)
+            if last_ts is not None and now > last_ts:
+                # Exponential moving average of the delivered frame rate
+                inst = 1.0 / (now - last_ts)
+                self.fps = inst if self.fps == 0.0 else 0.9 * self.fps + 0.1 * inst
+            last_ts = now
+        T.info(f"[📷] {self.name} stopped.")
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=timeout)
+
+    def stats(self):
+        stats = self.ring.stats()
+        stats["fps"] = round(self.fps, 2)
+        stats["read_failures"] = self.read_failures
+        stats["outages"] = self.outages
+        stats["downtime_seconds"] = round(self.downtime, 1)
+        return stats
@@ -1,13 +1,26 @@
 # config.py
 
 import os
-from dotenv import load_dotenv
+import time
+import threading
+from dataclasses import dataclass, fields
+from typing import Optional
+from dotenv import load_dotenv, dotenv_values
+import tracelog as T
 
-def load_config():
-    # Determine .env path
+
+def find_dotenv_path():
+    """Returns the local .env, or the installed one when the working directory has none."""
     dotenv_path = os.path.join(os.getcwd(), ".env")
     if not os.path.exists(dotenv_path):
+        # Fallback for when the .desktop file's Path setting is ignored or failed
         dotenv_path = "/opt/motion-detector/.env"
+    return dotenv_path
+
+
+def load_config():
+    # Determine .env path
+    dotenv_path = find_dotenv_path()
 
     load_dotenv(dotenv_path=dotenv_path)
 
@@ -20,8 +33,93 @@ def load_config():
     fastmail_email = os.getenv("FASTMAIL_EMAIL")
     fastmail_password = os.getenv("FASTMAIL_APP_PASSWORD")
     fastmail_recipient = os.getenv("FASTMAIL_RECIPIENT")
+    from_email = os.getenv("FROM_EMAIL") or fastmail_email
+    app_password = os.getenv("APP_PASSWORD") or fastmail_password
     cooldown_seconds = int(os.getenv("COOLDOWN_SECONDS", "30"))
-    motion_score = int(os.getenv("MOTION_SCORE", "5000"))
+    # Detector score (255 per changed full-resolution pixel) above which a frame counts as motion
+    motion_score = int(os.getenv("MOTION_SCORE", "200000"))
+
+    # Camera mode requested from the driver; 0 keeps the device default
+    camera_width = int(os.getenv("CAMERA_WIDTH", "0"))
+    camera_height = int(os.getenv("CAMERA_HEIGHT", "0"))
+    camera_fps = int(os.getenv("CAMERA_FPS", "0"))
+    # Reconnect: reopen the camera after this many seconds without frames, retrying with doubling waits up to the max
+    reconnect_after_seconds = float(os.getenv("RECONNECT_AFTER_SECONDS", "3"))
+    reconnect_max_delay = float(os.getenv("RECONNECT_MAX_DELAY", "30"))
+    # Default source: device index, video file, image folder or "synthetic[:{json}]" (see sources.py);
+    # non-camera sources play at their frame rate unless SOURCE_REALTIME=false, and stop at the end unless SOURCE_LOOP.
+    # A fast (non-realtime) replay keeps clip length and cooldown on the wall clock; use it for detector tuning only.
+    camera_source = os.getenv("CAMERA_SOURCE", "0").strip() or "0"
+    source_realtime = os.getenv("SOURCE_REALTIME", "true").lower() == "true"
+    source_loop = os.getenv("SOURCE_LOOP", "false").lower() == "true"
+    # Cameras: JSON list of {"name", "source": index or path/URL, <setting>: override}; empty = device 0 only
+    cameras = os.getenv("CAMERAS", "").strip()
+    # Luma capture: request YUYV and analyze its Y plane; only recorded/sent frames are converted to BGR
+    capture_luma = os.getenv("CAPTURE_LUMA", "false").lower() == "true"
+    # Pipeline mode: "threads" runs every stage in this process, "processes" gives each camera's capture,
+    # analysis and recording their own process, exchanging frames through shared memory
+    pipeline_mode = os.getenv("PIPELINE_MODE", "threads").strip().lower()
+
+    # Motion analysis: frames are downscaled to this width (0 = full resolution) before diffing
+    analysis_width = int(os.getenv("ANALYSIS_WIDTH", "320"))
+
+    # Detector backend: "diff" (frame pairs), "average" (running average), "mog2" or "knn" (OpenCV subtractors),
+    # "tiled" (coarse pass at ANALYSIS_WIDTH, changed TILE_SIZE tiles re-checked at full resolution)
+    motion_detector = os.getenv("MOTION_DETECTOR", "diff").strip().lower()
+    pixel_threshold = int(os.getenv("PIXEL_THRESHOLD", "20"))
+    bg_alpha = float(os.getenv("BG_ALPHA", "0.05"))
+    bg_history = int(os.getenv("BG_HISTORY", "500"))
+    bg_var_threshold_raw = os.getenv("BG_VAR_THRESHOLD", "").strip()
+    bg_var_threshold = float(bg_var_threshold_raw) if bg_var_threshold_raw else None
+    tile_size = int(os.getenv("TILE_SIZE", "256"))
+    tile_workers = int(os.getenv("TILE_WORKERS", "4"))
+
+    # Lighting: a mean gray-level jump of at least SHIFT across COVERAGE of the frame is ignored (0 = off)
+    illumination_shift = float(os.getenv("ILLUMINATION_SHIFT", "10"))
+    illumination_coverage = float(os.getenv("ILLUMINATION_COVERAGE", "0.8"))
+
+    # Temporal filter: an event needs K of the last N analyzed frames above MOTION_SCORE (1 of 1 = off)
+    temporal_k = int(os.getenv("TEMPORAL_K", "3"))
+    temporal_n = int(os.getenv("TEMPORAL_N", "5"))
+
+    # Zones: JSON list of {"name", "type": "include"|"exclude", "points": [[x, y], ...]} in 0..1 coordinates
+    motion_zones = os.getenv("MOTION_ZONES", "").strip()
+
+    # Pre-roll: seconds of history flushed into each clip; JPEG quality unset = auto, 0 = raw
+    pre_roll_seconds = float(os.getenv("PRE_ROLL_SECONDS", "5"))
+    pre_roll_max_mb = int(os.getenv("PRE_ROLL_MAX_MB", "256"))
+    pre_roll_scale = float(os.getenv("PRE_ROLL_SCALE", "1.0"))
+    pre_roll_jpeg_raw = os.getenv("PRE_ROLL_JPEG_QUALITY", "").strip()
+    pre_roll_jpeg_quality = int(pre_roll_jpeg_raw) if pre_roll_jpeg_raw else None
+
+    # Clip length: at least min, extended while motion continues, cut after post-roll quiet or at max
+    clip_min_seconds = float(os.getenv("CLIP_MIN_SECONDS", "5"))
+    clip_post_roll_seconds = float(os.getenv("CLIP_POST_ROLL_SECONDS", "5"))
+    clip_max_seconds = float(os.getenv("CLIP_MAX_SECONDS", "120"))
+
+    # Recorder backend: "ffmpeg" streams frames straight into an MP4, "opencv" writes AVI then re-encodes
+    recorder_backend = os.getenv("RECORDER_BACKEND", "ffmpeg").strip().lower()
+    recorder_codec = os.getenv("RECORDER_CODEC", "libx264")
+    recorder_preset = os.getenv("RECORDER_PRESET", "veryfast")
+    recorder_crf = int(os.getenv("RECORDER_CRF", "23"))
+
+    # Encode service: concurrent ffmpeg encodes and how many jobs may wait before backpressure applies
+    encode_workers = int(os.getenv("ENCODE_WORKERS", "2"))
+    encode_queue_size = int(os.getenv("ENCODE_QUEUE_SIZE", "8"))
+
+    # Two-tier encoding: a small ultrafast rendition for alerts now, the full-quality archive at idle time
+    two_tier_encoding = os.getenv("TWO_TIER_ENCODING", "true").lower() == "true"
+    alert_width = int(os.getenv("ALERT_WIDTH", "640"))
+    alert_preset = os.getenv("ALERT_PRESET", "ultrafast")
+    alert_crf = int(os.getenv("ALERT_CRF", "28"))
+    archive_preset = os.getenv("ARCHIVE_PRESET", "medium")
+
+    # Snapshot alerts: send the triggering frame via Telegram sendPhoto before the clip is ready
+    snapshot_alerts = os.getenv("SNAPSHOT_ALERTS", "true").lower() == "true"
+
+    # Event index: SQLite file for events/clips, and how long its rows outlive the clips themselves
+    events_db = os.getenv("EVENTS_DB", "events.db")
+    event_retention_days = int(os.getenv("EVENT_RETENTION_DAYS", "365"))
 
 
     return {
@@ -31,8 +129,232 @@ def load_config():
         "FASTMAIL_EMAIL": fastmail_email,
         "FASTMAIL_PASSWORD": fastmail_password,
         "FASTMAIL_RECIPIENT": fastmail_recipient,
+        "FROM_EMAIL": from_email,
+        "APP_PASSWORD": app_password,
         "cooldown":cooldown_seconds,
         "motion_score": motion_score,
+        "camera_width": camera_width,
+        "camera_height": camera_height,
+        "camera_fps": camera_fps,
+        "reconnect_after_seconds": reconnect_after_seconds,
+        "reconnect_max_delay": reconnect_max_delay,
+        "capture_luma": capture_luma,
+        "camera_source": camera_source,
+        "source_realtime": source_realtime,
+        "source_loop": source_loop,
+        "cameras": cameras,
+        "pipeline_mode": pipeline_mode,
+        "analysis_width": analysis_width,
+        "motion_detector": motion_detector,
+        "pixel_threshold": pixel_threshold,
+        "bg_alpha": bg_alpha,
+        "bg_history": bg_history,
+        "bg_var_threshold": bg_var_threshold,
+        "tile_size": tile_size,
+        "tile_workers": tile_workers,
+        "illumination_shift": illumination_shift,
+        "illumination_coverage": illumination_coverage,
+        "motion_zones": motion_zones,
+        "temporal_k": temporal_k,
+        "temporal_n": temporal_n,
+        "pre_roll_seconds": pre_roll_seconds,
+        "pre_roll_max_mb": pre_roll_max_mb,
+        "pre_roll_scale": pre_roll_scale,
+        "pre_roll_jpeg_quality": pre_roll_jpeg_quality,
+        "clip_min_seconds": clip_min_seconds,
+        "clip_post_roll_seconds": clip_post_roll_seconds,
+        "clip_max_seconds": clip_max_seconds,
+        "recorder_backend": recorder_backend,
+        "recorder_codec": recorder_codec,
+        "recorder_preset": recorder_preset,
+        "recorder_crf": recorder_crf,
+        "encode_workers": encode_workers,
+        "encode_queue_size": encode_queue_size,
+        "two_tier_encoding": two_tier_encoding,
+        "alert_width": alert_width,
+        "alert_preset": alert_preset,
+        "alert_crf": alert_crf,
+        "archive_preset": archive_preset,
+        "snapshot_alerts": snapshot_alerts,
+        "events_db": events_db,
+        "event_retention_days": event_retention_days,
         "dotenv_path": dotenv_path
     }
 
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Typed, immutable snapshot of load_config(); field names are its keys in lower case."""
+
+    autostart_enabled: bool
+    telegram_token: Optional[str]
+    telegram_chat_id: Optional[str]
+    fastmail_email: Optional[str]
+    fastmail_password: Optional[str]
+    fastmail_recipient: Optional[str]
+    from_email: Optional[str]
+    app_password: Optional[str]
+    cooldown: int
+    motion_score: int
+    camera_width: int
+    camera_height: int
+    camera_fps: int
+    reconnect_after_seconds: float
+    reconnect_max_delay: float
+    capture_luma: bool
+    camera_source: str
+    source_realtime: bool
+    source_loop: bool
+    cameras: str
+    pipeline_mode: str
+    analysis_width: int
+    motion_detector: str
+    pixel_threshold: int
+    bg_alpha: float
+    bg_history: int
+    bg_var_threshold: Optional[float]
+    tile_size: int
+    tile_workers: int
+    illumination_shift: float
+    illumination_coverage: float
+    motion_zones: str
+    temporal_k: int
+    temporal_n: int
+    pre_roll_seconds: float
+    pre_roll_max_mb: int
+    pre_roll_scale: float
+    pre_roll_jpeg_quality: Optional[int]
+    clip_min_seconds: float
+    clip_post_roll_seconds: float
+    clip_max_seconds: float
+    recorder_backend: str
+    recorder_codec: str
+    recorder_preset: str
+    recorder_crf: int
+    encode_workers: int
+    encode_queue_size: int
+    two_tier_encoding: bool
+    alert_width: int
+    alert_preset: str
+    alert_crf: int
+    archive_preset: str
+    snapshot_alerts: bool
+    events_db: str
+    event_retention_days: int
+    dotenv_path: str
+
+    SECRET_FIELDS = ("telegram_token", "fastmail_password", "app_password")
+
+    @classmethod
+    def from_config(cls, values):
+        names = {f.name for f in fields(cls)}
+        return cls(**{k.lower(): v for k, v in values.items() if k.lower() in names})
+
+    def diff(self, other):
+        """Returns {field: (self value, other value)} for every field that differs."""
+        return {f.name: (getattr(self, f.name), getattr(other, f.name))
+                for f in fields(self) if getattr(self, f.name) != getattr(other, f.name)}
+
+
+_settings = None
+_settings_lock = threading.Lock()
+_listeners = []
+_dotenv_keys = set()  # keys last applied from the .env file, so removed ones can be unset
+_watcher = None
+
+
+def get_settings():
+    """Returns the shared Settings, loading them on first use."""
+    global _settings
+    with _settings_lock:
+        if _settings is None:
+            _settings = Settings.from_config(load_config())
+            _dotenv_keys.update(dotenv_values(_settings.dotenv_path) if os.path.exists(_settings.dotenv_path)
+                                else {})
+        return _settings
+
+
+def subscribe(callback):
+    """Registers callback(old, new, changes) to run after every reload that changed something."""
+    _listeners.append(callback)
+    return callback
+
+
+def unsubscribe(callback):
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+def _describe(name, value):
+    return "***" if name in Settings.SECRET_FIELDS and value else repr(value)
+
+
+def reload_settings():
+    """Re-reads the .env file into the environment and the shared Settings. Returns the changes."""
+    global _settings
+    started = time.perf_counter()
+    old = get_settings()
+    path = find_dotenv_path()
+    values = dotenv_values(path) if os.path.exists(path) else {}
+    with _settings_lock:
+        for key in _dotenv_keys - set(values):
+            os.environ.pop(key, None)
+        os.environ.update({k: v for k, v in values.items() if v is not None})
+        _dotenv_keys.clear()
+        _dotenv_keys.update(values)
+        new = Settings.from_config(load_config())
+        _settings = new
+    changes = old.diff(new)
+    elapsed = (time.perf_counter() - started) * 1000
+    if not changes:
+        T.info(f"[⚙️] Settings reloaded in {elapsed:.1f} ms: no changes.")
+        return changes
+    summary = ", ".join(f"{name} {_describe(name, a)} -> {_describe(name, b)}" for name, (a, b) in changes.items())
+    T.info(f"[⚙️] Settings reloaded in {elapsed:.1f} ms: {summary}")
+    for callback in list(_listeners):
+        try:
+            callback(old, new, changes)
+        except Exception as e:
+            T.error(f"Settings listener {getattr(callback, '__name__', callback)} failed: {e}")
+    return changes
+
+
+class SettingsWatcher(threading.Thread):
+    """Polls the .env file's modification time and reloads the shared Settings when it changes."""
+
+    def __init__(self, interval=1.0, name="SettingsWatcher"):
+        super().__init__(name=name, daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def _mtime(self):
+        try:
+            return os.stat(find_dotenv_path()).st_mtime_ns
+        except OSError:
+            return None
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        last = self._mtime()
+        while not self._stop_event.wait(self.interval):
+            current = self._mtime()
+            if current != last:
+                last = current
+                try:
+                    reload_settings()
+                except Exception as e:
+                    T.error(f"Settings reload failed; keeping previous values: {e}")
+
+
+def start_settings_watcher(interval=1.0):
+    """Starts the shared .env watcher once; later calls return the running one."""
+    global _watcher
+    get_settings()
+    if _watcher is None or not _watcher.is_alive():
+        _watcher = SettingsWatcher(interval)
+        _watcher.start()
+        T.info(f"[⚙️] Watching {find_dotenv_path()} for settings changes.")
+    return _watcher
@@ -4,11 +4,18 @@ import time
 import os
 import tracelog as T
 import threading
-import numpy as np
 from datetime import datetime
 from contextlib import contextmanager # Import contextmanager
 import asyncio
 import subprocess
+from capture import to_bgr
+from recorder import MB
+from encoder import EncodeService, EncodeJob, PRIORITY_ALERT, PRIORITY_ARCHIVE
+from motion import draw_motion
+from zones import CHANNELS
+from cameras import CameraPipeline, CameraSpec, parse_cameras, format_stats, CAPTURE_STATS_INTERVAL
+from mp_pipeline import ProcessPipeline
+from sources import open_source
 
 # from PyQt5.QtCore import Qt
 # from PyQt5.QtGui import QImage, QPixmap
@@ -23,7 +30,6 @@ from PyQt5.QtCore import Qt
 cap = None  # Camera capture object
 detection_active_event = threading.Event()  # Flag to control detection loop
 detection_thread = None
-recording_in_progress = False
 last_motion_time = 0
 manual_shutdown_requested = False   # ✅ new flag
 # GUI dispatch health and throttle
@@ -32,6 +38,17 @@ _preview_last_ts = 0.0
 _preview_min_interval = 0.08  # ~12.5 FPS equivalent; avoid spamming GUI
 _sudo_shutdown_lock = threading.Lock()
 _sudo_shutdown_flag = False
+# One CameraPipeline (capture, ring, pre-roll, recorder, detector, cooldown) per camera
+pipelines = []
+cooldown_thread = None
+encode_service = None  # bounded priority queue + worker pool for clip encodes
+ALERT_UPLOAD_TIMEOUT = 120  # seconds an archive job waits for alert uploads before removing their file
+RESTART_SETTINGS = {"capture_luma", "pre_roll_seconds", "pre_roll_max_mb", "pre_roll_scale",
+                    "pre_roll_jpeg_quality", "events_db", "cameras", "pipeline_mode",
+                    "camera_source", "source_realtime", "source_loop"}
+MOTION_OVERLAY_SECONDS = 1.0  # how long the preview keeps showing the latest motion boxes
+SNAPSHOT_REPLY_WAIT = 10  # seconds clip delivery waits for the snapshot's message_id to reply to
+PIPELINE_JOIN_TIMEOUT = 20  # seconds a pipeline gets to stop its stages (and finish a clip) on shutdown
 
 def set_sudo_shutdown_in_progress(value: bool):
     global _sudo_shutdown_flag
@@ -61,121 +78,259 @@ def _gui_post(func, *args, **kwargs):
         raise
 
 
-def _process_frame_pair(frame1, frame2):
-    """
-    Compares two frames to detect motion.
+def _dispatch_preview(frame):
+    """Thread-safe GUI preview with throttle and kill-switch."""
+    global _preview_enabled, _preview_last_ts, _preview_min_interval
+    try:
+        if _preview_enabled:
+            now_ts = time.time()
+            if now_ts - _preview_last_ts >= _preview_min_interval:
+                _preview_last_ts = now_ts
+                from gui import gui_active, safe_imshow_threadsafe
+                if gui_active:
+                    overlay = pipelines[0].last_result if pipelines else None
+                    if overlay is not None and now_ts - overlay[0] <= MOTION_OVERLAY_SECONDS:
+                        frame = draw_motion(frame, overlay[1])
+                    # Prefer args form to avoid capturing large frames in lambda
+                    _gui_post(safe_imshow_threadsafe, frame)
+    except Exception as e:
+        T.warning(f"Preview frame dispatch failed: {e}")
+        # Kill-switch: if dispatcher lacks an event loop in worker thread, stop preview attempts
+        if "no current event loop" in str(e).lower():
+            _preview_enabled = False
+            T.warning("Preview disabled due to missing event loop in worker thread.")
 
-    Args:
-        frame1: The first frame (numpy array).
-        frame2: The second frame (numpy array).
 
-    Returns:
-        True if motion is detected, False otherwise.
+def _handle_motion_event(active_recorder, cooldown, frame=None, confidence=None, result=None, zones=None,
+                         camera=None):
     """
-    diff = cv2.absdiff(frame1, frame2)
-    gray = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
-    blur = cv2.GaussianBlur(gray, (5, 5), 0)
-    _, thresh = cv2.threshold(blur, 20, 255, cv2.THRESH_BINARY)
-    #motion_score = np.sum(thresh)
-    #print(f"Motion score: {motion_score}")
-    return np.sum(thresh) > 200000
-
-
-def save_clip(cap_instance, duration=5, fps=20):
-    """Records a video clip from the camera (no direct GUI calls here)."""
-    os.makedirs("clips", exist_ok=True)
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    avi_path = f"clips/motion_{timestamp}.avi"
-
-    if not cap_instance or not cap_instance.isOpened():
-        T.error("[!] Failed to access webcam during clip save.")
-        return None
+    Starts a motion event without blocking: recording, encoding and cooldown run on workers.
+
+    When frame is given it goes out as a snapshot alert straight away.
+    confidence is the temporal filter's hit ratio when the event fired;
+    result is the MotionResult of the firing frame, whose boxes are indexed.
+    zones are the zones that fired; their names are indexed and their
+    notify lists decide which alert channels the event goes to. camera
+    names the camera that saw it when several are configured.
+    """
+    global last_motion_time
 
-    width = int(cap_instance.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap_instance.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fourcc = cv2.VideoWriter_fourcc(*"DIVX")
+    from notifications import increment_motion_count
 
-    frames_recorded = 0
-    start_time = time.time()
-    from utils import open_video_writer
-    with open_video_writer(avi_path, fourcc, fps, (width, height)) as out:
-        while time.time() - start_time < duration:
-            if not detection_active_event.is_set():
-                break
+    T.info("[DEBUG] Handling motion event start")
+    try:
+        event = {"detected_at": time.time(), "camera": camera, "confidence": confidence,
+                 "motion_boxes": result.boxes if result is not None else (),
+                 "zones": [zone.name for zone in zones or ()], "channels": _alert_channels(zones)}
+        if not active_recorder.trigger(event):
+            T.info("[⏳] Recorder busy — motion event not started.")
+            return False
+        _index_new_event(event)
+        if frame is not None and "telegram" in event["channels"]:
+            _send_snapshot(event, frame)
 
-            ret, frame = cap_instance.read()
-            if not ret:
-                break
+        # Mark state
+        last_motion_time = datetime.now()
+        increment_motion_count()
+        _start_cooldown(cooldown)
+        return True
 
-            out.write(frame)
-            frames_recorded += 1
+    except Exception as e:
+        T.error(f"Motion event failed: {e}")
+        return False
 
 
-            # Thread-safe GUI preview with throttle and kill-switch
-            try:
-                global _preview_enabled, _preview_last_ts, _preview_min_interval
-                if _preview_enabled:
-                    now_ts = time.time()
-                    if now_ts - _preview_last_ts >= _preview_min_interval:
-                        _preview_last_ts = now_ts
-                        from gui import gui_active, safe_imshow_threadsafe
-                        if gui_active:
-                            # Prefer args form to avoid capturing large frames in lambda
-                            _gui_post(safe_imshow_threadsafe, frame)
-            except Exception as e:
-                T.warning(f"Preview frame dispatch failed: {e}")
-                # Kill-switch: if dispatcher lacks an event loop in worker thread, stop preview attempts
-                if "no current event loop" in str(e).lower():
-                    _preview_enabled = False
-                    T.warning("Preview disabled due to missing event loop in worker thread.")
-
-    if frames_recorded > 0:
-        T.info(f"[✔] Saved motion clip with {frames_recorded} frames to {avi_path}")
-        return avi_path
-    else:
-        if os.path.exists(avi_path):
-            os.remove(avi_path)
-        T.error("[!] Clip save failed (0 frames recorded).")
-        return None
+def _alert_channels(zones):
+    """Union of the channels zones route to; every channel when any zone (or none at all) leaves it open."""
+    if not zones or any(zone.notify is None for zone in zones):
+        return CHANNELS
+    return tuple(channel for channel in CHANNELS if any(channel in zone.notify for zone in zones))
 
 
-def _handle_motion_event(cap, cooldown):
-    """Handles motion detection event safely with debug output."""
-    global last_motion_time, recording_in_progress
+def _index_new_event(event):
+    """Records event in the event index; the index is best-effort and never blocks an alert."""
+    from events import get_store
+    try:
+        event["id"] = get_store().record_event(event["detected_at"], confidence=event.get("confidence"),
+                                               motion_boxes=event.get("motion_boxes"), zones=event.get("zones"),
+                                               camera=event.get("camera"))
+    except Exception as e:
+        T.error(f"Event index insert failed: {e}")
 
-    from notifications import send_alerts_async, increment_motion_count
 
-    T.info("[DEBUG] Handling motion event start")
+def _index_event(event, **fields):
+    """Updates event's index row, if it has one."""
+    if event.get("id") is None:
+        return
+    from events import get_store
     try:
-        # Mark state
-        last_motion_time = datetime.now()
-        recording_in_progress = True
-        increment_motion_count()
+        get_store().update_event(event["id"], **fields)
+    except Exception as e:
+        T.error(f"Event index update failed: {e}")
+
 
-        avi_file = save_clip(cap)
-        if not avi_file:
-            T.error("[!] save_clip returned None — aborting motion event")
-            recording_in_progress = False
+def _send_snapshot(event, frame):
+    """Fast-path alert for event; logs detection-to-first-notification latency once it is delivered."""
+    from notifications import send_snapshot_async
+
+    def on_sent(message_id, sent_at):
+        if message_id is None:
+            T.warning("[⏱] Snapshot alert not delivered; the clip will be the first notification.")
             return
+        event["snapshot_message_id"] = message_id
+        event["first_notified_at"] = sent_at
+        _index_event(event, first_notified_at=sent_at, delivery="snapshot")
+        T.info(f"[⏱] First notification {sent_at - event['detected_at']:.2f}s after motion (snapshot)")
+
+    caption = f"Motion detected on {event['camera']}!" if event.get("camera") else "Motion detected!"
+    event["snapshot_thread"] = send_snapshot_async(to_bgr(frame), caption, on_sent=on_sent)
+
+
+def _get_encode_service():
+    """Returns the shared encode service, starting it on first use."""
+    global encode_service
+    if encode_service is None:
+        from config import get_settings
+        settings = get_settings()
+        encode_service = EncodeService(workers=settings.encode_workers, max_queue=settings.encode_queue_size,
+                                       idle_check=lambda: not _any_recording())
+        encode_service.start()
+    return encode_service
+
+
+def get_encode_stats():
+    """Returns encode queue depth, wait and encode times, or None before the first clip."""
+    if encode_service is None:
+        return None
+    return encode_service.stats()
+
+
+def _on_clip_recorded(event, path):
+    """Recorder callback: queues a finished clip for encoding, or delivers it directly if already final."""
+    from config import get_settings
+    T.info(f"[DEBUG] Saved clip: {path}")
+    if event.get("id") is None:
+        _index_new_event(event)  # the insert when motion fired failed; retry so cleanup tracks the clip
+    scores = [score for score, _ in event.get("keyframes", [])]
+    _index_event(event, ended_at=event.get("ended_at"), clip_path=path, clip_bytes=event.get("clip_bytes"),
+                 peak_score=max(scores) if scores else None, poster_path=event.get("poster"),
+                 thumbnail_path=event.get("thumbnail"))
+    settings = get_settings()
+    if settings.two_tier_encoding:
+        _submit_two_tier(event, path, settings)
+        return
+    if path.endswith(".mp4"):
+        # The ffmpeg pipe backend already produced the final file in one pass. Deliver it off the
+        # recorder thread: waiting for the snapshot reply there would starve the pre-roll buffer.
+        threading.Thread(target=_deliver_clip, args=(event, path, event.get("clip_bytes", 0)),
+                         name="ClipDeliveryThread", daemon=True).start()
+        return
 
-        T.info(f"[DEBUG] Saved clip: {avi_file}")
+    def on_done(job):
+        bytes_written = event.get("clip_bytes", 0)
+        if job.output_path and job.output_path != path and os.path.exists(job.output_path):
+            bytes_written += os.path.getsize(job.output_path)
+        T.info(f"[DEBUG] Compressed to: {job.output_path}")
+        _index_event(event, clip_path=job.output_path)
+        _deliver_clip(event, job.output_path, bytes_written)
+
+    _get_encode_service().submit(EncodeJob(path, priority=PRIORITY_ALERT, on_done=on_done))
+
+
+def _submit_two_tier(event, path, settings):
+    """Queues the small alert rendition first; its completion queues the archive rendition."""
+    from utils import encode_alert_rendition
+    service = _get_encode_service()
+
+    def on_alert_done(job):
+        alert_path = job.output_path or path
+        bytes_written = event.get("clip_bytes", 0)
+        if alert_path != path and os.path.exists(alert_path):
+            bytes_written += os.path.getsize(alert_path)
+        # Deliver off the encode worker: waiting for the snapshot reply would hold up other cameras' encodes
+        threading.Thread(target=deliver_and_archive, args=(alert_path, bytes_written),
+                         name="ClipDeliveryThread", daemon=True).start()
+
+    def deliver_and_archive(alert_path, bytes_written):
+        senders = _deliver_clip(event, alert_path, bytes_written)
+        service.submit(EncodeJob(path, priority=PRIORITY_ARCHIVE, func=_archive_clip, options={
+            "alert_path": alert_path,
+            "senders": senders,
+            "preset": settings.archive_preset,
+        }, on_done=on_archive_done))
+
+    def on_archive_done(job):
+        if job.output_path and os.path.exists(job.output_path):
+            fields = {"clip_path": job.output_path, "clip_bytes": os.path.getsize(job.output_path)}
+            if not os.path.exists(event.get("alert_path") or ""):
+                fields["alert_path"] = None
+            _index_event(event, **fields)
+
+    service.submit(EncodeJob(path, priority=PRIORITY_ALERT, func=encode_alert_rendition, on_done=on_alert_done,
+                             options={
+                                 "width": settings.alert_width,
+                                 "preset": settings.alert_preset,
+                                 "crf": settings.alert_crf,
+                             }))
+
+
+def _archive_clip(master_path, alert_path=None, senders=(), preset="medium"):
+    """Archive tier: re-encodes an AVI master at full quality, then replaces the alert rendition with it."""
+    from utils import compress_video
+    archive_path = master_path
+    if not master_path.endswith(".mp4"):
+        archive_path = compress_video(master_path, preset=preset)
+
+    if not alert_path or alert_path in (master_path, archive_path) or not os.path.exists(alert_path):
+        return archive_path
+    for t in senders:
+        t.join(timeout=ALERT_UPLOAD_TIMEOUT)
+    if any(t.is_alive() for t in senders):
+        T.warning(f"[🎞️] Alert upload still running; keeping {alert_path}.")
+    else:
+        os.remove(alert_path)
+        T.info(f"[🎞️] Archive rendition {archive_path} replaces {alert_path}.")
+    return archive_path
 
-        from utils import compress_video
-        mp4_file = compress_video(avi_file)
-        T.info(f"[DEBUG] Compressed to: {mp4_file}")
 
-        send_alerts_async(mp4_file)
+def _deliver_clip(event, clip_file, bytes_written):
+    """Logs motion-to-ready latency and sends the alerts for a finished clip. Returns the sender threads."""
+    from notifications import send_alerts_async
+    try:
+        ready_at = time.time()
+        T.info(f"[⏱] Clip ready {ready_at - event['detected_at']:.2f}s after motion "
+               f"({ready_at - event.get('ended_at', ready_at):.2f}s after recording ended); "
+               f"{bytes_written / MB:.2f} MB written")
+
+        # Reply under the snapshot so the video lands in the same thread
+        snapshot = event.get("snapshot_thread")
+        if snapshot is not None:
+            snapshot.join(timeout=SNAPSHOT_REPLY_WAIT)
+        if "first_notified_at" not in event:
+            T.info(f"[⏱] First notification {ready_at - event['detected_at']:.2f}s after motion (clip)")
+        senders = send_alerts_async(clip_file, reply_to=event.get("snapshot_message_id"),
+                                    thumbnail=event.get("thumbnail"), channels=event.get("channels"))
         T.info("[DEBUG] Alerts dispatched")
+        event["alert_path"] = clip_file
+        fields = {"alert_path": clip_file, "delivery": "dispatched"}
+        if "first_notified_at" not in event:
+            fields["first_notified_at"] = ready_at
+        _index_event(event, **fields)
+        return senders
+    except Exception as e:
+        T.error(f"Clip delivery failed: {e}")
+        _index_event(event, delivery="failed")
+        return []
 
-        _run_cooldown(cooldown)
-        T.info("[DEBUG] Cooldown completed")
 
-    except Exception as e:
-        # print(f"[❌] Exception in _handle_motion_event: {e}")
-        T.error(f"Motion event failed: {e}")
-    finally:
-        # Always reset flag at the end
-        recording_in_progress = False
+def _start_cooldown(seconds):
+    """Runs the GUI cooldown countdown on its own thread."""
+    global cooldown_thread
+    if cooldown_thread is not None and cooldown_thread.is_alive():
+        return
+    cooldown_thread = threading.Thread(target=_run_cooldown, args=(seconds,), name="CooldownThread", daemon=True)
+    cooldown_thread.start()
+
 
 def _run_cooldown(seconds):
     """
@@ -189,6 +344,8 @@ def _run_cooldown(seconds):
         enqueue_gui(update_cooldown_label, i)
         time.sleep(1)
 
+    T.info("[DEBUG] Cooldown completed")
+
     # After cooldown, update GUI state
     try:
         from gui import gui_exists, enqueue_gui, set_cooldown_detecting_threadsafe
@@ -198,9 +355,42 @@ def _run_cooldown(seconds):
         T.warning(f"Cooldown end dispatch failed: {e}")
 
 
+def _primary():
+    """The pipeline whose frames feed the GUI preview (the only one with a single camera), or None."""
+    return pipelines[0] if pipelines else None
+
+
+def get_camera_stats():
+    """Returns per-camera capture, detection, CPU and memory stats keyed by camera name."""
+    return {pipeline.name: pipeline.stats() for pipeline in list(pipelines)}
+
+
+def get_status_lines():
+    """Per-camera stats and the encode queue as lines for the Telegram /status reply."""
+    lines = []
+    for name, stats in get_camera_stats().items():
+        lines.extend(format_stats(name, stats))
+    encode = get_encode_stats()
+    if encode is not None:
+        lines.append(f"🎞️ Encodes: {encode['completed']} done, {encode['depth']} queued, {encode['failed']} failed, "
+                     f"avg wait {encode['avg_wait']:.1f}s")
+    return lines
+
+
+def _any_recording():
+    return any(p.recorder is not None and p.recorder.is_recording for p in list(pipelines))
+
+
 def release_camera_resource():
     """Safely releases the camera if it's open."""
     global cap
+    for pipeline in list(pipelines):
+        # Stop the owner threads first so nothing reads from a released device
+        pipeline.stop()
+        if pipeline.cap is not cap and pipeline.cap is not None and pipeline.cap.isOpened():
+            pipeline.cap.release()
+            T.info(f"[📷] Camera '{pipeline.name}' released.")
+    pipelines.clear()
     if cap is not None and hasattr(cap, "isOpened") and cap.isOpened():
         cap.release()
         cap = None
@@ -208,12 +398,75 @@ def release_camera_resource():
         time.sleep(1.0)  # Give time for driver to settle
 
 
-def _detection_loop(cam):
-    """The main motion detection loop."""
-    global cap, last_motion_time, recording_in_progress
-    cap = cam
-    last_alert_time = 0
-    cooldown = 30
+def _create_pipeline(name, cam, overrides=None, clips_dir="clips", preview=False, source=None, processes=False):
+    """
+    Builds and starts a camera pipeline wired to the shared event, clip,
+    preview and camera status handlers. source lets capture reopen the
+    camera after an outage; with processes=True it is all the pipeline
+    needs, as its capture process opens the camera itself.
+    """
+    handlers = {"on_motion": _handle_motion_event, "on_clip": _on_clip_recorded,
+                "on_frame": _dispatch_preview if preview else None, "clips_dir": clips_dir,
+                "on_camera_status": _on_camera_status}
+    if processes:
+        pipeline = ProcessPipeline(name, source, overrides, **handlers)
+    else:
+        pipeline = CameraPipeline(name, cam, overrides, source=source, **handlers)
+    pipelines.append(pipeline)
+    try:
+        pipeline.start()
+    except Exception:
+        pipelines.remove(pipeline)
+        pipeline.stop()
+        raise
+    return pipeline
+
+
+def _on_camera_status(camera, connected, incident=None):
+    """
+    Capture callback for camera outages: the GUI shows the camera error while
+    capture reconnects, Telegram hears when frames stop and when they are
+    back, and every finished outage is indexed with its downtime.
+    """
+    from notifications import send_telegram_alert, send_telegram_error_alert
+    try:
+        from gui import gui_exists, show_camera_error_threadsafe, set_cooldown_detecting_threadsafe
+        if gui_exists():
+            if connected:
+                set_cooldown_detecting_threadsafe()
+            elif incident is None:
+                show_camera_error_threadsafe()
+    except Exception as e:
+        T.warning(f"Camera status GUI update failed: {e}")
+
+    if incident is None:
+        send_telegram_error_alert(f"📷 Camera '{camera}' stopped delivering frames — reconnecting.")
+        return
+    from events import get_store
+    try:
+        get_store().record_outage(camera, incident["started_at"], incident["ended_at"], incident.get("attempts"),
+                                  incident.get("recovered", connected))
+    except Exception as e:
+        T.error(f"Outage index insert failed: {e}")
+    if connected:
+        send_telegram_alert(f"📷 Camera '{camera}' is back after {incident['downtime']:.0f}s without frames.")
+
+
+def _on_settings_changed(old, new, changes):
+    """Applies shared settings changes; each camera pipeline picks up its own on its next frame."""
+    if encode_service is not None and changes.keys() & {"encode_workers", "encode_queue_size"}:
+        encode_service.max_queue = new.encode_queue_size
+        if new.encode_workers > encode_service.workers:
+            encode_service.workers = new.encode_workers
+            encode_service.start()
+    restart = sorted(changes.keys() & RESTART_SETTINGS)
+    if restart:
+        T.warning(f"[⚙️] {', '.join(restart)} take effect after detection restarts.")
+
+
+def _init_detection_run():
+    from config import start_settings_watcher
+    start_settings_watcher()
 
     # Enqueue GUI init onto the Qt main thread
     try:
@@ -222,44 +475,86 @@ def _detection_loop(cam):
     except Exception as e:
         T.warning(f"Failed to enqueue GUI boot init: {e}")
 
-    while detection_active_event.is_set():
-        if cap is None or not hasattr(cap, 'read'):
-            T.error('Camera object lost or invalid. Exiting detection loop.')
-            break
 
-        ret1, frame1 = cap.read()
-        time.sleep(0.05)
-        ret2, frame2 = cap.read()
+def _detection_loop(cam, source=None):
+    """The main motion detection loop."""
+    global cap
+    from config import subscribe, unsubscribe
+    cap = cam
+    _init_detection_run()
+    pipeline = _create_pipeline("camera0", cam, preview=True, source=source)
+    subscribe(_on_settings_changed)
+    try:
+        pipeline.run(detection_active_event)  # stops its threads on the way out
+    finally:
+        unsubscribe(_on_settings_changed)
+
 
-        if not ret1 or not ret2:
-            time.sleep(1)
+def _run_cameras(specs, per_camera_clips=True):
+    """
+    Runs one pipeline per configured camera, each analysing on its own
+    thread, until detection is stopped or every camera has failed. With
+    PIPELINE_MODE=processes each camera's stages run in their own processes
+    and the parent only opens the device briefly to size the frame ring.
+    """
+    from config import get_settings, subscribe, unsubscribe
+    _init_detection_run()
+    settings = get_settings()
+    processes = settings.pipeline_mode == "processes"
+    for spec in specs:
+        clips_dir = os.path.join("clips", spec.name) if per_camera_clips else "clips"
+        if processes:
+            try:
+                pipeline = _create_pipeline(spec.name, None, spec.overrides, clips_dir=clips_dir,
+                                            preview=not pipelines, source=spec.source, processes=True)
+            except (IOError, OSError) as e:
+                T.error(f"[📷] Cannot start camera '{spec.name}': {e}; skipping it.")
+                continue
+            pipeline.start_thread(detection_active_event)
             continue
-
-        if _process_frame_pair(frame1, frame2):
-            T.info("[DEBUG] Motion detected")
-            now = time.time()
-
-            if not recording_in_progress and (now - last_alert_time) > cooldown:
-                last_motion_time = datetime.now()
-                last_alert_time = now
-                _handle_motion_event(cap, cooldown)
-                T.info("[✔] Motion recorded. Cooldown started.")
-            elif recording_in_progress:
-                T.info("[⏳] Motion detected but already recording.")
-            else:
-                # Cooldown active
-                T.info("[⏳] Motion detected but cooldown is active.")
+        cam = open_source(spec.source, spec.overrides.get("source_realtime", settings.source_realtime),
+                          spec.overrides.get("source_loop", settings.source_loop))
+        if not cam.isOpened():
+            cam.release()
+            T.error(f"[📷] Cannot open camera '{spec.name}' (source {spec.source!r}); skipping it.")
+            continue
+        _create_pipeline(spec.name, cam, spec.overrides, clips_dir=clips_dir, preview=not pipelines,
+                         source=spec.source).start_thread(detection_active_event)
+    if not pipelines:
+        T.error("No configured camera could be opened.")
+        return False
+
+    T.info(f"[📷] Running {len(pipelines)} camera pipelines: {', '.join(p.name for p in pipelines)}.")
+    subscribe(_on_settings_changed)
+    last_stats_ts = time.time()
+    try:
+        while detection_active_event.is_set() and any(p.is_alive() for p in pipelines):
+            time.sleep(0.5)
+            if time.time() - last_stats_ts >= CAPTURE_STATS_INTERVAL:
+                last_stats_ts = time.time()
+                T.debug(f"[📷] Camera stats: {get_camera_stats()}")
+                T.debug(f"[🎞️] Encode stats: {get_encode_stats()}")
+    finally:
+        unsubscribe(_on_settings_changed)
+        # Each pipeline thread stops its own pipeline on the way out; only stop here the ones that hang
+        for pipeline in pipelines:
+            if pipeline._thread is not None:
+                pipeline._thread.join(timeout=PIPELINE_JOIN_TIMEOUT)
+            if pipeline.is_alive():
+                T.warning(f"[📷] Camera '{pipeline.name}' did not stop in {PIPELINE_JOIN_TIMEOUT}s; stopping it.")
+                pipeline.stop()
+    return True
 
 
 @contextmanager
-def open_camera(index=0):
-    """Context manager for opening and releasing the camera."""
+def open_camera(source=0, realtime=True, loop=False):
+    """Context manager for opening and releasing the camera, or any source sources.open_source() accepts."""
     global cap
-    cap = cv2.VideoCapture(index)
+    cap = open_source(source, realtime, loop)
     if not cap.isOpened():
         cap.release()
         cap = None
-        raise IOError(f"Cannot open camera at index {index}")
+        raise IOError(f"Cannot open camera source {source!r}")
     try:
         yield cap
     finally:
@@ -428,8 +723,21 @@ def shutdown_detection_pipeline(skip_auth=False):
         return True
            
               
-def main():
-    """Main motion detection loop running in a background thread."""
+def _report_camera_failure():
+    from gui import gui_exists, show_camera_error_threadsafe, enable_start_button_threadsafe
+    if gui_exists():
+        show_camera_error_threadsafe()
+        enable_start_button_threadsafe()
+
+
+def main(source=None):
+    """
+    Main motion detection loop running in a background thread.
+
+    source overrides CAMERA_SOURCE for the default camera: a device index,
+    a source string (video file, image folder, "synthetic") or a ready
+    FrameSource, so the same pipeline runs on replays and generated scenes.
+    """
     from gui import gui_exists
     global cap, detection_thread
     T.info("[DEBUG] Detection thread started.")
@@ -437,20 +745,34 @@ def main():
 
     # Attempt to open camera using context manager
     try:
-        with open_camera() as cam:
+        from config import get_settings
+        settings = get_settings()
+        if settings.pipeline_mode not in ("threads", "processes"):
+            T.warning(f"[⚙️] Unknown PIPELINE_MODE '{settings.pipeline_mode}'; running in threads.")
+        specs = parse_cameras(settings.cameras)
+        if specs:
+            # CAMERAS configured: one pipeline per camera instead of the single default device
+            if not _run_cameras(specs):
+                _report_camera_failure()
+            return
+        if source is None:
+            source = settings.camera_source
+        if settings.pipeline_mode == "processes":
+            # The capture process opens the source itself
+            if not _run_cameras([CameraSpec("camera0", source)], per_camera_clips=False):
+                _report_camera_failure()
+            return
+
+        with open_camera(source, settings.source_realtime, settings.source_loop) as cam:
             if cam is None or not cam.isOpened():
                 T.warning("open_camera() failed. Trying fallback initialization.")
                 cam = cv2.VideoCapture(0)
                 if not cam or not cam.isOpened():
                     T.error("Camera initialization failed completely.")
-                    from gui import gui_exists, show_camera_error_threadsafe, enable_start_button_threadsafe
-                    if gui_exists():
-                        if gui_exists():
-                            show_camera_error_threadsafe()
-                            enable_start_button_threadsafe()
+                    _report_camera_failure()
                     return
                 T.info("Fallback camera initialization succeeded.")
-            _detection_loop(cam)
+            _detection_loop(cam, source)
             # Add the initialization of the init_widgets here
 
     except Exception as e:
@@ -0,0 +1,223 @@
+# encoder.py
+import time
+import heapq
+import itertools
+import threading
+import tracelog as T
+
+# Lower value runs first: fresh alert clips go ahead of archive re-encodes
+PRIORITY_ALERT = 0
+PRIORITY_ARCHIVE = 1
+
+
+def _default_encode(input_path, **options):
+    from utils import compress_video
+    return compress_video(input_path, **options)
+
+
+class EncodeJob:
+    """One clip waiting to be (re-)encoded, with its timing for queue statistics."""
+
+    def __init__(self, input_path, priority=PRIORITY_ARCHIVE, options=None, on_done=None, func=None):
+        self.input_path = input_path
+        self.priority = priority
+        self.options = dict(options or {})
+        self.on_done = on_done
+        self.func = func  # overrides the service's encode function for this job
+        self.output_path = None
+        self.degraded = False
+        self.skipped = False
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def wait_time(self):
+        return (self.started_at or self.finished_at or time.time()) - self.submitted_at
+
+    @property
+    def encode_time(self):
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+
+class EncodeService:
+    """
+    Bounded priority queue of encode jobs served by a pool of worker threads.
+
+    Each worker drives its own ffmpeg child process, so N workers means at
+    most N concurrent encodes. When the queue is full:
+      - archive jobs are skipped and the source file is kept as-is;
+      - alert jobs evict the newest queued archive job, or are skipped
+        (the source clip is delivered un-re-encoded) if none is queued.
+    Alert jobs submitted while the queue is at least half full are degraded
+    to `fast_preset` so the backlog drains quickly. Archive jobs only start
+    while idle_check() returns True, so they use otherwise idle time.
+    """
+
+    def __init__(self, workers=2, max_queue=8, encode_func=None, fast_preset="ultrafast", idle_check=None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.fast_preset = fast_preset
+        self.idle_check = idle_check
+        self._encode = encode_func or _default_encode
+        self._heap = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopping = False
+        self._busy = 0
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.degraded = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_encode = 0.0
+
+    def start(self):
+        with self._cond:
+            self._stopping = False
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._worker_loop, name=f"EncodeWorker-{len(self._threads) + 1}",
+                                 daemon=True)
+            t.start()
+            self._threads.append(t)
+        T.info(f"[🎞️] Encode service started: {self.workers} workers, queue limit {self.max_queue}.")
+
+    def stop(self, timeout=5.0):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for t in self._threads:
+            if t.is_alive() and threading.current_thread() is not t:
+                t.join(timeout=timeout)
+        self._threads = [t for t in self._threads if t.is_alive()]
+
+    @property
+    def depth(self):
+        with self._cond:
+            return len(self._heap)
+
+    def submit(self, job):
+        """Queues job under the backpressure policy. Returns False if the job was skipped."""
+        victim = None
+        with self._cond:
+            if len(self._heap) >= self.max_queue:
+                if job.priority > PRIORITY_ALERT:
+                    job.skipped = True
+                else:
+                    victim = self._evict_archive_locked()
+                    if victim is None:
+                        job.skipped = True
+            if not job.skipped:
+                if job.priority == PRIORITY_ALERT and len(self._heap) >= self.max_queue // 2:
+                    job.options["preset"] = self.fast_preset
+                    job.degraded = True
+                    self.degraded += 1
+                heapq.heappush(self._heap, (job.priority, next(self._order), job))
+                self._cond.notify()
+            depth = len(self._heap)
+
+        if victim is not None:
+            T.warning(f"[🎞️] Encode queue full — dropped archive job for {victim.input_path}.")
+            self._finish_skipped(victim)
+        if job.skipped:
+            T.warning(f"[🎞️] Encode queue full ({depth}) — skipping re-encode of {job.input_path}.")
+            self._finish_skipped(job)
+            return False
+        if job.degraded:
+            T.info(f"[🎞️] Encode queue at {depth}/{self.max_queue} — using {self.fast_preset} preset.")
+        return True
+
+    def _evict_archive_locked(self):
+        archive = [item for item in self._heap if item[0] > PRIORITY_ALERT]
+        if not archive:
+            return None
+        newest = max(archive, key=lambda item: item[1])
+        self._heap.remove(newest)
+        heapq.heapify(self._heap)
+        return newest[2]
+
+    def _finish_skipped(self, job):
+        job.skipped = True
+        job.output_path = job.input_path
+        job.finished_at = time.time()
+        with self._cond:
+            self.skipped += 1
+        self._notify_done(job)
+
+    def _notify_done(self, job):
+        if job.on_done is None:
+            return
+        try:
+            job.on_done(job)
+        except Exception as e:
+            T.error(f"Encode completion callback failed: {e}")
+
+    def _is_idle(self):
+        if self.idle_check is None:
+            return True
+        try:
+            return bool(self.idle_check())
+        except Exception as e:
+            T.warning(f"Encode idle check failed: {e}")
+            return True
+
+    def _next_job(self):
+        with self._cond:
+            while not self._stopping:
+                if self._heap and (self._heap[0][0] == PRIORITY_ALERT or self._is_idle()):
+                    _, _, job = heapq.heappop(self._heap)
+                    self._busy += 1
+                    return job
+                # Idle state changes without a notify, so re-check periodically
+                self._cond.wait(timeout=1.0 if self._heap else None)
+            return None
+
+    def _worker_loop(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            job.started_at = time.time()
+            try:
+                job.output_path = (job.func or self._encode)(job.input_path, **job.options)
+            except Exception as e:
+                job.error = e
+                job.output_path = job.input_path
+                T.error(f"Encode of {job.input_path} failed: {e}")
+            job.finished_at = time.time()
+
+            with self._cond:
+                self._busy -= 1
+                if job.error is None:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self._total_wait += job.wait_time
+                self._max_wait = max(self._max_wait, job.wait_time)
+                self._total_encode += job.encode_time
+            T.info(f"[🎞️] Encoded {job.input_path} (priority {job.priority}): "
+                   f"waited {job.wait_time:.2f}s, encoded in {job.encode_time:.2f}s")
+            self._notify_done(job)
+
+    def stats(self):
+        with self._cond:
+            done = self.completed + self.failed
+            return {
+                "depth": len(self._heap),
+                "max_queue": self.max_queue,
+                "workers": self.workers,
+                "busy": self._busy,
+                "completed": self.completed,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "degraded": self.degraded,
+                "avg_wait": round(self._total_wait / done, 3) if done else 0.0,
+                "max_wait": round(self._max_wait, 3),
+                "avg_encode": round(self._total_encode / done, 3) if done else 0.0,
+            }
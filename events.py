@@ -0,0 +1,253 @@
+# events.py
+import os
+import json
+import time
+import sqlite3
+import threading
+import tracelog as T
+
+DEFAULT_DB_PATH = "events.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    detected_at REAL NOT NULL,
+    camera TEXT,
+    ended_at REAL,
+    peak_score REAL,
+    confidence REAL,
+    motion_boxes TEXT,
+    zones TEXT,
+    clip_path TEXT,
+    clip_bytes INTEGER,
+    alert_path TEXT,
+    poster_path TEXT,
+    thumbnail_path TEXT,
+    first_notified_at REAL,
+    delivery TEXT NOT NULL DEFAULT 'pending',
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_events_detected_at ON events (detected_at);
+CREATE TABLE IF NOT EXISTS camera_outages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    camera TEXT,
+    started_at REAL NOT NULL,
+    ended_at REAL NOT NULL,
+    attempts INTEGER,
+    recovered INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_camera_outages_started_at ON camera_outages (started_at);
+CREATE TABLE IF NOT EXISTS untracked_files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_untracked_files_mtime ON untracked_files (mtime);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Columns added after the first release, applied to existing databases on open
+_ADDED_COLUMNS = {
+    "confidence": "REAL",
+    "motion_boxes": "TEXT",
+    "zones": "TEXT",
+    "camera": "TEXT",
+}
+
+# Columns update_event() may set; everything else is fixed at insert time
+_UPDATABLE = {
+    "ended_at", "peak_score", "confidence", "clip_path", "clip_bytes", "alert_path", "poster_path",
+    "thumbnail_path", "first_notified_at", "delivery", "deleted",
+}
+FILE_COLUMNS = ("clip_path", "alert_path", "poster_path", "thumbnail_path")
+
+
+class EventStore:
+    """
+    SQLite index of motion events and the files they produced, plus the
+    camera outages that interrupted detection and the clip files found on
+    disk that no event tracks.
+
+    Rows are keyed by an index on detected_at, so summaries and retention
+    queries touch only the rows in their time range however long the
+    history grows. One connection is shared by all threads behind a lock.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(events)")}
+            for column, kind in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE events ADD COLUMN {column} {kind}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def record_event(self, detected_at, peak_score=None, confidence=None, motion_boxes=None, zones=None,
+                     camera=None):
+        """
+        Inserts a new event and returns its id. motion_boxes is a list of
+        (x, y, w, h); zones the names of the zones that fired; camera the
+        name of the camera that saw it.
+        """
+        boxes = json.dumps([list(box) for box in motion_boxes]) if motion_boxes else None
+        zone_names = ",".join(zones) if zones else None
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO events (detected_at, camera, peak_score, confidence, motion_boxes, zones) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (detected_at, camera, peak_score, confidence, boxes, zone_names)
+            )
+            return cur.lastrowid
+
+    def update_event(self, event_id, **fields):
+        unknown = set(fields) - _UPDATABLE
+        if unknown:
+            raise ValueError(f"Unknown event fields: {', '.join(sorted(unknown))}")
+        if not fields:
+            return
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE events SET {assignments} WHERE id = ?", (*fields.values(), event_id))
+
+    def get_event(self, event_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM events WHERE id = ?", (event_id,)).fetchone()
+        return dict(row) if row else None
+
+    def count_between(self, start, end):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM events WHERE detected_at >= ? AND detected_at < ?", (start, end)
+            ).fetchone()[0]
+
+    def events_between(self, start, end, limit=None):
+        """Returns events detected in [start, end), newest first."""
+        query = "SELECT * FROM events WHERE detected_at >= ? AND detected_at < ? ORDER BY detected_at DESC"
+        params = [start, end]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params)]
+
+    def expired(self, cutoff):
+        """Returns events older than cutoff whose files have not been deleted yet."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM events WHERE detected_at < ? AND deleted = 0 ORDER BY detected_at", (cutoff,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def backfill_files(self, folder):
+        """
+        Indexes the files under folder that no event tracks (clips from
+        before the index existed, strays), so retention can expire them by
+        mtime without scanning the folder. Runs once per folder; returns
+        the number of files added.
+        """
+        key = f"backfilled:{os.path.abspath(folder)}"
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM store_meta WHERE key = ?", (key,)).fetchone():
+                return 0
+            rows = self._conn.execute(f"SELECT {', '.join(FILE_COLUMNS)} FROM events WHERE deleted = 0").fetchall()
+        tracked = {os.path.abspath(path) for row in rows for path in row if path}
+        found = []
+        for root, _, filenames in os.walk(folder):
+            for filename in filenames:
+                path = os.path.abspath(os.path.join(root, filename))
+                if path not in tracked:
+                    try:
+                        found.append((path, os.path.getmtime(path)))
+                    except OSError:
+                        pass
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO untracked_files (path, mtime) VALUES (?, ?)", found)
+            self._conn.execute("INSERT INTO store_meta (key, value) VALUES (?, ?)", (key, str(time.time())))
+        return len(found)
+
+    def expired_files(self, cutoff):
+        """Returns the backfilled untracked files last modified before cutoff."""
+        with self._lock:
+            rows = self._conn.execute("SELECT path FROM untracked_files WHERE mtime < ? ORDER BY mtime",
+                                      (cutoff,)).fetchall()
+        return [row[0] for row in rows]
+
+    def forget_files(self, paths):
+        """Drops untracked files from the index once they are gone."""
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM untracked_files WHERE path = ?", [(path,) for path in paths])
+
+    def purge(self, cutoff):
+        """Drops index rows older than cutoff. Returns the number removed."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM camera_outages WHERE started_at < ?", (cutoff,))
+            return self._conn.execute("DELETE FROM events WHERE detected_at < ?", (cutoff,)).rowcount
+
+    def record_outage(self, camera, started_at, ended_at, attempts=None, recovered=True):
+        """Records one period without frames from camera and returns its id."""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO camera_outages (camera, started_at, ended_at, attempts, recovered) VALUES (?, ?, ?, ?, ?)",
+                (camera, started_at, ended_at, attempts, 1 if recovered else 0)
+            )
+            return cur.lastrowid
+
+    def outages_between(self, start, end):
+        """Returns camera outages that started in [start, end), oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM camera_outages WHERE started_at >= ? AND started_at < ? ORDER BY started_at",
+                (start, end)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Returns the shared event store, opening it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            from config import get_settings
+            path = get_settings().events_db
+            _store = EventStore(path)
+            T.info(f"[🗂️] Event index opened: {os.path.abspath(path)}")
+        return _store
+
+
+def day_bounds(day=None):
+    """Returns (start, end) epoch seconds for the local calendar day containing day (default today)."""
+    t = time.localtime(day if day is not None else time.time())
+    start = time.mktime((t.tm_year, t.tm_mon, t.tm_mday, 0, 0, 0, 0, 0, -1))
+    end = time.mktime((t.tm_year, t.tm_mon, t.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+    return start, end
+
+
+def format_event(row):
+    """One summary line for an event row."""
+    when = time.strftime("%H:%M:%S", time.localtime(row["detected_at"]))
+    parts = [f"{when} Motion detected" + (f" on {row['camera']}" if row.get("camera") else "")]
+    if row.get("ended_at"):
+        parts.append(f"{row['ended_at'] - row['detected_at']:.0f}s")
+    if row.get("peak_score") is not None:
+        parts.append(f"peak {row['peak_score']:.0f}")
+    if row.get("confidence") is not None:
+        parts.append(f"{row['confidence']:.0%} confidence")
+    if row.get("zones"):
+        parts.append(row["zones"].replace(",", ", "))
+    parts.append(row.get("delivery") or "pending")
+    return " — ".join(parts)
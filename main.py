@@ -1,23 +1,19 @@
 # main.py
 # import traceback
-from PyQt5.QtCore import QSocketNotifier
+# GUI, bot and detection imports stay inside the functions below: processes-mode
+# pipeline stages are spawned, and every spawned child re-imports this module.
 import sys
 import os
 import signal
 import tracelog as T
 import threading
-from qasync import QEventLoop
 import asyncio
 from logging.handlers import TimedRotatingFileHandler
 from datetime import datetime
 
-from PyQt5.QtWidgets import QApplication
-from PyQt5.QtCore import QCoreApplication
-from PyQt5.QtCore import qInstallMessageHandler
-from telegram_bot import start_telegram_listener_async
-
 
 def start_telegram_listener_background():
+    from telegram_bot import start_telegram_listener_async
     loop = asyncio.get_event_loop()
     loop.run_in_executor(None, lambda: asyncio.run(start_telegram_listener_async()))
 
@@ -30,27 +26,15 @@ def trigger_telegram_shutdown():
 
 
 ############ Thsee are to suppress QSokcet console outputs ######
-# Save the original __init__
-_orig_init = QSocketNotifier.__init__
-
-def debug_init(self, *args, **kwargs):
-    # print("\n[DEBUG] QSocketNotifier created!")
-    # traceback.print_stack(limit=10)
-    return _orig_init(self, *args, **kwargs)
-
 def qt_message_handler(mode, context, message):
     # print(f"[QtMessage] {message} ({context.file}:{context.line})")
     pass
-    
-qInstallMessageHandler(qt_message_handler)
-###################################################################
 
-from gui import create_gui, handle_autostart
-from detection import shutdown_detection_pipeline
-from telegram_bot import stop_telegram_bot
-from telegram_bot import start_telegram_listener_async, stop_telegram_listener_async
-from utils import clean_old_clips, schedule_daily_summary
-from gui import init_widgets_for_boot
+
+def install_qt_message_handler():
+    from PyQt5.QtCore import qInstallMessageHandler
+    qInstallMessageHandler(qt_message_handler)
+###################################################################
 
 # Global Variables
 watchdog_thread = None
@@ -64,6 +48,7 @@ def setup_signal_handlers():
 
 def run_initial_setup():
     """Runs initial setup tasks like cleaning old clips and scheduling daily summary."""
+    from utils import clean_old_clips, schedule_daily_summary
     clean_old_clips()
     schedule_daily_summary()
 
@@ -157,11 +142,14 @@ def main_entry():
         # 1. Setup system-level handlers and background watchdog
         # ---------------------------------------------------------
         setup_signal_handlers()
+        install_qt_message_handler()
         watchdog_thread = threading.Thread(target=run_watchdog, name="WatchdogThread", daemon=True)
         watchdog_thread.start()
         # ---------------------------------------------------------
         # 2. Create QApplication and wrap with qasync loop
         # ---------------------------------------------------------
+        from PyQt5.QtWidgets import QApplication
+        from qasync import QEventLoop
         app = QApplication(sys.argv)
         loop = QEventLoop(app)
         asyncio.set_event_loop(loop)
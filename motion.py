@@ -0,0 +1,599 @@
+# motion.py
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import cv2
+from capture import is_yuyv
+from zones import ZoneMask
+
+PIXEL_THRESHOLD = 20  # per-pixel gray difference that counts as change
+ILLUMINATION_SHIFT = 10  # mean gray-level change that may be a lighting change (0 = never suppress)
+ILLUMINATION_COVERAGE = 0.8  # fraction of grid cells that must shift together for it to be global
+ILLUMINATION_GRID = (8, 6)
+MIN_BLOB_AREA = 500  # full-resolution pixels a changed region needs to get a bounding box
+
+
+class MotionResult:
+    """
+    What one analyzed frame changed.
+
+    score is the detector score; changed_fraction the share of analyzed
+    pixels above threshold; boxes the (x, y, w, h) of each changed region
+    of at least min_area pixels, largest first; centroid the area-weighted
+    (x, y) centre of those regions, or None. Coordinates are full-frame
+    pixels. zone_scores maps each include zone's name to the score of the
+    change inside its bounding rectangle. Test .score or .boxes explicitly:
+    a high score can come with no boxes when every region is below min_area.
+    """
+
+    __slots__ = ("score", "changed_fraction", "boxes", "centroid", "zone_scores")
+
+    def __init__(self, score, changed_fraction=0.0, boxes=(), centroid=None, zone_scores=None):
+        self.score = score
+        self.changed_fraction = changed_fraction
+        self.boxes = boxes
+        self.centroid = centroid
+        self.zone_scores = zone_scores if zone_scores is not None else {}
+
+    def __repr__(self):
+        return (f"MotionResult(score={self.score:.0f}, changed={self.changed_fraction:.1%}, "
+                f"boxes={len(self.boxes)}, centroid={self.centroid})")
+
+
+def downscale_gray(frame, width):
+    """
+    Returns a grayscale copy of frame at most `width` pixels wide, and the
+    full-to-small pixel area ratio (1.0 when no downscale is needed).
+    Packed YUYV frames are resized as-is and their luma channel taken, with
+    no color conversion at all.
+    """
+    height, full_width = frame.shape[:2]
+    small = frame
+    if width and full_width > width:
+        size = (width, max(1, round(height * width / full_width)))
+        # Bilinear sampling is ~25x cheaper than INTER_AREA here; the blur that follows absorbs the aliasing
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)
+    if is_yuyv(small):
+        gray = cv2.extractChannel(small, 0)
+    else:
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    area_ratio = (full_width * height) / float(gray.shape[0] * gray.shape[1])
+    return gray, area_ratio
+
+
+class GrayDetector:
+    """
+    Base for detectors that work on a downscaled, blurred gray copy of each frame.
+
+    Subclasses implement _score(gray, area_ratio). Scores are in
+    full-resolution units (255 per changed full-size pixel), so thresholds
+    tuned on the old full-frame np.sum keep their meaning at any width.
+    With zones set, frames are cropped to the zones' bounding rectangle
+    before anything else and excluded pixels are masked out of the count.
+
+    Lights switching on or the camera's auto-exposure shift the whole
+    frame at once. Each frame is reduced to an 8x6 grid of cell means and
+    compared with the grid of the detector's reference; when the mean moves
+    by illumination_shift or more and nearly every cell moved with it, the
+    change is global. The subclass rebases its reference onto the new
+    brightness via _rebase(gray, gain) and the frame scores 0.
+    """
+
+    name = None
+    # Weight of each new frame in the reference grid; follows the backend's own learning rate
+    illumination_alpha = 1.0
+
+    def __init__(self, width=320, pixel_threshold=PIXEL_THRESHOLD, blur=5,
+                 illumination_shift=ILLUMINATION_SHIFT, illumination_coverage=ILLUMINATION_COVERAGE):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.blur = blur
+        self.illumination_shift = illumination_shift
+        self.illumination_coverage = illumination_coverage
+        self.zones = None
+        self._mask = None
+        self._cells = None
+        self._thresh = None  # last thresholded, masked change map, kept for analyze()
+        self._geometry = (0, 0, 1.0, 1.0)  # analysis-to-full-frame offset and scale
+        self._analyzed_area = 0  # full-resolution pixels the last frame was scored over
+        self._full_shape = None
+        self.frames = 0
+        self.illumination_suppressed = 0
+
+    def reset(self):
+        pass
+
+    def close(self):
+        """Releases worker threads, if the backend has any."""
+
+    def set_zones(self, zones):
+        """Restricts analysis to zones (a list of zones.Zone); an empty list analyzes the whole frame."""
+        self.zones = ZoneMask(zones) if zones else None
+        self._mask = None
+        self._cells = None
+        self.reset()
+
+    def prepare(self, frame):
+        """Returns the blurred small gray frame and its area ratio."""
+        full_shape = self._full_shape = frame.shape
+        width = self.width
+        x0 = y0 = 0
+        if self.zones is not None:
+            x0, y0, x1, y1 = self.zones.roi(full_shape)
+            frame = frame[y0:y1, x0:x1]
+            if width and full_shape[1] > width:
+                # Keep the full frame's scale so the crop is analyzed at the same density
+                width = max(1, round((x1 - x0) * width / full_shape[1]))
+            else:
+                width = 0
+        gray, area_ratio = downscale_gray(frame, width)
+        if self.blur:
+            gray = cv2.GaussianBlur(gray, (self.blur, self.blur), 0)
+        self._mask = self.zones.mask(full_shape, gray.shape) if self.zones is not None else None
+        self._geometry = (x0, y0, frame.shape[1] / gray.shape[1], frame.shape[0] / gray.shape[0])
+        analyzed = cv2.countNonZero(self._mask) if self._mask is not None else gray.size
+        self._analyzed_area = analyzed * area_ratio
+        return gray, area_ratio
+
+    def score(self, frame):
+        """Scores frame. Returns None while the detector has no reference yet."""
+        gray, area_ratio = self.prepare(frame)
+        self._thresh = None
+        if self._global_change(gray):
+            self.illumination_suppressed += 1
+            return 0
+        score = self._score(gray, area_ratio)
+        if score is not None:
+            self.frames += 1
+        return score
+
+    def analyze(self, frame, min_area=MIN_BLOB_AREA):
+        """
+        Scores frame and describes where it changed. Returns a MotionResult,
+        or None while the detector has no reference yet.
+
+        Regions come from connectedComponentsWithStats on the change map the
+        score was counted from, so the only extra work is one labelling pass
+        over the small frame, and none at all for frames without change.
+        """
+        score = self.score(frame)
+        if score is None:
+            return None
+        thresh = self._thresh
+        if not score or thresh is None:
+            return MotionResult(score)
+        x0, y0, sx, sy = self._geometry
+        changed_fraction = min(1.0, score / (255 * self._analyzed_area)) if self._analyzed_area else 0.0
+        zone_scores = self._zone_scores(thresh)
+
+        count, _, stats, centroids = cv2.connectedComponentsWithStats(thresh, connectivity=8)
+        min_pixels = min_area / (sx * sy)
+        blobs = sorted((i for i in range(1, count) if stats[i, cv2.CC_STAT_AREA] >= min_pixels),
+                       key=lambda i: stats[i, cv2.CC_STAT_AREA], reverse=True)
+        if not blobs:
+            return MotionResult(score, changed_fraction, zone_scores=zone_scores)
+        boxes = tuple(
+            (x0 + int(round(stats[i, cv2.CC_STAT_LEFT] * sx)), y0 + int(round(stats[i, cv2.CC_STAT_TOP] * sy)),
+             int(round(stats[i, cv2.CC_STAT_WIDTH] * sx)), int(round(stats[i, cv2.CC_STAT_HEIGHT] * sy)))
+            for i in blobs
+        )
+        total = float(sum(stats[i, cv2.CC_STAT_AREA] for i in blobs))
+        cx = sum(centroids[i, 0] * stats[i, cv2.CC_STAT_AREA] for i in blobs) / total
+        cy = sum(centroids[i, 1] * stats[i, cv2.CC_STAT_AREA] for i in blobs) / total
+        centroid = (x0 + int(round((cx + 0.5) * sx)), y0 + int(round((cy + 0.5) * sy)))
+        return MotionResult(score, changed_fraction, boxes, centroid, zone_scores)
+
+    def fired_zones(self, result, default_threshold):
+        """
+        Returns the include zones whose score in result beat their own
+        threshold (or default_threshold), in zone order. Without include
+        zones returns None, and the whole-frame score decides.
+        """
+        rects = self.zones.rects(self._full_shape) if self.zones is not None and self._full_shape else ()
+        if not rects:
+            return None
+        fired = []
+        for zone, *_ in rects:
+            threshold = zone.threshold if zone.threshold is not None else default_threshold
+            if result.zone_scores.get(zone.name, 0) > threshold:
+                fired.append(zone)
+        return fired
+
+    def _zone_scores(self, thresh):
+        """
+        Scores every include zone over its bounding rectangle. One integral
+        image of the change map answers each rectangle with four lookups, so
+        dozens of zones cost about the same as one.
+        """
+        rects = self.zones.rects(self._full_shape) if self.zones is not None else ()
+        if not rects:
+            return {}
+        x0, y0, sx, sy = self._geometry
+        height, width = thresh.shape
+        integral = cv2.integral(thresh, sdepth=cv2.CV_64F)
+        scores = {}
+        for zone, zx0, zy0, zx1, zy1 in rects:
+            c0, c1 = (min(width, max(0, round((x - x0) / sx))) for x in (zx0, zx1))
+            r0, r1 = (min(height, max(0, round((y - y0) / sy))) for y in (zy0, zy1))
+            total = integral[r1, c1] - integral[r0, c1] - integral[r1, c0] + integral[r0, c0]
+            scores[zone.name] = float(total) * sx * sy  # sums of 255s, scaled to full-resolution pixels
+        return scores
+
+    def _global_change(self, gray):
+        """True when gray differs from the reference only by a frame-wide brightness shift."""
+        if not self.illumination_shift:
+            return False
+        cells = cv2.resize(gray, ILLUMINATION_GRID, interpolation=cv2.INTER_AREA).astype("float32")
+        reference = self._cells
+        if reference is None or reference.shape != cells.shape:
+            self._cells = cells
+            return False
+        delta = cells - reference
+        shift = float(delta.mean())
+        if abs(shift) < self.illumination_shift or not self._has_reference(gray):
+            cv2.accumulateWeighted(cells, reference, self.illumination_alpha)
+            return False
+        # Localized motion moves a few cells a lot; lighting moves (nearly) all of them the same way
+        together = (delta * shift > 0) & (abs(delta) >= abs(shift) / 2)
+        if together.mean() < self.illumination_coverage:
+            cv2.accumulateWeighted(cells, reference, self.illumination_alpha)
+            return False
+        self._rebase(gray, (float(cells.mean()) + 1.0) / (float(reference.mean()) + 1.0))
+        self._cells = cells
+        return True
+
+    def _has_reference(self, gray):
+        """Whether the backend has something of gray's shape to compare against."""
+        return True
+
+    def _rebase(self, gray, gain):
+        """Moves the reference onto gray's brightness; gain is new mean over old mean."""
+        self.reset()
+
+    def stats(self):
+        checked = self.frames + self.illumination_suppressed
+        return {
+            "frames": self.frames,
+            "illumination_suppressed": self.illumination_suppressed,
+            "illumination_rate": round(self.illumination_suppressed / checked, 4) if checked else 0.0,
+        }
+
+    def _score(self, gray, area_ratio):
+        raise NotImplementedError
+
+    def _count(self, diff, area_ratio):
+        _, thresh = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        if self._mask is not None:
+            thresh = cv2.bitwise_and(thresh, self._mask)
+        self._thresh = thresh
+        return cv2.countNonZero(thresh) * 255 * area_ratio
+
+
+class FrameDiffDetector(GrayDetector):
+    """
+    Pairwise difference against the previous analyzed frame.
+
+    Each frame is prepared once and cached as the reference for the next
+    call, so a step costs one small absdiff and threshold.
+    """
+
+    name = "diff"
+
+    def __init__(self, width=320, pixel_threshold=PIXEL_THRESHOLD, blur=5, **illumination):
+        super().__init__(width, pixel_threshold, blur, **illumination)
+        self._reference = None
+
+    def reset(self):
+        self._reference = None
+
+    def _has_reference(self, gray):
+        return self._reference is not None and self._reference.shape == gray.shape
+
+    def _rebase(self, gray, gain):
+        self._reference = gray  # skip this pair; the next frame compares against the new lighting
+
+    def _score(self, gray, area_ratio):
+        reference, self._reference = self._reference, gray
+        if reference is None or reference.shape != gray.shape:
+            return None
+        return self._count(cv2.absdiff(reference, gray), area_ratio)
+
+
+class RunningAverageDetector(GrayDetector):
+    """
+    Compares each frame with an exponential running average of the scene.
+
+    Slow movers keep differing from the background even when consecutive
+    frames barely change, and brief flicker is averaged into the model.
+    alpha is the weight of each new frame in the model.
+    """
+
+    name = "average"
+
+    def __init__(self, width=320, pixel_threshold=PIXEL_THRESHOLD, blur=5, alpha=0.05, **illumination):
+        super().__init__(width, pixel_threshold, blur, **illumination)
+        self.alpha = alpha
+        self.illumination_alpha = alpha
+        self._model = None
+
+    def reset(self):
+        self._model = None
+
+    def _has_reference(self, gray):
+        return self._model is not None and self._model.shape == gray.shape
+
+    def _rebase(self, gray, gain):
+        # Renormalize the learned scene to the new exposure instead of relearning it
+        cv2.multiply(self._model, gain, dst=self._model)
+
+    def _score(self, gray, area_ratio):
+        if self._model is None or self._model.shape != gray.shape:
+            self._model = gray.astype("float32")
+            return None
+        score = self._count(cv2.absdiff(gray, cv2.convertScaleAbs(self._model)), area_ratio)
+        cv2.accumulateWeighted(gray, self._model, self.alpha)
+        return score
+
+
+class SubtractorDetector(GrayDetector):
+    """
+    OpenCV MOG2 or KNN background subtractor.
+
+    The per-pixel mixture model adapts to repetitive change such as
+    swaying leaves. Shadow pixels (marked 127) are not counted. Scores
+    are withheld for the first `warmup` frames while the model settles.
+    A global lighting change restarts the model, as it cannot be rescaled.
+    """
+
+    def __init__(self, kind="mog2", width=320, blur=5, history=500, var_threshold=None,
+                 detect_shadows=True, warmup=10, **illumination):
+        super().__init__(width, pixel_threshold=200, blur=blur, **illumination)
+        if kind not in ("mog2", "knn"):
+            raise ValueError(f"Unknown background subtractor: {kind}")
+        self.name = kind
+        self.history = history
+        self.illumination_alpha = 1.0 / max(1, history)
+        self.var_threshold = var_threshold
+        self.detect_shadows = detect_shadows
+        self.warmup = warmup
+        self.reset()
+
+    def reset(self):
+        if self.name == "mog2":
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(
+                history=self.history, varThreshold=self.var_threshold or 16, detectShadows=self.detect_shadows)
+        else:
+            self._subtractor = cv2.createBackgroundSubtractorKNN(
+                history=self.history, dist2Threshold=self.var_threshold or 400.0,
+                detectShadows=self.detect_shadows)
+        self._seen = 0
+        self._shape = None
+
+    def _has_reference(self, gray):
+        return self._shape == gray.shape
+
+    def _score(self, gray, area_ratio):
+        if self._shape is not None and self._shape != gray.shape:
+            self.reset()
+        self._shape = gray.shape
+        mask = self._subtractor.apply(gray)
+        self._seen += 1
+        if self._seen <= self.warmup:
+            return None
+        return self._count(mask, area_ratio)
+
+
+class TiledDetector(GrayDetector):
+    """
+    Coarse-to-fine frame diff for high-resolution cameras.
+
+    A pass at analysis width finds changed regions; only the full-resolution
+    tiles overlapping them are diffed again, on a thread pool (OpenCV
+    releases the GIL), to confirm the change and place the boxes. An idle
+    scene costs one small diff, and an active one scales with the area that
+    moved rather than the frame size. Scores count confirmed full-resolution
+    pixels, so they compare with the other backends.
+    """
+
+    name = "tiled"
+
+    def __init__(self, width=320, pixel_threshold=PIXEL_THRESHOLD, blur=5, tile=256, workers=4,
+                 **illumination):
+        super().__init__(width, pixel_threshold, blur, **illumination)
+        self.tile = tile
+        self.workers = workers
+        self._pool = None
+        self._coarse = None
+        self._previous = None
+        self._frame = None
+        self._full_mask = None
+        self.tiles_checked = 0
+        self.tiles_total = 0
+
+    def reset(self):
+        self._coarse = None
+        self._previous = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def prepare(self, frame):
+        crop = frame
+        if self.zones is not None:
+            x0, y0, x1, y1 = self.zones.roi(frame.shape)
+            crop = frame[y0:y1, x0:x1]
+        # Tiles are cut from the (cropped) full-resolution frame, kept by reference
+        self._frame = crop
+        self._full_mask = self.zones.mask(frame.shape, crop.shape) if self.zones is not None else None
+        return super().prepare(frame)
+
+    def _has_reference(self, gray):
+        return self._coarse is not None and self._coarse.shape == gray.shape
+
+    def _rebase(self, gray, gain):
+        self._coarse, self._previous = gray, self._frame
+
+    def _score(self, gray, area_ratio):
+        coarse, self._coarse = self._coarse, gray
+        previous, current = self._previous, self._frame
+        self._previous = current
+        if coarse is None or coarse.shape != gray.shape or previous.shape != current.shape:
+            return None
+
+        _, thresh = cv2.threshold(cv2.absdiff(coarse, gray), self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        if self._mask is not None:
+            thresh = cv2.bitwise_and(thresh, self._mask)
+        rows, cols = -(-current.shape[0] // self.tile), -(-current.shape[1] // self.tile)
+        self.tiles_total += rows * cols
+        if not cv2.countNonZero(thresh):
+            return 0
+
+        tiles = self._active_tiles(thresh, current.shape, rows, cols)
+        self.tiles_checked += len(tiles)
+        if len(tiles) > 1 and self.workers > 1:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="MotionTile")
+            changed = list(self._pool.map(lambda box: self._diff_tile(previous, current, box), tiles))
+        else:
+            changed = [self._diff_tile(previous, current, box) for box in tiles]
+
+        # Assemble the confirmed change over the active tiles' bounding rectangle for analyze()
+        left = min(x for x, _, _, _ in tiles)
+        top = min(y for _, y, _, _ in tiles)
+        right = max(x + w for x, _, w, _ in tiles)
+        bottom = max(y + h for _, y, _, h in tiles)
+        canvas = np.zeros((bottom - top, right - left), np.uint8)
+        for (x, y, w, h), tile in zip(tiles, changed):
+            canvas[y - top:y - top + h, x - left:x - left + w] = tile
+        self._thresh = canvas
+        self._mask = None
+        x0, y0 = self._geometry[:2]
+        self._geometry = (x0 + left, y0 + top, 1.0, 1.0)
+        return cv2.countNonZero(canvas) * 255
+
+    def _active_tiles(self, thresh, full_shape, rows, cols):
+        """Returns (x, y, w, h) of the full-resolution tiles overlapping the coarse change."""
+        height, width = full_shape[:2]
+        sy, sx = height / thresh.shape[0], width / thresh.shape[1]
+        margin = self.blur  # blurred edges can shift a region by up to the kernel size
+        count, _, stats, _ = cv2.connectedComponentsWithStats(thresh, connectivity=8)
+        active = np.zeros((rows, cols), bool)
+        for i in range(1, count):
+            x, y, w, h = stats[i, :4]
+            c0 = max(0, int((x - margin) * sx) // self.tile)
+            r0 = max(0, int((y - margin) * sy) // self.tile)
+            c1 = min(cols - 1, int((x + w + margin) * sx) // self.tile)
+            r1 = min(rows - 1, int((y + h + margin) * sy) // self.tile)
+            active[r0:r1 + 1, c0:c1 + 1] = True
+        rows_on, cols_on = np.nonzero(active)
+        return [(c * self.tile, r * self.tile, min(self.tile, width - c * self.tile),
+                 min(self.tile, height - r * self.tile)) for r, c in zip(rows_on.tolist(), cols_on.tolist())]
+
+    def _diff_tile(self, previous, current, box):
+        x, y, w, h = box
+        a, b = previous[y:y + h, x:x + w], current[y:y + h, x:x + w]
+        if is_yuyv(a):
+            a, b = cv2.extractChannel(a, 0), cv2.extractChannel(b, 0)
+        elif a.ndim == 3:
+            a, b = cv2.cvtColor(a, cv2.COLOR_BGR2GRAY), cv2.cvtColor(b, cv2.COLOR_BGR2GRAY)
+        if self.blur:
+            a, b = cv2.GaussianBlur(a, (self.blur, self.blur), 0), cv2.GaussianBlur(b, (self.blur, self.blur), 0)
+        _, thresh = cv2.threshold(cv2.absdiff(a, b), self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        if self._full_mask is not None:
+            thresh = cv2.bitwise_and(thresh, self._full_mask[y:y + h, x:x + w])
+        return thresh
+
+    def stats(self):
+        stats = super().stats()
+        stats["tiles_checked"] = self.tiles_checked
+        stats["tile_ratio"] = round(self.tiles_checked / self.tiles_total, 4) if self.tiles_total else 0.0
+        return stats
+
+
+def draw_motion(frame, result, color=(0, 0, 255)):
+    """Returns a copy of frame with result's boxes and centroid drawn on it."""
+    frame = frame.copy()
+    for x, y, w, h in result.boxes:
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+    if result.centroid is not None:
+        cv2.circle(frame, result.centroid, 4, color, -1)
+    return frame
+
+
+DETECTORS = {
+    "diff": FrameDiffDetector,
+    "average": RunningAverageDetector,
+    "tiled": TiledDetector,
+    "mog2": lambda **kw: SubtractorDetector("mog2", **kw),
+    "knn": lambda **kw: SubtractorDetector("knn", **kw),
+}
+
+
+def create_detector(name="diff", zones=None, **params):
+    """Builds a detector backend by name; unknown names raise ValueError."""
+    try:
+        factory = DETECTORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown motion detector '{name}'; choose one of {', '.join(DETECTORS)}") from None
+    detector = factory(**params)
+    if zones:
+        detector.set_zones(zones)
+    return detector
+
+
+class TemporalFilter:
+    """
+    N-of-M consistency check on detector scores.
+
+    fires only once k of the last n analyzed frames were above threshold,
+    so a single noisy frame pair no longer starts a clip. The window is a
+    fixed bytearray ring. A burst of hits that dies out without ever firing
+    is counted in `rejected`: each one is a record, encode and upload saved.
+    """
+
+    def __init__(self, k=3, n=5):
+        if not 1 <= k <= n:
+            raise ValueError(f"Temporal filter needs 1 <= k <= n, got k={k}, n={n}")
+        self.k = k
+        self.n = n
+        self._window = bytearray(n)
+        self._pos = 0
+        self._hits = 0
+        self._burst = False  # a hit was seen since the window was last empty
+        self._burst_fired = False
+        self.fired = 0
+        self.rejected = 0
+
+    def reset(self):
+        self._window = bytearray(self.n)
+        self._pos = 0
+        self._hits = 0
+        self._burst = self._burst_fired = False
+
+    @property
+    def confidence(self):
+        """Fraction of the window currently above threshold."""
+        return self._hits / self.n
+
+    def update(self, hit):
+        """Adds one frame's verdict. Returns True while at least k of the last n frames were hits."""
+        hit = 1 if hit else 0
+        self._hits += hit - self._window[self._pos]
+        self._window[self._pos] = hit
+        self._pos = (self._pos + 1) % self.n
+
+        if hit:
+            self._burst = True
+        ok = self._hits >= self.k
+        if ok and not self._burst_fired:
+            self._burst_fired = True
+            self.fired += 1
+        if self._hits == 0 and self._burst:
+            if not self._burst_fired:
+                self.rejected += 1
+            self._burst = self._burst_fired = False
+        return ok
+
+    def stats(self):
+        return {"k": self.k, "n": self.n, "fired": self.fired, "rejected": self.rejected}
@@ -0,0 +1,383 @@
+# mp_pipeline.py
+import os
+import time
+import queue
+import itertools
+import threading
+import multiprocessing as mp
+import tracelog as T
+from capture import to_bgr
+from recorder import MB
+from cameras import CameraPipeline, CAPTURE_STATS_INTERVAL, DETECTOR_SETTINGS, CAMERA_MODE_SETTINGS
+from mp_stages import (SharedFrameRing, probe_frame_shape, process_cpu_seconds, _capture_stage, _analysis_stage,
+                       _recorder_stage, STAGE_STOP_TIMEOUT, SOURCE_ENDED)
+
+STAGES = ("capture", "analysis", "recorder")
+RESTART_BACKOFF = (1, 2, 5, 10, 30)  # seconds before the 1st, 2nd, ... consecutive restart of a stage
+STABLE_SECONDS = 60  # a stage that has run this long gets its restart backoff reset
+
+
+class RecorderProxy:
+    """
+    Parent-side stand-in for a recorder process, handed to on_motion in place
+    of a Recorder.
+
+    trigger() claims the shared recording flag and queues the event; the
+    recorder process clears the flag once the clip is done. Only a token and
+    detected_at cross to the process, and the fields it adds (ended_at,
+    clip_bytes, keyframes, poster, thumbnail) are merged back into the
+    original event dict by finish().
+    """
+
+    def __init__(self, commands, recording):
+        self._commands = commands
+        self._recording = recording
+        self._events = {}
+        self._tokens = itertools.count(1)
+
+    @property
+    def is_recording(self):
+        return bool(self._recording.value)
+
+    def trigger(self, event):
+        """Queues a clip for event. Returns False if a clip is already pending or being written."""
+        with self._recording.get_lock():
+            if self._recording.value:
+                return False
+            self._recording.value = 1
+        token = next(self._tokens)
+        self._events[token] = event
+        self._commands.put(("trigger", {"token": token, "detected_at": event["detected_at"]}))
+        return True
+
+    def notify_motion(self, timestamp=None):
+        """Extends the clip being written. Returns False when no clip is in progress."""
+        if not self.is_recording:
+            return False
+        self._commands.put(("motion", timestamp if timestamp is not None else time.time()))
+        return True
+
+    def observe_seq(self, score, seq, timestamp):
+        """Offers the ring frame seq as a keyframe candidate for the clip in progress."""
+        self._commands.put(("observe", score, seq, timestamp))
+
+    def finish(self, recorded):
+        """Merges a recorded event back into the event it was triggered with and returns that event."""
+        event = self._events.pop(recorded.pop("token", None), None)
+        if event is None:
+            return recorded
+        event.update(recorded)
+        return event
+
+    def reset(self):
+        """
+        Drops the clips a dead recorder process will never finish and marks
+        their events failed in the event index. Returns how many were lost.
+        """
+        from events import get_store
+        self._recording.value = 0
+        lost, self._events = list(self._events.values()), {}
+        for event in lost:
+            if event.get("id") is None:
+                continue
+            try:
+                get_store().update_event(event["id"], delivery="failed")
+            except Exception as e:
+                T.error(f"Event index update failed: {e}")
+        return len(lost)
+
+
+class _Stage:
+    __slots__ = ("name", "process", "stop_event", "started_at", "retry_at", "failures", "restarts")
+
+    def __init__(self, name):
+        self.name = name
+        self.process = None
+        self.stop_event = None
+        self.started_at = 0.0
+        self.retry_at = 0.0
+        self.failures = 0  # consecutive, for the backoff
+        self.restarts = 0
+
+
+class ProcessPipeline(CameraPipeline):
+    """
+    A CameraPipeline whose capture, analysis and recording each run in their
+    own process, so OpenCV work never holds the GUI's GIL and a crash takes
+    down one stage rather than the application.
+
+    Frames travel through a SharedFrameRing instead of pickled queues; only
+    small messages (scores, boxes, clip paths) cross the queues. This object
+    stays in the parent: run() makes the cooldown decision, calls on_motion
+    with a RecorderProxy, hands finished clips to on_clip, feeds on_frame
+    while a clip is being written, and supervises the stages, restarting
+    any that exits with backoff. The ring outlives stage restarts, so a
+    restarted capture process carries on the same sequence. When a finite
+    source (see sources.py) runs out, run() returns instead.
+
+    source is anything sources.open_source() accepts that can be pickled: a
+    device index, a source string, or a module-level callable. Stages are
+    spawned rather than forked, since the parent runs Qt and network threads.
+    """
+
+    def __init__(self, name, source, overrides=None, on_motion=None, on_clip=None, on_frame=None, clips_dir="clips",
+                 on_camera_status=None):
+        super().__init__(name, None, overrides, on_motion=on_motion, on_clip=on_clip, on_frame=on_frame,
+                         clips_dir=clips_dir, source=source, on_camera_status=on_camera_status)
+        self.outages = 0
+        self.downtime = 0.0
+        self.event_latency_ms = None  # capture of the firing frame to on_motion, for the latest event
+        self._ctx = mp.get_context("spawn")
+        self._stages = {}
+        self.ended = False  # the source ran out
+        self._stage_stats = {}  # latest stats message from the analysis and recorder processes
+        self._events = self._commands = self._results = self._recording = None
+        self._controls = None  # reloaded settings for the analysis process
+        self._stop_lock = threading.Lock()
+
+    def start(self):
+        """Sizes the shared ring from a probe frame and starts the stage processes. Raises IOError."""
+        settings = self.settings()
+        shape = probe_frame_shape(self.source, settings)
+        self.ring = SharedFrameRing.for_shape(shape)
+        self._events = self._ctx.Queue()
+        self._commands = self._ctx.Queue()
+        self._controls = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._recording = self._ctx.Value("b", 0)
+        self.recorder = RecorderProxy(self._commands, self._recording)
+        for name in STAGES:
+            self._stages[name] = _Stage(name)
+            self._start_stage(name)
+        T.info(f"[🧩] Camera '{self.name}' pipeline started as processes "
+               f"({shape[1]}x{shape[0]}, {self.ring.nbytes / MB:.0f} MB shared frame ring).")
+
+    def _stage_args(self, name, settings):
+        if name == "capture":
+            return _capture_stage, (self.ring.spec, self.source, settings, self.name, self._events)
+        if name == "analysis":
+            return _analysis_stage, (self.ring.spec, settings, self._events, self._commands, self._controls,
+                                     self._recording)
+        return _recorder_stage, (self.ring.spec, settings, self.clips_dir, self.name, self._commands, self._results,
+                                 self._recording)
+
+    def _start_stage(self, name):
+        stage = self._stages[name]
+        target, args = self._stage_args(name, self.settings())
+        stage.stop_event = self._ctx.Event()
+        stage.process = self._ctx.Process(target=target, args=args + (stage.stop_event, os.getpid()),
+                                          name=f"{name.capitalize()}-{self.name}", daemon=True)
+        stage.process.start()
+        stage.started_at = time.monotonic()
+
+    def _stop_stages(self, stages):
+        for stage in stages:
+            if stage.stop_event is not None:
+                stage.stop_event.set()
+        deadline = time.monotonic() + STAGE_STOP_TIMEOUT
+        while any(s.process is not None and s.process.is_alive() for s in stages) and time.monotonic() < deadline:
+            self._drain(None, timeout=0.05)  # keep the queues moving so stages can flush and exit
+        for stage in stages:
+            if stage.process is not None and stage.process.is_alive():
+                T.warning(f"[🧩] {stage.process.name} did not stop in {STAGE_STOP_TIMEOUT}s; terminating it.")
+                stage.process.terminate()
+                stage.process.join(timeout=1.0)
+            stage.process = None
+        self._drain(None, timeout=0)
+
+    def _restart_stage(self, name, reason):
+        T.info(f"[🧩] Restarting {name} process of '{self.name}': {reason}.")
+        self._stop_stages([self._stages[name]])
+        self._start_stage(name)
+
+    def _supervise(self):
+        """Restarts stages that exited on their own, with backoff between repeated failures."""
+        now = time.monotonic()
+        for stage in self._stages.values():
+            process = stage.process
+            if process is not None and process.is_alive():
+                if stage.failures and now - stage.started_at >= STABLE_SECONDS:
+                    stage.failures = 0
+                continue
+            if process is not None:
+                stage.process = None
+                if stage.name == "capture" and process.exitcode == SOURCE_ENDED:
+                    T.info(f"[📷] Source for '{self.name}' ended.")
+                    self.ended = True
+                    continue
+                stage.restarts += 1
+                delay = RESTART_BACKOFF[min(stage.failures, len(RESTART_BACKOFF) - 1)]
+                stage.failures += 1
+                stage.retry_at = now + delay
+                T.error(f"[🧩] {process.name} exited (code {process.exitcode}); restarting it in {delay}s.")
+                if stage.name == "recorder":
+                    self._drain_results()  # hand off clips it finished before exiting
+                    if self.recorder.reset():
+                        T.warning(f"[🎥] Clip in progress on '{self.name}' was lost with its recorder process.")
+            elif now >= stage.retry_at:
+                self._start_stage(stage.name)
+
+    def _apply_settings(self, old, new):
+        """Applies a settings reload: restarts the stages it affects, reconfigures the recorder in place."""
+        changes = old.diff(new)
+        if changes.keys() & CAMERA_MODE_SETTINGS:
+            self._restart_stage("capture", "camera mode changed")
+        if changes.keys() & DETECTOR_SETTINGS:
+            self._restart_stage("analysis", "detector settings changed")
+        # Thresholds such as MOTION_SCORE apply from the next analyzed frame. A restarted process
+        # drains this too, so the newest settings win over any it did not get to before.
+        self._controls.put(new)
+        self._commands.put(("settings", new))
+        return False
+
+    def run(self, active_event):
+        """Handles stage messages and supervises the stages until active_event clears."""
+        self._analysis_thread = None  # analysis CPU is measured per process
+        settings = self.settings()
+        last_stats_ts = time.time()
+        try:
+            while active_event.is_set() and not self.ended:
+                # Hold the stop lock for each pass so a stop() from another thread cannot free the
+                # stages or the ring underneath it
+                with self._stop_lock:
+                    if self.ring is None:
+                        break
+                    current_settings = self.settings()
+                    if current_settings is not settings:
+                        self._apply_settings(settings, current_settings)
+                        settings = current_settings
+                    self._supervise()
+                    self._drain(settings, timeout=0.05)
+                    if self.on_frame is not None and self.recorder.is_recording:
+                        latest = self.ring.latest()
+                        if latest is not None:
+                            self.on_frame(to_bgr(latest[2]))
+                if time.time() - last_stats_ts >= CAPTURE_STATS_INTERVAL:
+                    last_stats_ts = time.time()
+                    T.debug(f"[📷] Camera '{self.name}' stats: {self.stats()}")
+        finally:
+            self.stop()
+
+    def _drain(self, settings, timeout):
+        """Handles queued analysis and recorder messages; settings=None discards motion results."""
+        try:
+            message = self._events.get(timeout=timeout) if timeout else self._events.get_nowait()
+            while True:
+                if message[0] == "stats":
+                    self._stage_stats["analysis"] = message[1]
+                elif message[0] == "camera":
+                    self._on_camera(*message[1:])
+                elif settings is not None:
+                    self._on_result(settings, *message[1:])
+                message = self._events.get_nowait()
+        except queue.Empty:
+            pass
+        self._drain_results()
+
+    def _drain_results(self):
+        """Handles queued recorder messages: finished clips and stats."""
+        try:
+            while True:
+                message = self._results.get_nowait()
+                if message[0] == "stats":
+                    self._stage_stats["recorder"] = message[1]
+                else:
+                    self._on_recorded(*message[1:])
+        except queue.Empty:
+            pass
+
+    def _on_result(self, settings, seq, timestamp, result, zones, hit, confirmed, confidence):
+        if result.boxes:
+            self.last_result = (timestamp, result)
+        if not hit:
+            return
+        T.info(f"[DEBUG] Motion detected ({self.name})")
+        now = time.time()
+        cooldown = settings.cooldown
+
+        if self.recorder.is_recording:
+            # The analysis process has already extended the clip
+            T.info(f"[🎥] Motion continues on '{self.name}' — extending current clip.")
+        elif not confirmed:
+            T.debug(f"[🔍] Motion candidate on '{self.name}' at {confidence:.0%} — waiting for more frames.")
+        elif (now - self.last_alert_time) > cooldown:
+            entry = self.ring.get(seq) if settings.snapshot_alerts else None
+            snapshot = entry[2] if entry is not None else None
+            if self.on_motion and self.on_motion(self.recorder, cooldown, snapshot, confidence, result, zones,
+                                                 self.name):
+                self.recorder.observe_seq(result.score, seq, timestamp)
+                self.last_alert_time = now
+                self.event_latency_ms = round((time.time() - timestamp) * 1000, 1)
+                T.info(f"[✔] Motion recording started on '{self.name}' ({confidence:.0%} confidence"
+                       f"{', zones ' + ', '.join(z.name for z in zones) if zones else ''}). Cooldown started.")
+        else:
+            self.suppressed += 1
+            T.info(f"[⏳] Motion detected on '{self.name}' but cooldown is active "
+                   f"({cooldown - (now - self.last_alert_time):.0f}s left).")
+
+    def _on_camera(self, connected, incident):
+        if incident is not None:
+            self.outages += 1
+            self.downtime += incident["ended_at"] - incident["started_at"]
+        try:
+            self._on_connection(connected, incident)
+        except Exception as e:
+            T.error(f"[📷] Camera status callback failed: {e}")
+
+    def _on_recorded(self, recorded, path):
+        event = self.recorder.finish(recorded)
+        if self.on_clip:
+            try:
+                self.on_clip(event, path)
+            except Exception as e:
+                T.error(f"Clip hand-off failed: {e}")
+
+    def stop(self):
+        """
+        Stops every stage, letting the recorder finish its clip, then frees
+        the shared ring. Safe to call from several threads and repeatedly;
+        later callers wait for the first to finish.
+        """
+        with self._stop_lock:
+            if self._stages:
+                self._stop_stages(list(self._stages.values()))
+                self._stages.clear()
+            if self.ring is not None:
+                self.ring.close()
+                self.ring = None
+
+    def detection_stats(self):
+        """The analysis process's temporal filter and detector counts, cooldown suppressions and stage restarts."""
+        stats = dict(self._stage_stats.get("analysis", {}).get("detection", {}))
+        stats["cooldown_suppressed"] = self.suppressed
+        stats["restarts"] = {name: stage.restarts for name, stage in self._stages.items()}
+        return stats
+
+    def resource_stats(self):
+        """CPU used by the stage processes since the last call (percent of one core) and shared/pre-roll memory."""
+        processes = [s.process for s in self._stages.values() if s.process is not None and s.process.is_alive()]
+        cpu = [process_cpu_seconds(p.pid) for p in processes]
+        now = time.monotonic()
+        preroll_bytes = self._stage_stats.get("recorder", {}).get("preroll_bytes", 0)
+        stats = {"memory_mb": round(((self.ring.nbytes if self.ring else 0) + preroll_bytes) / MB, 1)}
+        if cpu and None not in cpu:
+            total = sum(cpu)
+            if self._cpu_mark is not None and now > self._cpu_mark[0]:
+                stats["cpu_percent"] = round(100 * max(0.0, total - self._cpu_mark[1]) / (now - self._cpu_mark[0]), 1)
+            self._cpu_mark = (now, total)
+        return stats
+
+    def stats(self):
+        analysis = self._stage_stats.get("analysis", {})
+        capture = None
+        if self.ring is not None:
+            capture = {"capacity": self.ring.capacity, "produced": self.ring.produced, "fps": round(self.ring.fps, 2),
+                       "read_failures": self.ring.read_failures, "outages": self.outages,
+                       "downtime_seconds": round(self.downtime, 1)}
+        stats = {"capture": capture, "detection": self.detection_stats(), "analyzed": analysis.get("analyzed", 0),
+                 "analysis_dropped": analysis.get("dropped", 0), "latency_ms": analysis.get("latency_ms"),
+                 "analysis_ms": analysis.get("analysis_ms"), "event_latency_ms": self.event_latency_ms,
+                 "clips_written": self._stage_stats.get("recorder", {}).get("clips_written", 0),
+                 "preroll": self._stage_stats.get("recorder", {}).get("preroll")}
+        stats.update(self.resource_stats())
+        return stats
@@ -0,0 +1,385 @@
+# mp_stages.py
+"""
+Code that runs inside the stage processes of a ProcessPipeline: the shared
+frame ring and the capture, analysis and recorder entry points.
+
+Stages are spawned, so each child imports only what unpickling its target
+needs. Keep this module and its imports free of the GUI, the Telegram bot
+and detection.py; ProcessPipeline itself lives in mp_pipeline.py.
+"""
+import os
+import time
+import queue
+from multiprocessing import shared_memory
+import numpy as np
+import cv2
+import tracelog as T
+from capture import CaptureThread, FrameReader, to_bgr
+from recorder import Recorder
+from sources import open_source
+from cameras import (CameraPipeline, RING_BUFFER_FRAMES, FRAME_PAIR_INTERVAL, _create_detector,
+                     _create_temporal_filter, _preroll_for_resolution, _configure_recorder)
+
+STAGE_STOP_TIMEOUT = 10  # seconds a stage gets to finish (e.g. the clip being written) before it is killed
+STAGE_STATS_INTERVAL = 1.0
+PROBE_READS = 10
+SOURCE_ENDED = 3  # capture process exit code for a file/folder/synthetic source that ran out
+
+
+def probe_frame_shape(source, settings):
+    """Opens source just long enough to read one frame in the configured mode and returns its shape."""
+    cap = open_source(source, settings.source_realtime, settings.source_loop)
+    try:
+        if cap is None or not cap.isOpened():
+            raise IOError(f"cannot open camera source {source!r}")
+        for prop, value in ((cv2.CAP_PROP_FRAME_WIDTH, settings.camera_width),
+                            (cv2.CAP_PROP_FRAME_HEIGHT, settings.camera_height),
+                            (cv2.CAP_PROP_FPS, settings.camera_fps)):
+            if value:
+                cap.set(prop, value)
+        for _ in range(PROBE_READS):
+            ret, frame = cap.read()
+            if ret and frame is not None:
+                return frame.shape
+        raise IOError(f"no frame from camera source {source!r}")
+    finally:
+        if cap is not None:
+            cap.release()
+
+
+def process_cpu_seconds(pid):
+    """CPU time a process has used, or None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class SharedFrameRing:
+    """
+    FrameRingBuffer over a multiprocessing.shared_memory block, so a capture
+    process can publish frames that analysis and recorder processes read
+    without pickling them.
+
+    The block holds a small header (next sequence, produced and read-failure
+    counts, capture fps), each slot's sequence, timestamp and shape, and then
+    the frame slots, each sized for a BGR frame of frame_size (packed YUYV
+    frames from a luma capture fit too). The single producer marks a slot as
+    being written, copies the frame in and then publishes it by bumping the
+    sequence counter; readers copy a slot out and re-check its sequence
+    afterwards, so a slot overwritten mid-copy counts as dropped rather than
+    coming back torn. FrameReader works on it unchanged.
+
+    The creating process owns the block and unlinks it on close(); others
+    attach() with the creator's spec.
+    """
+
+    def __init__(self, capacity, frame_size, name=None):
+        if capacity < 2:
+            raise ValueError("Ring buffer capacity must be at least 2 frames.")
+        self.capacity = capacity
+        self.frame_size = tuple(frame_size)  # (width, height) the slots are sized for
+        width, height = self.frame_size
+        self.slot_bytes = width * height * 3
+        header = 32 + 40 * capacity
+        data_offset = -(-header // 64) * 64
+        self._owner = name is None
+        self._shm = shared_memory.SharedMemory(name=name, create=self._owner,
+                                               size=data_offset + capacity * self.slot_bytes if self._owner else 0)
+        buf = self._shm.buf
+        self._counters = np.ndarray((3,), np.int64, buf, 0)  # next_seq, produced, read_failures
+        self._fps = np.ndarray((1,), np.float64, buf, 24)
+        self._seqs = np.ndarray((capacity,), np.int64, buf, 32)
+        self._stamps = np.ndarray((capacity,), np.float64, buf, 32 + 8 * capacity)
+        self._shapes = np.ndarray((capacity, 3), np.int64, buf, 32 + 16 * capacity)
+        self._data = np.ndarray((capacity, self.slot_bytes), np.uint8, buf, data_offset)
+        if self._owner:
+            self._counters[:] = 0
+            self._fps[:] = 0.0
+            self._seqs[:] = -1
+        self._readers = []
+
+    @classmethod
+    def for_shape(cls, shape, capacity=RING_BUFFER_FRAMES):
+        """Creates a ring whose slots fit frames of shape (height, width[, channels])."""
+        return cls(capacity, (shape[1], shape[0]))
+
+    @classmethod
+    def attach(cls, spec):
+        """Opens the ring another process created from its spec."""
+        name, capacity, frame_size = spec
+        return cls(capacity, frame_size, name=name)
+
+    @property
+    def spec(self):
+        """Picklable (name, capacity, frame_size) for attach() in another process."""
+        return self._shm.name, self.capacity, self.frame_size
+
+    @property
+    def next_seq(self):
+        return int(self._counters[0])
+
+    @property
+    def produced(self):
+        return int(self._counters[1])
+
+    @property
+    def read_failures(self):
+        return int(self._counters[2])
+
+    @read_failures.setter
+    def read_failures(self, value):
+        self._counters[2] = value
+
+    @property
+    def fps(self):
+        return float(self._fps[0])
+
+    @fps.setter
+    def fps(self, value):
+        self._fps[0] = value
+
+    def push(self, frame, timestamp=None):
+        """Copies a frame into the next slot and publishes it to readers. Producer process only."""
+        if frame.nbytes > self.slot_bytes:
+            # The camera mode grew past what the ring was sized for
+            frame = cv2.resize(to_bgr(frame), self.frame_size)
+        frame = np.ascontiguousarray(frame)
+        seq = int(self._counters[0])
+        index = seq % self.capacity
+        self._seqs[index] = -1  # readers treat the slot as overwritten while it is being written
+        self._shapes[index] = frame.shape if frame.ndim == 3 else frame.shape + (0,)
+        self._data[index, :frame.nbytes] = frame.reshape(-1)
+        self._stamps[index] = time.time() if timestamp is None else timestamp
+        self._seqs[index] = seq
+        self._counters[0] = seq + 1  # publish after the slot is fully written
+        self._counters[1] += 1
+
+    def get(self, seq):
+        """Returns a (seq, timestamp, frame) copy of seq's slot, or None if it was overwritten."""
+        if seq < 0:
+            return None
+        index = seq % self.capacity
+        if self._seqs[index] != seq:
+            return None
+        height, width, channels = (int(v) for v in self._shapes[index])
+        timestamp = float(self._stamps[index])
+        shape = (height, width, channels) if channels else (height, width)
+        frame = self._data[index, :height * width * max(channels, 1)].reshape(shape).copy()
+        if self._seqs[index] != seq:
+            return None  # overwritten while we were copying
+        return seq, timestamp, frame
+
+    def latest(self):
+        """Returns the newest entry without consuming it, or None if empty."""
+        return self.get(self.next_seq - 1)
+
+    @property
+    def nbytes(self):
+        """Size of the shared block (allocated once, whether or not the slots are filled)."""
+        return self._shm.size
+
+    def reader(self, name):
+        """Creates a consumer cursor in this process, positioned at the next frame to be written."""
+        r = FrameReader(self, name)
+        self._readers.append(r)
+        return r
+
+    def stats(self):
+        """Returns produced/consumed/dropped counters for the ring and this process's readers."""
+        readers = {r.name: {"consumed": r.consumed, "dropped": r.dropped} for r in list(self._readers)}
+        return {
+            "capacity": self.capacity,
+            "produced": self.produced,
+            "consumed": sum(r["consumed"] for r in readers.values()),
+            "dropped": sum(r["dropped"] for r in readers.values()),
+            "readers": readers,
+        }
+
+    def close(self):
+        """Detaches from the block; the creating process also frees it."""
+        self._counters = self._fps = self._seqs = self._stamps = self._shapes = self._data = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # a frame view is still referenced; the mapping goes away with the process
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _should_exit(stop_event, parent_pid):
+    # Stages also exit if the parent died without stopping them
+    return stop_event.is_set() or os.getppid() != parent_pid
+
+
+def _ema(average, value):
+    return value if average is None else 0.9 * average + 0.1 * value
+
+
+def _capture_stage(ring_spec, source, settings, name, events, stop_event, parent_pid):
+    """
+    Capture process: runs a CaptureThread that pushes into the shared ring
+    and reopens the camera in place after sustained read failures, sending
+    its outages to the parent.
+    """
+    ring = SharedFrameRing.attach(ring_spec)
+
+    def reopen():
+        return open_source(source, settings.source_realtime, settings.source_loop)
+
+    cap = reopen()
+    if cap is None or not cap.isOpened():
+        T.error(f"[📷] Capture process cannot open camera '{name}' (source {source!r}).")
+        ring.close()
+        raise SystemExit(1)
+    capture = CaptureThread(cap, ring, name=f"Capture-{name}", luma=settings.capture_luma, reopen=reopen,
+                            on_connection=lambda connected, incident: events.put(("camera", connected, incident)),
+                            reconnect_after=settings.reconnect_after_seconds,
+                            reconnect_max_delay=settings.reconnect_max_delay)
+    capture.request_mode(settings.camera_width, settings.camera_height, settings.camera_fps)
+    capture.start()
+    failures = ring.read_failures  # keep counting across restarts
+    try:
+        while capture.is_alive() and not _should_exit(stop_event, parent_pid):
+            ring.fps = capture.fps
+            ring.read_failures = failures + capture.read_failures
+            stop_event.wait(0.5)
+    finally:
+        capture.stop()
+        capture.cap.release()
+        ring.close()
+    if capture.ended:
+        raise SystemExit(SOURCE_ENDED)
+
+
+def _analysis_stage(ring_spec, settings, events, commands, controls, recording, stop_event, parent_pid):
+    """
+    Analysis process: scores the newest frame, extends and feeds keyframes to
+    a clip in progress directly, and reports hits and boxes to the parent.
+    Reloaded settings arrive on controls; the parent restarts this stage
+    for changes that need a new detector, so only thresholds apply live.
+    """
+    ring = SharedFrameRing.attach(ring_spec)
+    detector = _create_detector(settings)
+    temporal = _create_temporal_filter(settings)
+    reader = ring.reader("analysis")
+    previous = None
+    analyzed = 0
+    latency_ms = analysis_ms = None
+    last_stats_ts = time.time()
+    try:
+        while not _should_exit(stop_event, parent_pid):
+            try:
+                while True:
+                    settings = controls.get_nowait()
+            except queue.Empty:
+                pass
+            current = reader.wait_latest(timeout=1.0)
+            if current is None:
+                continue
+            if previous is None:
+                previous = current
+                detector.score(current[2])  # prime the reference frame
+                continue
+            gap = current[1] - previous[1]
+            if gap < FRAME_PAIR_INTERVAL:
+                time.sleep(FRAME_PAIR_INTERVAL - gap)
+                continue
+            previous = current
+
+            seq, timestamp, frame = current
+            started = time.time()
+            result = detector.analyze(frame)
+            if result is None:
+                continue
+            analyzed += 1
+            zones = detector.fired_zones(result, settings.motion_score)
+            hit = bool(zones) if zones is not None else result.score > settings.motion_score
+            confirmed = temporal.update(hit)
+            if recording.value:
+                # The recorder reads the frame back from the ring by its sequence number
+                commands.put(("observe", result.score, seq, timestamp))
+                if hit:
+                    commands.put(("motion", time.time()))
+            if hit or result.boxes:
+                events.put(("result", seq, timestamp, result, zones, hit, confirmed, temporal.confidence))
+
+            now = time.time()
+            latency_ms = _ema(latency_ms, (now - timestamp) * 1000)
+            analysis_ms = _ema(analysis_ms, (now - started) * 1000)
+            if now - last_stats_ts >= STAGE_STATS_INTERVAL:
+                last_stats_ts = now
+                detection = temporal.stats()
+                detection.update(detector.stats())
+                events.put(("stats", {"analyzed": analyzed, "dropped": reader.dropped,
+                                      "latency_ms": round(latency_ms, 2), "analysis_ms": round(analysis_ms, 2),
+                                      "detection": detection}))
+    finally:
+        detector.close()
+        ring.close()
+
+
+def _apply_recorder_command(recorder, ring, recording, command):
+    """Runs one queued command against the recorder. Returns True if it was a trigger."""
+    kind, *args = command
+    if kind == "trigger":
+        recording.value = 1
+        if not recorder.trigger(args[0]):
+            T.info("[⏳] Recorder busy — motion event not started.")
+        return True
+    if kind == "motion":
+        recorder.notify_motion(args[0])
+    elif kind == "observe":
+        score, seq, timestamp = args
+        entry = ring.get(seq)
+        if entry is not None:
+            recorder.observe(score, entry[2], timestamp)
+    elif kind == "settings":
+        _configure_recorder(recorder, args[0])
+    return False
+
+
+def _recorder_stage(ring_spec, settings, clips_dir, name, commands, results, recording, stop_event, parent_pid):
+    """Recorder process: keeps the pre-roll and writes clips from the shared ring, returning them via results."""
+    ring = SharedFrameRing.attach(ring_spec)
+    width, height = ring.frame_size
+    preroll = _preroll_for_resolution(settings, width, height, ring.fps or settings.camera_fps or 30.0)
+    recorder = Recorder(
+        ring,
+        preroll=preroll,
+        min_seconds=settings.clip_min_seconds,
+        post_roll_seconds=settings.clip_post_roll_seconds,
+        max_seconds=settings.clip_max_seconds,
+        backend=settings.recorder_backend,
+        encoder_options=CameraPipeline._encoder_options(settings),
+        fps_source=lambda: ring.fps,
+        on_clip=lambda event, path: results.put(("clip", event, path)),
+        clips_dir=clips_dir,
+        name=f"Recorder-{name}",
+    )
+    recorder.start()
+    busy = False
+    last_stats_ts = 0.0
+    try:
+        while recorder.is_alive() and not _should_exit(stop_event, parent_pid):
+            try:
+                busy |= _apply_recorder_command(recorder, ring, recording, commands.get(timeout=0.1))
+            except queue.Empty:
+                pass
+            if busy and not recorder.is_recording:
+                busy = False
+                recording.value = 0
+            if time.time() - last_stats_ts >= STAGE_STATS_INTERVAL:
+                last_stats_ts = time.time()
+                results.put(("stats", {"clips_written": recorder.clips_written,
+                                       "preroll_bytes": preroll.nbytes if preroll is not None else 0,
+                                       "preroll": preroll.stats() if preroll is not None else None}))
+    finally:
+        recorder.stop(timeout=STAGE_STOP_TIMEOUT - 1)
+        recording.value = 0
+        ring.close()
@@ -1,5 +1,6 @@
 # notifications.py
 import os
+import time
 import requests
 import tracelog as T
 import smtplib
@@ -8,7 +9,7 @@ from email.mime.base import MIMEBase
 from email.mime.text import MIMEText
 from email import encoders
 from datetime import datetime
-from dotenv import load_dotenv
+from config import get_settings, subscribe
 from threading import Thread
 import threading
 from utils import compress_video
@@ -17,20 +18,25 @@ from utils import compress_video
 EMAIL_MAX_SIZE = 20 * 1024 * 1024      # 20 MB
 TELEGRAM_MAX_SIZE = 50 * 1024 * 1024   # 50 MB
 
-# Load environment variables
-dotenv_path = os.path.join(os.getcwd(), ".env")
-if not os.path.exists(dotenv_path):
-    # Fallback for when the .desktop file's Path setting is ignored or failed
-    dotenv_path = "/opt/motion-detector/.env"
+# Telegram and Email configuration comes from the shared settings and follows .env reloads
+TELEGRAM_TOKEN = None
+TELEGRAM_CHAT_ID = None
+FROM_EMAIL = None
+APP_PASSWORD = None
+fastmail_recipient = None
 
-load_dotenv(dotenv_path=dotenv_path)
 
-# Telegram and Email Configuration (Read from .env)
-TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-FROM_EMAIL = os.getenv("FROM_EMAIL")
-APP_PASSWORD = os.getenv("APP_PASSWORD")
-fastmail_recipient = os.getenv("FASTMAIL_RECIPIENT")
+def _apply_settings(settings):
+    global TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, FROM_EMAIL, APP_PASSWORD, fastmail_recipient
+    TELEGRAM_TOKEN = settings.telegram_token
+    TELEGRAM_CHAT_ID = settings.telegram_chat_id
+    FROM_EMAIL = settings.from_email
+    APP_PASSWORD = settings.app_password
+    fastmail_recipient = settings.fastmail_recipient
+
+
+_apply_settings(get_settings())
+subscribe(lambda old, new, changes: _apply_settings(new))
 
 # Global Variables
 motion_count_today = 0
@@ -120,13 +126,85 @@ def send_telegram_error_alert(message):
     Thread(target=send_telegram_text, args=(message,), daemon=True).start()
 
 
-def send_telegram_alert(message="Motion detected!", video_path=None):
-    def send_telegram_alert_text(message, video_path):
-        if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID:
-            T.error("Telegram credentials missing for motion alert.")
-            return
+def _telegram_message_id(response):
+    """Returns the message_id of a successful Telegram API response, or None."""
+    try:
+        body = response.json()
+        if body.get("ok"):
+            return body["result"]["message_id"]
+    except Exception:
+        pass
+    return None
+
+
+def send_telegram_snapshot(frame, caption="Motion detected!", quality=85):
+    """Sends a JPEG of frame via sendPhoto, falling back to a text message. Returns the message_id."""
+    import cv2
+    if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID:
+        T.error("Telegram credentials missing for snapshot alert.")
+        return None
+
+    try:
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise ValueError("JPEG encode failed")
+        response = requests.post(
+            f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendPhoto",
+            data={"chat_id": TELEGRAM_CHAT_ID, "caption": caption},
+            files={"photo": ("motion.jpg", jpeg.tobytes(), "image/jpeg")},
+            timeout=15
+        )
+        message_id = _telegram_message_id(response)
+        if message_id is not None:
+            T.info("[✔] Telegram snapshot alert sent.")
+            return message_id
+        T.warning(f"Telegram sendPhoto rejected (HTTP {response.status_code}); sending text instead.")
+    except Exception as e:
+        T.error(f"Failed to send Telegram snapshot: {e}")
+
+    try:
+        response = requests.post(
+            f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage",
+            data={"chat_id": TELEGRAM_CHAT_ID, "text": caption},
+            timeout=15
+        )
+        message_id = _telegram_message_id(response)
+        if message_id is not None:
+            T.info("[✔] Telegram text alert sent (snapshot fallback).")
+            return message_id
+        T.error(f"Telegram sendMessage rejected (HTTP {response.status_code}); no snapshot alert sent.")
+        return None
+    except Exception as e:
+        T.error(f"Failed to send Telegram message: {e}")
+        return None
 
-        # Always send text
+
+def send_snapshot_async(frame, caption="Motion detected!", on_sent=None):
+    """
+    Fast path sent the moment motion fires, ahead of the clip.
+
+    on_sent(message_id, sent_at) is called from the sender thread once
+    Telegram accepted the photo or its text fallback; pass the message_id
+    to send_alerts_async(reply_to=...) so the video lands as a reply.
+    """
+
+    def send():
+        message_id = send_telegram_snapshot(frame, caption)
+        if on_sent is not None:
+            on_sent(message_id, time.time())
+
+    thread = Thread(target=send, name="SnapshotAlert", daemon=True)
+    thread.start()
+    return thread
+
+
+def _send_telegram_alert(message, video_path, reply_to=None, thumbnail=None):
+    if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID:
+        T.error("Telegram credentials missing for motion alert.")
+        return
+
+    # The snapshot already announced the event when replying to it
+    if reply_to is None:
         url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
         data = {"chat_id": TELEGRAM_CHAT_ID, "text": message}
         try:
@@ -135,30 +213,44 @@ def send_telegram_alert(message="Motion detected!", video_path=None):
         except Exception as e:
             T.error(f"Failed to send Telegram message: {e}")
 
-        # Send video only if under size limit
-        if video_path and os.path.exists(video_path):
-            file_size = os.path.getsize(video_path)
-            if file_size > TELEGRAM_MAX_SIZE:
-                T.warning(f"Video {video_path} is {file_size/1024/1024:.2f} MB, exceeds Telegram limit. Skipping video.")
-                return
-            url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendVideo"
-            try:
-                with open(video_path, "rb") as video:
-                    files = {"video": video}
-                    data = {"chat_id": TELEGRAM_CHAT_ID, "caption": "Motion detected!"}
-                    requests.post(url, data=data, files=files, timeout=60)
-                    T.info("[✔] Telegram video alert sent.")
-            except Exception as e:
-                T.error(f"Failed to send Telegram video: {e}")
+    # Send video only if under size limit
+    if video_path and os.path.exists(video_path):
+        file_size = os.path.getsize(video_path)
+        if file_size > TELEGRAM_MAX_SIZE:
+            T.warning(f"Video {video_path} is {file_size/1024/1024:.2f} MB, exceeds Telegram limit. Skipping video.")
+            return
+        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendVideo"
+        try:
+            with open(video_path, "rb") as video:
+                files = {"video": video}
+                data = {"chat_id": TELEGRAM_CHAT_ID, "caption": "Motion detected!"}
+                if reply_to is not None:
+                    data["reply_to_message_id"] = reply_to
+                if thumbnail and os.path.exists(thumbnail):
+                    with open(thumbnail, "rb") as thumb:
+                        files["thumb"] = ("thumb.jpg", thumb.read(), "image/jpeg")
+                    data["thumbnail"] = "attach://thumb"
+                requests.post(url, data=data, files=files, timeout=60)
+                T.info("[✔] Telegram video alert sent.")
+        except Exception as e:
+            T.error(f"Failed to send Telegram video: {e}")
+
+
+def send_telegram_alert(message="Motion detected!", video_path=None, reply_to=None):
+    Thread(target=_send_telegram_alert, args=(message, video_path, reply_to), daemon=True).start()
 
-    Thread(target=send_telegram_alert_text, args=(message, video_path), daemon=True).start()
 
+def send_alerts_async(mp4_file, reply_to=None, thumbnail=None, channels=None):
+    """
+    Sends both Telegram and email alerts asynchronously. Returns the sender threads.
 
-def send_alerts_async(mp4_file):
-    """Sends both Telegram and email alerts asynchronously."""
+    reply_to threads the Telegram video under an earlier snapshot message;
+    thumbnail is a small JPEG shown as the video's preview. channels limits
+    delivery to some of "telegram" and "email" (default both).
+    """
 
     def send_telegram(mp4):
-        send_telegram_alert("Motion detected!", mp4)
+        _send_telegram_alert("Motion detected!", mp4, reply_to, thumbnail)
 
     def send_fastmail(mp4_file):
         if not fastmail_recipient:
@@ -174,8 +266,12 @@ def send_alerts_async(mp4_file):
             app_password=APP_PASSWORD
         )
 
-    Thread(target=send_telegram, args=(mp4_file,), daemon=True).start()
-    Thread(target=send_fastmail, args=(mp4_file,), daemon=True).start()
+    senders = {"telegram": send_telegram, "email": send_fastmail}
+    threads = [Thread(target=sender, args=(mp4_file,), daemon=True)
+               for channel, sender in senders.items() if channels is None or channel in channels]
+    for t in threads:
+        t.start()
+    return threads
     
     
 
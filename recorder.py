@@ -0,0 +1,376 @@
+# recorder.py
+import os
+import time
+import threading
+from collections import deque
+from datetime import datetime
+import cv2
+import tracelog as T
+from capture import is_yuyv, to_bgr
+
+MB = 1024 * 1024
+JPEG_RATIO_ESTIMATE = 0.1  # typical JPEG q80 size relative to raw BGR for camera footage
+
+
+def estimate_preroll_bytes(width, height, fps, seconds, scale=1.0, jpeg_quality=0):
+    """Estimates the memory a pre-roll window needs for the given resolution and storage mode."""
+    raw_frame = int(width * scale) * int(height * scale) * 3
+    per_frame = raw_frame * JPEG_RATIO_ESTIMATE if jpeg_quality else raw_frame
+    return int(per_frame * fps * seconds)
+
+
+class PreRollBuffer:
+    """
+    Bounded in-memory history of the most recent frames.
+
+    Frames are optionally downscaled and JPEG-compressed on the way in, then
+    evicted once they are older than `seconds` or the total size exceeds
+    `max_bytes`. drain() returns full-size BGR frames ready for a writer.
+    Raw YUYV frames from a luma capture are stored packed (2 bytes per
+    pixel) and only converted if they are drained into a clip.
+    """
+
+    def __init__(self, seconds=5.0, max_bytes=256 * MB, scale=1.0, jpeg_quality=0):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.scale = scale
+        self.jpeg_quality = jpeg_quality
+        self.budget_evictions = 0
+        self._frames = deque()  # (timestamp, payload, nbytes)
+        self._bytes = 0
+        self._frame_size = None  # (width, height) of the original frames
+
+    @classmethod
+    def for_resolution(cls, width, height, fps, seconds, max_bytes, scale=1.0, jpeg_quality=None):
+        """Builds a buffer for a camera mode, choosing raw storage only when the window fits the budget."""
+        if jpeg_quality is None:
+            raw = estimate_preroll_bytes(width, height, fps, seconds, scale)
+            jpeg_quality = 0 if raw <= max_bytes else 80
+        buf = cls(seconds, max_bytes, scale, jpeg_quality)
+        estimate = estimate_preroll_bytes(width, height, fps, seconds, scale, jpeg_quality)
+        mode = f"jpeg q{jpeg_quality}" if jpeg_quality else "raw"
+        T.info(f"[⏪] Pre-roll {seconds:.1f}s @ {width}x{height} {fps:.0f}fps, {mode}, scale {scale}: "
+               f"~{estimate / MB:.1f} MB (budget {max_bytes / MB:.0f} MB)")
+        if estimate > max_bytes:
+            T.warning(f"[⏪] Pre-roll estimate exceeds budget; effective window will be ~"
+                      f"{seconds * max_bytes / estimate:.1f}s.")
+        return buf
+
+    def __len__(self):
+        return len(self._frames)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def push(self, frame, timestamp=None):
+        """Adds a frame, evicting the oldest ones that fall outside the window or the budget."""
+        if timestamp is None:
+            timestamp = time.time()
+        height, width = frame.shape[:2]
+        self._frame_size = (width, height)
+
+        payload = frame
+        if is_yuyv(frame) and (self.scale != 1.0 or self.jpeg_quality):
+            payload = frame = to_bgr(frame)
+        if self.scale != 1.0:
+            payload = cv2.resize(frame, (int(width * self.scale), int(height * self.scale)),
+                                 interpolation=cv2.INTER_AREA)
+        if self.jpeg_quality:
+            ok, encoded = cv2.imencode(".jpg", payload, [cv2.IMWRITE_JPEG_QUALITY, int(self.jpeg_quality)])
+            if not ok:
+                T.warning("[⏪] Pre-roll JPEG encode failed; frame skipped.")
+                return
+            payload = encoded
+
+        self._frames.append((timestamp, payload, payload.nbytes))
+        self._bytes += payload.nbytes
+
+        while self._frames and timestamp - self._frames[0][0] > self.seconds:
+            self._evict()
+        while self._frames and self._bytes > self.max_bytes:
+            self._evict()
+            self.budget_evictions += 1
+
+    def _evict(self):
+        _, _, nbytes = self._frames.popleft()
+        self._bytes -= nbytes
+
+    def drain(self):
+        """Returns the buffered frames as full-size BGR images, oldest first, and empties the buffer."""
+        frames = []
+        while self._frames:
+            _, payload, nbytes = self._frames.popleft()
+            self._bytes -= nbytes
+            frame = cv2.imdecode(payload, cv2.IMREAD_COLOR) if self.jpeg_quality else to_bgr(payload)
+            if frame is None:
+                continue
+            if (frame.shape[1], frame.shape[0]) != self._frame_size:
+                frame = cv2.resize(frame, self._frame_size, interpolation=cv2.INTER_LINEAR)
+            frames.append(frame)
+        self._bytes = 0
+        return frames
+
+    def stats(self):
+        span = self._frames[-1][0] - self._frames[0][0] if len(self._frames) > 1 else 0.0
+        return {
+            "frames": len(self._frames),
+            "bytes": self._bytes,
+            "seconds": round(span, 2),
+            "max_bytes": self.max_bytes,
+            "mode": f"jpeg q{self.jpeg_quality}" if self.jpeg_quality else "raw",
+            "budget_evictions": self.budget_evictions,
+        }
+
+
+class KeyframeTracker:
+    """
+    Keeps the highest-scoring, mutually distinct frames of a clip in memory.
+
+    Candidates closer than min_gap seconds to a kept frame compete with it
+    rather than taking a second slot, so the N frames cover different
+    moments. Only references are held; nothing is decoded or copied.
+    """
+
+    def __init__(self, count=3, min_gap=1.0):
+        self.count = count
+        self.min_gap = min_gap
+        self._kept = []  # (score, timestamp, frame), highest score first
+
+    def __len__(self):
+        return len(self._kept)
+
+    def reset(self):
+        self._kept = []
+
+    def offer(self, score, frame, timestamp):
+        """Considers a scored frame. Returns True if it was kept."""
+        near = [k for k in self._kept if abs(k[1] - timestamp) < self.min_gap]
+        if any(k[0] >= score for k in near):
+            return False
+        if not near and len(self._kept) >= self.count and self._kept[-1][0] >= score:
+            return False
+        self._kept = [k for k in self._kept if k not in near]
+        self._kept.append((score, timestamp, frame))
+        self._kept.sort(key=lambda k: k[0], reverse=True)
+        del self._kept[self.count:]
+        return True
+
+    def best(self):
+        """Returns the peak-motion frame, or None if nothing was offered."""
+        return self._kept[0][2] if self._kept else None
+
+    def keyframes(self):
+        """Returns (score, timestamp, frame) tuples in timeline order."""
+        return sorted(self._kept, key=lambda k: k[1])
+
+
+def save_keyframe_images(base_path, frame, thumb_width=320, quality=85):
+    """Writes <base>.jpg poster and <base>_thumb.jpg thumbnail for frame. Returns (poster, thumb) paths."""
+    poster_path = f"{base_path}.jpg"
+    thumb_path = f"{base_path}_thumb.jpg"
+    frame = to_bgr(frame)
+    height, width = frame.shape[:2]
+    thumb = frame
+    if width > thumb_width:
+        thumb = cv2.resize(frame, (thumb_width, max(1, int(height * thumb_width / width))),
+                           interpolation=cv2.INTER_AREA)
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    if not (cv2.imwrite(poster_path, frame, params) and cv2.imwrite(thumb_path, thumb, params)):
+        raise IOError(f"could not write keyframe images for {base_path}")
+    return poster_path, thumb_path
+
+
+class Recorder(threading.Thread):
+    """
+    Writes motion clips from the capture ring on its own thread.
+
+    While idle it keeps the pre-roll history topped up. trigger() hands it an
+    event and returns immediately, so the detector never waits on disk I/O.
+    A clip runs for at least min_seconds, keeps going while notify_motion()
+    is called, stops after post_roll_seconds without motion and never
+    exceeds max_seconds. Finished clips are passed to on_clip(event, path).
+
+    Frames scored by the detector during a clip are offered through
+    observe(); the peak one is saved as the clip's poster and thumbnail.
+    """
+
+    def __init__(self, ring, preroll=None, min_seconds=5, post_roll_seconds=5, max_seconds=120,
+                 fps_source=None, on_clip=None, on_frame=None, clips_dir="clips", backend="opencv",
+                 encoder_options=None, keyframe_count=3, name="RecorderThread"):
+        super().__init__(name=name, daemon=True)
+        self.ring = ring
+        self.reader = ring.reader("recorder")
+        self.preroll = preroll
+        self.min_seconds = min_seconds
+        self.post_roll_seconds = post_roll_seconds
+        self.max_seconds = max_seconds
+        self.fps_source = fps_source
+        self.on_clip = on_clip
+        self.on_frame = on_frame
+        self.clips_dir = clips_dir
+        self.backend = backend
+        self.encoder_options = encoder_options or {}
+        self.clips_written = 0
+        self.keyframes = KeyframeTracker(count=keyframe_count)
+        self._lock = threading.Lock()
+        self._pending = None
+        self._recording = False
+        self._last_motion_ts = 0.0
+        self._stop_event = threading.Event()
+
+    @property
+    def is_recording(self):
+        return self._recording or self._pending is not None
+
+    def trigger(self, event):
+        """Queues a clip for event. Returns False if a clip is already pending or being written."""
+        with self._lock:
+            if self._recording or self._pending is not None:
+                return False
+            self._pending = event
+            self._last_motion_ts = event["detected_at"]
+            self.keyframes.reset()
+        return True
+
+    def notify_motion(self, timestamp=None):
+        """Extends the clip being written. Returns False when no clip is in progress."""
+        with self._lock:
+            if not (self._recording or self._pending is not None):
+                return False
+            self._last_motion_ts = timestamp if timestamp is not None else time.time()
+        return True
+
+    def observe(self, score, frame, timestamp=None):
+        """Offers a detector-scored frame as a keyframe candidate for the clip in progress."""
+        with self._lock:
+            if not (self._recording or self._pending is not None):
+                return False
+            return self.keyframes.offer(score, frame, timestamp if timestamp is not None else time.time())
+
+    def _save_keyframes(self, base_path, event):
+        with self._lock:
+            kept = self.keyframes.keyframes()
+            peak = self.keyframes.best()
+        if peak is None:
+            return
+        event["keyframes"] = [(score, ts) for score, ts, _ in kept]
+        try:
+            event["poster"], event["thumbnail"] = save_keyframe_images(base_path, peak)
+        except Exception as e:
+            T.warning(f"[🖼️] Keyframe save failed: {e}")
+
+    def _should_stop(self, start_time, now):
+        elapsed = now - start_time
+        if elapsed >= self.max_seconds:
+            return True
+        quiet = now - self._last_motion_ts
+        return elapsed >= self.min_seconds and quiet >= self.post_roll_seconds
+
+    def stop(self, timeout=5.0):
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=timeout)
+
+    def run(self):
+        T.info(f"[🎥] {self.name} started.")
+        while not self._stop_event.is_set():
+            with self._lock:
+                event = self._pending
+                self._recording = event is not None
+            if event is None:
+                self._feed_preroll(self.reader.wait_new(timeout=0.2))
+                continue
+
+            path = None
+            try:
+                path = self._record_clip(event)
+            except Exception as e:
+                T.error(f"Clip recording failed: {e}")
+            finally:
+                with self._lock:
+                    self._pending = None
+                    self._recording = False
+
+            if path and self.on_clip:
+                try:
+                    self.on_clip(event, path)
+                except Exception as e:
+                    T.error(f"Clip hand-off failed: {e}")
+        T.info(f"[🎥] {self.name} stopped.")
+
+    def _feed_preroll(self, entries):
+        if self.preroll is None:
+            return
+        for _, ts, frame in entries:
+            self.preroll.push(frame, ts)
+
+    def _open_writer(self, base_path, fps, frame_size):
+        """Opens the configured writer backend, falling back to an OpenCV AVI if ffmpeg cannot start."""
+        if self.backend == "ffmpeg":
+            from utils import FfmpegPipeWriter
+            path = f"{base_path}.mp4"
+            try:
+                return FfmpegPipeWriter(path, fps, frame_size, **self.encoder_options), path
+            except Exception as e:
+                T.error(f"ffmpeg pipe writer unavailable ({e}); falling back to OpenCV AVI.")
+        path = f"{base_path}.avi"
+        return cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"DIVX"), fps, frame_size), path
+
+    def _record_clip(self, event):
+        os.makedirs(self.clips_dir, exist_ok=True)
+        timestamp = datetime.fromtimestamp(event["detected_at"]).strftime("%Y-%m-%d_%H-%M-%S")
+        base_path = os.path.join(self.clips_dir, f"motion_{timestamp}")
+
+        # Catch up to the newest frame so pre-roll and live frames join seamlessly
+        self._feed_preroll(self.reader.read_new())
+        preroll_frames = self.preroll.drain() if self.preroll is not None else []
+        if preroll_frames:
+            T.info(f"[⏪] Flushing {len(preroll_frames)} pre-roll frames into clip.")
+
+        latest = self.ring.latest()
+        if latest is None:
+            T.error("[!] Capture buffer empty during clip save.")
+            return None
+        height, width = latest[2].shape[:2]
+        fps = self.fps_source() if self.fps_source else 0
+        fps = round(fps) if fps and fps > 0 else 20
+
+        frames_recorded = 0
+        out, clip_path = self._open_writer(base_path, fps, (width, height))
+        start_time = time.time()
+        try:
+            for frame in preroll_frames:
+                out.write(frame)
+            frames_recorded += len(preroll_frames)
+
+            while not self._should_stop(start_time, time.time()) and not self._stop_event.is_set():
+                entries = self.reader.wait_new(timeout=1.0)
+                if not entries:
+                    T.warning("[!] No frames from capture thread during clip save.")
+                    break
+                for _, _, frame in entries:
+                    frame = to_bgr(frame)
+                    if frame.shape[1] != width or frame.shape[0] != height:
+                        # Camera mode changed mid-clip; the writer's size is fixed
+                        frame = cv2.resize(frame, (width, height))
+                    out.write(frame)
+                frames_recorded += len(entries)
+                if self.on_frame:
+                    self.on_frame(frame)
+        finally:
+            ok = out.release()
+
+        event["ended_at"] = time.time()
+        if frames_recorded > 0 and ok is not False and os.path.exists(clip_path):
+            self.clips_written += 1
+            event["clip_bytes"] = os.path.getsize(clip_path)
+            length = event["ended_at"] - start_time
+            capped = " (hit max length)" if length >= self.max_seconds else ""
+            T.info(f"[✔] Saved motion clip with {frames_recorded} frames ({length:.1f}s live){capped} to {clip_path}")
+            self._save_keyframes(base_path, event)
+            return clip_path
+        if os.path.exists(clip_path):
+            os.remove(clip_path)
+        T.error("[!] Clip save failed (0 frames recorded).")
+        return None
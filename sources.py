@@ -0,0 +1,256 @@
+# sources.py
+import os
+import json
+import time
+import numpy as np
+import cv2
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+DEFAULT_SCENE = {
+    # One person-sized block walking across the frame, then the lights going up
+    "objects": [{"start": 30, "end": 120, "from": [0.0, 0.55], "to": [1.0, 0.55], "size": [0.12, 0.4],
+                 "color": [220, 220, 220]}],
+    "lights": [{"start": 180, "end": 240, "shift": 40}],
+}
+
+
+class FrameSource:
+    """
+    Base for frame sources that are not a live camera.
+
+    Implements the part of the cv2.VideoCapture interface the pipelines use
+    (isOpened, read, get, set, release), so CaptureThread, CameraPipeline and
+    ProcessPipeline run on any source unchanged. Subclasses implement
+    _frame(position), returning the frame at that position of the current
+    pass or None past the end, and _rewind() if looping needs it.
+
+    With realtime=True frames are paced at fps and stamped with the wall
+    clock. Otherwise they are delivered as fast as they are read and stamped
+    on a virtual clock (open time + frames read / fps), so the analyzed
+    frame pairs are spaced as in the footage. Clip length, post-roll and
+    cooldown still run on the wall clock, so a fast replay records clips
+    covering more footage than their settings say and lets fewer events
+    through cooldown. Use it for detector tuning; analyze.py times events
+    on the footage. loop=True starts over at the end; otherwise read()
+    fails from then on and `ended` is set, which stops the capture thread.
+    """
+
+    def __init__(self, width, height, fps, realtime=True, loop=False):
+        self.width = width
+        self.height = height
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.realtime = realtime
+        self.loop = loop
+        self.ended = False
+        self.frames_read = 0
+        self.timestamp = None  # capture time of the last frame read
+        self._position = 0
+        self._opened_at = time.time()
+
+    def isOpened(self):
+        return True
+
+    def _frame(self, position):
+        raise NotImplementedError
+
+    def _rewind(self):
+        pass
+
+    def read(self):
+        if self.ended or not self.isOpened():
+            return False, None
+        frame = self._frame(self._position)
+        if frame is None and self.loop and self._position > 0:
+            self._rewind()
+            self._position = 0
+            frame = self._frame(0)
+        if frame is None:
+            self.ended = True
+            return False, None
+        self._position += 1
+        self.frames_read += 1
+        due = self._opened_at + self.frames_read / self.fps
+        if self.realtime:
+            delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            self.timestamp = time.time()
+        else:
+            self.timestamp = due
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.frames_read)
+        return 0.0
+
+    def set(self, prop, value):
+        return False  # resolution and rate are fixed by the footage
+
+    def release(self):
+        self.ended = True
+
+
+class VideoFileSource(FrameSource):
+    """Replays a recorded video file, in real time or as fast as it decodes."""
+
+    def __init__(self, path, realtime=True, loop=False):
+        self.path = path
+        self._cap = cv2.VideoCapture(path)
+        super().__init__(int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                         self._cap.get(cv2.CAP_PROP_FPS), realtime=realtime, loop=loop)
+
+    def isOpened(self):
+        return self._cap.isOpened()
+
+    def _frame(self, position):
+        ret, frame = self._cap.read()
+        return frame if ret else None
+
+    def _rewind(self):
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return self._cap.get(prop)
+        return super().get(prop)
+
+    def release(self):
+        super().release()
+        self._cap.release()
+
+
+class ImageFolderSource(FrameSource):
+    """
+    Plays the images in a folder in file name order at fps. Images that do
+    not match the first one's size are resized to it; unreadable ones are
+    skipped.
+    """
+
+    def __init__(self, path, fps=10.0, realtime=True, loop=False):
+        self.path = path
+        self.files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        first = self._load(0)
+        height, width = first.shape[:2] if first is not None else (0, 0)
+        super().__init__(width, height, fps, realtime=realtime, loop=loop)
+
+    def _load(self, index):
+        while index < len(self.files):
+            frame = cv2.imread(self.files[index])
+            if frame is not None:
+                return frame
+            index += 1
+        return None
+
+    def isOpened(self):
+        return bool(self.files) and self.width > 0
+
+    def _frame(self, position):
+        if position >= len(self.files):
+            return None
+        frame = cv2.imread(self.files[position])
+        if frame is None:
+            frame = np.zeros((self.height, self.width, 3), np.uint8)  # keep the timeline; count it as a frame
+        elif frame.shape[:2] != (self.height, self.width):
+            frame = cv2.resize(frame, (self.width, self.height))
+        return frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.files))
+        return super().get(prop)
+
+
+class SyntheticSource(FrameSource):
+    """
+    Deterministic generated scene for tests and benchmarks: a static
+    gradient with per-frame sensor noise, plus scripted events.
+
+    scene["objects"] are filled rectangles moving in a straight line from
+    "from" to "to" (centre, 0..1 coordinates like zones) over frames
+    [start, end), "size" as a fraction of the frame. scene["lights"]
+    brighten the whole frame by "shift" over [start, end). Frame n is the
+    same for a given seed however fast it is read. frames=0 runs forever.
+    """
+
+    def __init__(self, width=640, height=480, fps=30.0, frames=0, seed=0, noise=3, scene=None,
+                 realtime=True, loop=False):
+        super().__init__(width, height, fps, realtime=realtime, loop=loop)
+        self.frames = frames
+        self.seed = seed
+        self.noise = noise
+        scene = DEFAULT_SCENE if scene is None else scene
+        self.objects = list(scene.get("objects", ()))
+        self.lights = list(scene.get("lights", ()))
+        ramp = np.linspace(60, 140, width, dtype=np.float32)
+        rows = np.linspace(0.8, 1.1, height, dtype=np.float32)[:, None]
+        self._background = np.repeat(np.clip(ramp[None, :] * rows, 0, 255).astype(np.uint8)[:, :, None], 3, axis=2)
+
+    @classmethod
+    def from_spec(cls, spec, realtime=True, loop=False):
+        """Builds a source from "synthetic" or "synthetic:{json}" (keyword arguments, scene included)."""
+        _, _, params = spec.partition(":")
+        return cls(realtime=realtime, loop=loop, **(json.loads(params) if params else {}))
+
+    def _frame(self, position):
+        if self.frames and position >= self.frames:
+            return None
+        frame = self._background.copy()
+        for obj in self.objects:
+            start, end = obj["start"], obj["end"]
+            if not start <= position < end:
+                continue
+            t = (position - start) / max(1, end - start - 1)
+            (x0, y0), (x1, y1) = obj["from"], obj["to"]
+            w, h = obj.get("size", (0.1, 0.2))
+            cx, cy = (x0 + (x1 - x0) * t) * self.width, (y0 + (y1 - y0) * t) * self.height
+            half_w, half_h = w * self.width / 2, h * self.height / 2
+            cv2.rectangle(frame, (int(cx - half_w), int(cy - half_h)), (int(cx + half_w), int(cy + half_h)),
+                          tuple(int(c) for c in obj.get("color", (220, 220, 220))), -1)
+        for light in self.lights:
+            if light["start"] <= position < light["end"]:
+                cv2.add(frame, np.full_like(frame, int(light["shift"])), dst=frame)
+        if self.noise:
+            rng = np.random.default_rng([self.seed, position])
+            noise = rng.integers(-self.noise, self.noise + 1, frame.shape, dtype=np.int16)
+            frame = np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+        return frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.frames)
+        return super().get(prop)
+
+
+def open_source(source, realtime=True, loop=False):
+    """
+    Opens a frame source from its CAMERA_SOURCE / CAMERAS "source" form:
+        0, "2"                        camera device index
+        "synthetic", "synthetic:{…}"  SyntheticSource (JSON keyword arguments)
+        a directory                   ImageFolderSource
+        an existing file              VideoFileSource
+        anything else (rtsp://, …)    cv2.VideoCapture
+    realtime and loop apply to the non-camera sources. A callable is called
+    to build the source, and a capture-like object is returned as is.
+    """
+    if callable(source):
+        return source()
+    if hasattr(source, "read"):
+        return source
+    if isinstance(source, str):
+        if source.strip().isdigit():
+            return cv2.VideoCapture(int(source))
+        if source == "synthetic" or source.startswith("synthetic:"):
+            return SyntheticSource.from_spec(source, realtime=realtime, loop=loop)
+        if os.path.isdir(source):
+            return ImageFolderSource(source, realtime=realtime, loop=loop)
+        if os.path.isfile(source):
+            return VideoFileSource(source, realtime=realtime, loop=loop)
+    return cv2.VideoCapture(source)
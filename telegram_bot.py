@@ -4,22 +4,24 @@ import tracelog as T
 # import traceback
 from telegram.ext import Application, CommandHandler, ContextTypes
 from notifications import send_telegram_alert
-from dotenv import load_dotenv
+from config import get_settings, subscribe
 from telegram.ext import ApplicationBuilder
 import os
 
 
-# Load environment variables
-dotenv_path = os.path.join(os.getcwd(), ".env")
-if not os.path.exists(dotenv_path):
-    # Fallback for when the .desktop file's Path setting is ignored or failed
-    dotenv_path = "/opt/motion-detector/.env"
+# Telegram configuration comes from the shared settings and follows .env reloads
+TELEGRAM_TOKEN = None
+TELEGRAM_CHAT_ID = None
 
-load_dotenv(dotenv_path=dotenv_path)
 
-# Telegram and Email Configuration (Read from .env)
-TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+def _apply_settings(settings):
+    global TELEGRAM_TOKEN, TELEGRAM_CHAT_ID
+    TELEGRAM_TOKEN = settings.telegram_token
+    TELEGRAM_CHAT_ID = settings.telegram_chat_id
+
+
+_apply_settings(get_settings())
+subscribe(lambda old, new, changes: _apply_settings(new))
 
 # Global Variables
 telegram_app = None
@@ -168,6 +170,14 @@ async def status_command(update, context):
     else:
         status_lines.append("\n📸 No motion detected yet")
 
+    try:
+        from detection import get_status_lines
+        camera_lines = get_status_lines()
+        if camera_lines:
+            status_lines.append("\n" + "\n".join(camera_lines))
+    except Exception as e:
+        T.error(f"Failed to collect camera stats for status: {e}")
+
     summary = "📊 System Status:\n" + "\n".join(status_lines)
     await update.message.reply_text(summary)
 
@@ -204,16 +214,17 @@ async def summary_command(update, context):
         summary_lines.append("\n📸 No motion detected yet")
 
     try:
-        with open("motion_log.txt", "r") as f:
-            lines = [line.strip() for line in f.readlines() if today in line and "Motion detected" in line]
-        if lines:
+        from events import get_store, day_bounds, format_event
+        start, end = day_bounds()
+        recent = get_store().events_between(start, end, limit=5)
+        if recent:
             summary_lines.append("\n🧾 Recent motion events:")
-            summary_lines.extend(lines[-5:])
+            summary_lines.extend(format_event(row) for row in reversed(recent))
         else:
             summary_lines.append("\n🧾 No logged motion events yet.")
     except Exception as e:
-        T.error(f"Failed to read motion log for summary: {e}")
-        summary_lines.append("\n⚠️ Could not read motion log.")
+        T.error(f"Failed to read event index for summary: {e}")
+        summary_lines.append("\n⚠️ Could not read event index.")
 
     await update.message.reply_text("\n".join(summary_lines))
 
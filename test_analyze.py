@@ -0,0 +1,57 @@
+import dataclasses
+import io
+import json
+
+import cv2
+
+from analyze import analyze_files, main, write_events
+from config import get_settings
+from sources import SyntheticSource
+
+SCENE = {"objects": [{"start": 30, "end": 60, "from": [0.1, 0.5], "to": [0.9, 0.5], "size": [0.2, 0.4]},
+                     {"start": 100, "end": 130, "from": [0.9, 0.3], "to": [0.2, 0.3], "size": [0.15, 0.3]}],
+         "lights": []}
+
+
+def _write_footage(path, frames=150):
+    source = SyntheticSource(320, 240, fps=30, frames=frames, scene=SCENE, realtime=False)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 30, (320, 240))
+    while True:
+        ret, frame = source.read()
+        if not ret:
+            break
+        writer.write(frame)
+    writer.release()
+    return str(path)
+
+
+def test_chunked_analysis_finds_the_scripted_events_like_a_single_pass(tmp_path):
+    footage = _write_footage(tmp_path / "yard.avi")
+    settings = dataclasses.replace(get_settings(), motion_detector="diff", analysis_width=320, motion_score=1000,
+                                   temporal_k=2, temporal_n=3, illumination_shift=0, motion_zones="")
+
+    chunked, summary = analyze_files([footage], settings, chunk_seconds=1, gap=0.5, workers=2)
+    single, _ = analyze_files([footage], settings, chunk_seconds=60, gap=0.5, workers=1)
+
+    assert summary["chunks"] == 5 and summary["frames_decoded"] >= 150
+    assert [(e["start"], e["end"]) for e in chunked] == [(e["start"], e["end"]) for e in single]
+    assert len(chunked) == 2
+    assert 1.0 <= chunked[0]["start"] < 1.3 and chunked[0]["end"] <= 2.0
+    assert 3.3 <= chunked[1]["start"] < 3.6
+    assert chunked[0]["boxes"] and chunked[0]["peak_score"] > 1000
+
+
+def test_events_are_written_as_csv_or_json(tmp_path):
+    events = [{"file": "a.mp4", "start": 1.0, "end": 2.5, "duration": 1.5, "peak_time": 1.2, "peak_score": 5e4,
+               "hits": 9, "zones": ["door", "path"], "boxes": [(10, 20, 30, 40)]}]
+    out = io.StringIO()
+    write_events(events, "csv", out)
+    lines = out.getvalue().splitlines()
+    assert lines[0] == "file,start,end,duration,peak_time,peak_score,hits,zones,boxes"
+    assert lines[1].startswith("a.mp4,1.0,2.5,1.5,1.2,50000.0,9,door;path,")
+
+    footage = _write_footage(tmp_path / "yard.avi", frames=40)
+    target = tmp_path / "events.json"
+    assert main([footage, "--set", "temporal_k=1", "--set", "temporal_n=1", "--motion-score", "1000",
+                 "--workers", "1", "--output", str(target)]) == 0
+    assert isinstance(json.loads(target.read_text()), list)
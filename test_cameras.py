@@ -0,0 +1,81 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from cameras import CameraPipeline, format_stats, parse_cameras
+
+
+def _camera(moving):
+    still = np.full((240, 320, 3), 80, np.uint8)
+    step = [0]
+
+    def read():
+        time.sleep(0.01)
+        step[0] += 1
+        if not moving:
+            return True, still
+        frame = still.copy()
+        x = (step[0] * 12) % 200
+        frame[60:180, x:x + 100] = 230
+        return True, frame
+
+    cap = MagicMock()
+    cap.read.side_effect = read
+    cap.get.return_value = 0
+    return cap
+
+
+def test_parse_cameras_reads_overrides_and_rejects_unknown_settings():
+    cameras = parse_cameras('[{"name": "porch", "source": 0}, '
+                            '{"name": "garage", "source": "/dev/video2", "motion_score": 1000, '
+                            '"motion_zones": [{"name": "door", "points": [[0, 0], [1, 0], [1, 1]]}]}]')
+    assert [(c.name, c.source) for c in cameras] == [("porch", 0), ("garage", "/dev/video2")]
+    assert cameras[1].overrides["motion_score"] == 1000
+    assert cameras[1].overrides["motion_zones"].startswith('[{"name": "door"')
+    assert parse_cameras('[{"name": "x", "shutter": 1}]') == []
+    assert parse_cameras('[{"name": "x"}, {"name": "x"}]') == []
+    assert parse_cameras("") == []
+
+
+def test_each_camera_runs_its_own_pipeline_and_reports_resources():
+    fired = []
+    overrides = {"pre_roll_seconds": 0, "temporal_k": 1, "temporal_n": 1, "motion_score": 1000,
+                 "illumination_shift": 0}
+
+    def on_motion(recorder, cooldown, frame, confidence, result, zones, camera):
+        fired.append(camera)
+        return True
+
+    active = threading.Event()
+    active.set()
+    pipelines = [CameraPipeline(name, _camera(moving), overrides, on_motion=on_motion)
+                 for name, moving in (("porch", True), ("garage", False))]
+    for pipeline in pipelines:
+        pipeline.start()
+        pipeline.start_thread(active)
+
+    deadline = time.time() + 3
+    while not fired and time.time() < deadline:
+        time.sleep(0.05)
+    for pipeline in pipelines:
+        pipeline.resource_stats()  # CPU is reported as usage since the previous call
+    time.sleep(0.2)
+    stats = {p.name: p.stats() for p in pipelines}
+    active.clear()
+    for pipeline in pipelines:
+        pipeline._thread.join(timeout=3)
+
+    assert fired and set(fired) == {"porch"}
+    assert pipelines[0].recorder is not pipelines[1].recorder
+    for name in ("porch", "garage"):
+        assert stats[name]["capture"]["produced"] > 0
+        assert stats[name]["memory_mb"] > 0
+        assert "cpu_percent" in stats[name]
+    assert not any(p.is_alive() for p in pipelines)
+
+    lines = format_stats("porch", stats["porch"])
+    assert lines[0].startswith("🎥 porch: ") and " dropped" in lines[0]
+    assert "CPU " in lines[1] and " MB" in lines[1]
+    assert "rejected 0 (encodes saved)" in lines[2] and "lighting ignored" in lines[2]
@@ -0,0 +1,140 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from capture import FrameRingBuffer, CaptureThread
+
+
+def test_reader_gets_frames_in_order():
+    ring = FrameRingBuffer(capacity=4)
+    reader = ring.reader("analysis")
+    for i in range(3):
+        ring.push(f"frame{i}", timestamp=float(i))
+
+    entries = reader.read_new()
+
+    assert [e[2] for e in entries] == ["frame0", "frame1", "frame2"]
+    assert reader.consumed == 3
+    assert reader.dropped == 0
+    assert reader.read_new() == []
+
+
+def test_overwritten_frames_are_counted_as_dropped():
+    ring = FrameRingBuffer(capacity=4)
+    reader = ring.reader("recorder")
+    for i in range(10):
+        ring.push(i)
+
+    entries = reader.read_new()
+
+    # Only the last `capacity` frames survive; the rest were overwritten
+    assert [e[2] for e in entries] == [6, 7, 8, 9]
+    stats = ring.stats()
+    assert stats["produced"] == 10
+    assert stats["consumed"] == 4
+    assert stats["dropped"] == 6
+
+
+def test_read_latest_skips_stale_frames():
+    ring = FrameRingBuffer(capacity=8)
+    reader = ring.reader("analysis")
+    for i in range(5):
+        ring.push(i)
+
+    seq, _, frame = reader.read_latest()
+
+    assert (seq, frame) == (4, 4)
+    assert reader.dropped == 4
+    assert reader.read_latest() is None
+
+
+def test_skip_to_head_does_not_count_drops():
+    ring = FrameRingBuffer(capacity=4)
+    reader = ring.reader("recorder")
+    ring.push("old")
+    reader.skip_to_head()
+    ring.push("new")
+
+    assert [e[2] for e in reader.read_new()] == ["new"]
+    assert reader.dropped == 0
+
+
+def test_capacity_must_hold_a_pair():
+    with pytest.raises(ValueError):
+        FrameRingBuffer(capacity=1)
+
+
+def test_capture_thread_fills_ring_independently_of_consumers():
+    cap = MagicMock()
+    cap.read.side_effect = lambda: (time.sleep(0.001) or True, "frame")
+    ring = FrameRingBuffer(capacity=8)
+    thread = CaptureThread(cap, ring)
+
+    thread.start()
+    deadline = time.time() + 2
+    while ring.produced < 20 and time.time() < deadline:
+        time.sleep(0.01)
+    thread.stop()
+
+    assert ring.produced >= 20
+    assert not thread.is_alive()
+    assert thread.stats()["read_failures"] == 0
+
+
+def test_luma_capture_unpacks_yuyv_and_detector_reads_its_y_plane():
+    import numpy as np
+    import cv2
+    from capture import is_yuyv, to_bgr
+    from motion import downscale_gray
+
+    width, height = 64, 48
+    yuyv = np.dstack([np.full((height, width), 120, np.uint8), np.full((height, width), 128, np.uint8)])
+    cap = MagicMock()
+    cap.get.side_effect = lambda prop: {cv2.CAP_PROP_FRAME_WIDTH: width, cv2.CAP_PROP_FRAME_HEIGHT: height}.get(prop, 0)
+    # Backends hand unconverted frames over as a single flat row
+    cap.read.side_effect = lambda: (time.sleep(0.001) or True, yuyv.reshape(1, -1))
+    ring = FrameRingBuffer(capacity=8)
+    thread = CaptureThread(cap, ring, luma=True)
+
+    thread.start()
+    deadline = time.time() + 2
+    while ring.produced < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    thread.stop()
+
+    cap.set.assert_any_call(cv2.CAP_PROP_CONVERT_RGB, 0)
+    frame = ring.latest()[2]
+    assert is_yuyv(frame) and frame.shape == (height, width, 2)
+
+    gray, _ = downscale_gray(frame, 32)
+    assert gray.shape == (24, 32) and int(gray.mean()) == 120
+    bgr = to_bgr(frame)
+    assert bgr.shape == (height, width, 3)
+    assert abs(int(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY).mean()) - 120) <= 2
+
+
+def test_capture_reconnects_after_sustained_failures_with_backoff():
+    dead = MagicMock()
+    dead.read.return_value = (False, None)
+    healthy = MagicMock()
+    healthy.read.side_effect = lambda: (time.sleep(0.001) or True, "frame")
+    reopened = iter([None, dead, healthy])  # two failed attempts, then the device comes back
+    statuses = []
+    ring = FrameRingBuffer(capacity=8)
+    thread = CaptureThread(dead, ring, reopen=lambda: next(reopened), reconnect_after=0.2, reconnect_max_delay=0.05,
+                           on_connection=lambda connected, incident: statuses.append((connected, incident)))
+    dead.isOpened.return_value = False  # the dead device fails to reopen as well
+
+    thread.start()
+    deadline = time.time() + 5
+    while ring.produced < 5 and time.time() < deadline:
+        time.sleep(0.01)
+    thread.stop()
+
+    assert ring.produced >= 5 and thread.cap is healthy
+    assert [connected for connected, _ in statuses] == [False, True]
+    incident = statuses[1][1]
+    assert incident["attempts"] == 3 and incident["recovered"]
+    assert incident["downtime"] >= 0.2
+    assert thread.stats()["outages"] == 1
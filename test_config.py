@@ -52,7 +52,7 @@ def test_load_config_defaults(mock_exists, mock_env, mocker):
     # Assert flags and defaults 
     assert config_data["autostart_enabled"] is False 
     assert config_data["cooldown"] == 30 
-    assert config_data["motion_score"] == 5000 
+    assert config_data["motion_score"] == 200000 
 
 @patch('config.os.getcwd', return_value='/app/test') 
 @patch('config.load_dotenv') 
@@ -70,3 +70,28 @@ def test_dotenv_path_resolution(mock_load_dotenv, mock_getcwd, mocker):
     load_config() 
     # Check that it tried to load the fallback path 
     mock_load_dotenv.assert_called_with(dotenv_path='/opt/motion-detector/.env')
+
+
+def test_reload_applies_env_changes_and_notifies_listeners(tmp_path, monkeypatch):
+    import config
+
+    env_file = tmp_path / ".env"
+    env_file.write_text("COOLDOWN_SECONDS=30\nMOTION_SCORE=200000\n")
+    monkeypatch.chdir(tmp_path)
+    for key in ("COOLDOWN_SECONDS", "MOTION_SCORE"):
+        monkeypatch.delenv(key, raising=False)
+    monkeypatch.setattr(config, "_settings", None)
+    monkeypatch.setattr(config, "_dotenv_keys", set())
+    monkeypatch.setattr(config, "_listeners", [])
+
+    seen = []
+    config.subscribe(lambda old, new, changes: seen.append(changes))
+    assert config.get_settings().cooldown == 30
+
+    env_file.write_text("MOTION_SCORE=350000\n")
+    changes = config.reload_settings()
+
+    assert changes == {"motion_score": (200000, 350000)}
+    assert config.get_settings().motion_score == 350000
+    assert "COOLDOWN_SECONDS" not in os.environ  # removed from .env, so unset again
+    assert seen == [changes]
@@ -2,45 +2,34 @@ import importlib
 from unittest.mock import MagicMock
 import pytest
 
-# Test motion detected when numpy.sum(thresh) > threshold
-def test_process_frame_pair_motion_detected(mocker):
-    # Import module under test
-    detection = importlib.import_module("detection")
-
-    # Mock cv2 functions used inside _process_frame_pair
-    mock_cv2 = mocker.patch("detection.cv2", autospec=True)
-    # Make absdiff, cvtColor, GaussianBlur return a placeholder object
-    fake = object()
-    mock_cv2.absdiff.return_value = fake
-    mock_cv2.cvtColor.return_value = fake
-    mock_cv2.GaussianBlur.return_value = fake
-    # threshold must return a tuple (retval, thresh). Provide a fake thresh object
-    fake_thresh = MagicMock()
-    mock_cv2.threshold.return_value = (None, fake_thresh)
-
-    # Mock numpy.sum to be above threshold
-    mocker.patch("detection.np.sum", return_value=300000)
-
-    # Call function
-    motion = detection._process_frame_pair(MagicMock(), MagicMock())
-    assert motion is True
-
-def test_process_frame_pair_no_motion(mocker):
-    detection = importlib.import_module("detection")
-
-    mock_cv2 = mocker.patch("detection.cv2", autospec=True)
-    fake = object()
-    mock_cv2.absdiff.return_value = fake
-    mock_cv2.cvtColor.return_value = fake
-    mock_cv2.GaussianBlur.return_value = fake
-    fake_thresh = MagicMock()
-    mock_cv2.threshold.return_value = (None, fake_thresh)
-
-    # numpy.sum below threshold
-    mocker.patch("detection.np.sum", return_value=150000)
-
-    motion = detection._process_frame_pair(MagicMock(), MagicMock())
-    assert motion is False
+def _diff_score(frame1, frame2):
+    # The live path: the configured detector scores the pair against Settings.motion_score
+    import dataclasses
+    from cameras import _create_detector
+    from config import get_settings
+    settings = dataclasses.replace(get_settings(), motion_detector="diff", analysis_width=0, motion_zones="",
+                                   illumination_shift=0)
+    detector = _create_detector(settings)
+    assert detector.analyze(frame1) is None  # first frame only primes the reference
+    return detector.analyze(frame2).score, settings.motion_score
+
+
+def test_frame_pair_motion_detected():
+    import numpy as np
+    frame1 = np.zeros((240, 320, 3), dtype=np.uint8)
+    frame2 = frame1.copy()
+    frame2[60:180, 100:220] = 255
+    score, threshold = _diff_score(frame1, frame2)
+    assert score > threshold
+
+
+def test_frame_pair_no_motion():
+    import numpy as np
+    frame1 = np.full((240, 320, 3), 100, dtype=np.uint8)
+    frame2 = frame1.copy()
+    frame2[10:14, 10:14] = 110  # below the pixel threshold
+    score, threshold = _diff_score(frame1, frame2)
+    assert score <= threshold
 
 def test_launch_detection_starts_thread(mocker):
     # Import module under test
@@ -87,3 +76,71 @@ def test_shutdown_detection_pipeline_clears_event_and_joins(mocker):
     # join should have been called
     fake_thread.join.assert_called()
 
+
+def test_final_mp4_is_delivered_off_the_recorder_thread(mocker):
+    import dataclasses
+    import threading
+    import time
+    import config
+    detection = importlib.import_module("detection")
+
+    settings = dataclasses.replace(config.get_settings(), two_tier_encoding=False)
+    mocker.patch("config.get_settings", return_value=settings)
+    mocker.patch("detection._index_event")
+    mocker.patch("detection._index_new_event")
+    release = threading.Event()
+    delivered = []
+
+    def slow_delivery(event, path, bytes_written):
+        release.wait(5)  # e.g. waiting on the snapshot reply
+        delivered.append((threading.current_thread().name, path))
+
+    mocker.patch("detection._deliver_clip", side_effect=slow_delivery)
+
+    detection._on_clip_recorded({"detected_at": 0.0, "clip_bytes": 10}, "clips/motion.mp4")
+    assert not delivered  # returned without waiting for delivery
+    release.set()
+    for _ in range(100):
+        if delivered:
+            break
+        time.sleep(0.05)
+    assert delivered == [("ClipDeliveryThread", "clips/motion.mp4")]
+
+
+def test_two_tier_alert_is_delivered_off_the_encode_worker(mocker):
+    import dataclasses
+    import threading
+    import time
+    import config
+    detection = importlib.import_module("detection")
+
+    settings = dataclasses.replace(config.get_settings(), two_tier_encoding=True)
+    mocker.patch("config.get_settings", return_value=settings)
+    mocker.patch("detection._index_event")
+    mocker.patch("detection._index_new_event")
+    service = MagicMock()
+    mocker.patch("detection._get_encode_service", return_value=service)
+    release = threading.Event()
+    delivered = []
+
+    def slow_delivery(event, path, bytes_written):
+        release.wait(5)  # e.g. waiting on the snapshot reply
+        delivered.append(threading.current_thread().name)
+        return []
+
+    mocker.patch("detection._deliver_clip", side_effect=slow_delivery)
+
+    detection._on_clip_recorded({"detected_at": 0.0, "clip_bytes": 10}, "clips/motion.avi")
+    alert_job = service.submit.call_args[0][0]
+    alert_job.output_path = "clips/motion_alert.mp4"
+    alert_job.on_done(alert_job)  # runs on the encode worker
+    assert not delivered and service.submit.call_count == 1
+    release.set()
+    for _ in range(100):
+        if service.submit.call_count == 2:
+            break
+        time.sleep(0.05)
+    assert delivered == ["ClipDeliveryThread"]
+    archive_job = service.submit.call_args[0][0]
+    assert archive_job.priority == detection.PRIORITY_ARCHIVE
+    assert archive_job.options["alert_path"] == "clips/motion_alert.mp4"
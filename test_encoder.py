@@ -0,0 +1,103 @@
+import threading
+
+from encoder import EncodeService, EncodeJob, PRIORITY_ALERT, PRIORITY_ARCHIVE
+
+
+def _recording_encoder(order, gate=None):
+    def encode(input_path, **options):
+        if gate is not None:
+            gate.wait(timeout=5)
+        order.append((input_path, options.get("preset")))
+        return input_path + ".mp4"
+    return encode
+
+
+def test_alert_jobs_run_before_archive_jobs():
+    order = []
+    done = threading.Event()
+    service = EncodeService(workers=1, max_queue=8, encode_func=_recording_encoder(order))
+
+    service.submit(EncodeJob("archive1", priority=PRIORITY_ARCHIVE))
+    service.submit(EncodeJob("archive2", priority=PRIORITY_ARCHIVE))
+    service.submit(EncodeJob("alert", priority=PRIORITY_ALERT, on_done=lambda job: done.set()))
+    service.start()
+    assert done.wait(timeout=5)
+
+    assert order[0][0] == "alert"
+    service.stop()
+
+
+def test_full_queue_skips_archive_and_alert_evicts_archive():
+    skipped = []
+    service = EncodeService(workers=1, max_queue=2, encode_func=_recording_encoder([]))
+
+    assert service.submit(EncodeJob("a1", priority=PRIORITY_ARCHIVE, on_done=skipped.append))
+    assert service.submit(EncodeJob("a2", priority=PRIORITY_ARCHIVE, on_done=skipped.append))
+    # Archive job on a full queue is skipped and keeps its source
+    assert service.submit(EncodeJob("a3", priority=PRIORITY_ARCHIVE, on_done=skipped.append)) is False
+    # Alert job displaces the newest archive job
+    assert service.submit(EncodeJob("alert", priority=PRIORITY_ALERT)) is True
+
+    assert [job.input_path for job in skipped] == ["a3", "a2"]
+    assert all(job.skipped and job.output_path == job.input_path for job in skipped)
+    assert service.stats()["skipped"] == 2
+    assert service.depth == 2
+
+
+def test_alert_jobs_degrade_to_fast_preset_under_load():
+    service = EncodeService(workers=1, max_queue=4, encode_func=_recording_encoder([]))
+    service.submit(EncodeJob("a1", priority=PRIORITY_ARCHIVE))
+    service.submit(EncodeJob("a2", priority=PRIORITY_ARCHIVE))
+
+    job = EncodeJob("alert", priority=PRIORITY_ALERT, options={"preset": "medium"})
+    service.submit(job)
+
+    assert job.degraded is True
+    assert job.options["preset"] == "ultrafast"
+    assert service.stats()["degraded"] == 1
+
+
+def test_stats_report_wait_and_encode_times():
+    finished = threading.Event()
+    service = EncodeService(workers=2, max_queue=4, encode_func=_recording_encoder([]))
+    service.start()
+    service.submit(EncodeJob("clip", priority=PRIORITY_ALERT, on_done=lambda job: finished.set()))
+    assert finished.wait(timeout=5)
+    service.stop()
+
+    stats = service.stats()
+    assert stats["completed"] == 1
+    assert stats["depth"] == 0
+    assert stats["avg_wait"] >= 0 and stats["avg_encode"] >= 0
+
+
+def test_archive_jobs_wait_for_idle_but_alerts_do_not():
+    order = []
+    idle = threading.Event()
+    alert_done = threading.Event()
+    archive_done = threading.Event()
+    service = EncodeService(workers=1, max_queue=4, encode_func=_recording_encoder(order),
+                            idle_check=idle.is_set)
+    service.start()
+
+    service.submit(EncodeJob("archive", priority=PRIORITY_ARCHIVE, on_done=lambda job: archive_done.set()))
+    service.submit(EncodeJob("alert", priority=PRIORITY_ALERT, on_done=lambda job: alert_done.set()))
+    assert alert_done.wait(timeout=5)
+    assert not archive_done.wait(timeout=0.3)
+
+    idle.set()
+    assert archive_done.wait(timeout=5)
+    service.stop()
+    assert [path for path, _ in order] == ["alert", "archive"]
+
+
+def test_job_func_overrides_service_encoder():
+    done = threading.Event()
+    service = EncodeService(workers=1, encode_func=_recording_encoder([]))
+    service.start()
+    job = EncodeJob("clip", priority=PRIORITY_ALERT, func=lambda path, **_: path + "_alert.mp4",
+                    on_done=lambda job: done.set())
+    service.submit(job)
+    assert done.wait(timeout=5)
+    service.stop()
+    assert job.output_path == "clip_alert.mp4"
@@ -0,0 +1,121 @@
+import time
+
+from events import EventStore, day_bounds, format_event
+
+
+def test_event_lifecycle_and_day_queries(tmp_path):
+    store = EventStore(str(tmp_path / "events.db"))
+    start, end = day_bounds()
+    yesterday = start - 3600
+
+    old_id = store.record_event(yesterday)
+    event_id = store.record_event(start + 60)
+    store.update_event(event_id, ended_at=start + 75, peak_score=420000, delivery="dispatched")
+
+    assert store.count_between(start, end) == 1
+    (row,) = store.events_between(start, end, limit=10)
+    assert row["id"] == event_id and row["peak_score"] == 420000
+    assert "15s" in format_event(row) and "dispatched" in format_event(row)
+    assert [r["id"] for r in store.expired(start)] == [old_id]
+    store.close()
+
+
+def test_camera_outages_are_recorded_and_purged(tmp_path):
+    store = EventStore(str(tmp_path / "events.db"))
+    start, end = day_bounds()
+    store.record_outage("porch", start - 7200, start - 7100, attempts=2)
+    store.record_outage("porch", start + 60, start + 72.5, attempts=4)
+
+    (row,) = store.outages_between(start, end)
+    assert row["camera"] == "porch" and row["ended_at"] - row["started_at"] == 12.5 and row["recovered"] == 1
+    store.purge(start)
+    assert len(store.outages_between(0, end)) == 1
+    store.close()
+
+
+def test_update_rejects_unknown_columns(tmp_path):
+    import pytest
+
+    store = EventStore(str(tmp_path / "events.db"))
+    event_id = store.record_event(time.time())
+    with pytest.raises(ValueError):
+        store.update_event(event_id, detected_at=0)
+
+
+def test_clean_old_clips_deletes_expired_indexed_files(tmp_path, monkeypatch):
+    import events
+    import utils
+
+    store = EventStore(str(tmp_path / "events.db"))
+    monkeypatch.setattr(events, "_store", store)
+    old_clip = tmp_path / "old.mp4"
+    old_poster = tmp_path / "old.jpg"
+    new_clip = tmp_path / "new.mp4"
+    for f in (old_clip, old_poster, new_clip):
+        f.write_bytes(b"x")
+
+    old_id = store.record_event(time.time() - 10 * 86400)
+    store.update_event(old_id, clip_path=str(old_clip), poster_path=str(old_poster))
+    new_id = store.record_event(time.time())
+    store.update_event(new_id, clip_path=str(new_clip))
+
+    utils.clean_old_clips(folder=str(tmp_path), days=7)
+
+    assert not old_clip.exists() and not old_poster.exists()
+    assert new_clip.exists()
+    assert store.get_event(old_id)["deleted"] == 1
+    assert store.expired(time.time()) == [store.get_event(new_id)]
+
+
+def test_clean_old_clips_backfills_untracked_files_once(tmp_path, monkeypatch):
+    import os
+    import events
+    import utils
+
+    store = EventStore(str(tmp_path / "events.db"))
+    monkeypatch.setattr(events, "_store", store)
+    clips = tmp_path / "clips"
+    (clips / "garage").mkdir(parents=True)
+    stray = clips / "garage" / "motion_old_alert.mp4"
+    fresh_stray = clips / "motion_new.avi"
+    kept = clips / "motion_kept.mp4"
+    for f in (stray, fresh_stray, kept):
+        f.write_bytes(b"x")
+    old = time.time() - 10 * 86400
+    os.utime(stray, (old, old))
+    os.utime(kept, (old, old))
+    # An old file still referenced by a live event stays until its event expires
+    store.update_event(store.record_event(time.time()), clip_path=str(kept))
+
+    utils.clean_old_clips(folder=str(clips), days=7)
+
+    assert not stray.exists()
+    assert fresh_stray.exists() and kept.exists()
+    assert store.expired_files(time.time() + 1) == [os.path.abspath(fresh_stray)]
+
+    # Later runs use the index only; files appearing afterwards are not scanned for
+    late = clips / "motion_late.avi"
+    late.write_bytes(b"x")
+    os.utime(late, (old, old))
+    assert store.backfill_files(str(clips)) == 0
+    utils.clean_old_clips(folder=str(clips), days=7)
+    assert late.exists()
+
+
+def test_existing_database_gains_new_columns(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "events.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY AUTOINCREMENT, detected_at REAL NOT NULL, "
+                 "ended_at REAL, peak_score REAL, clip_path TEXT, clip_bytes INTEGER, alert_path TEXT, "
+                 "poster_path TEXT, thumbnail_path TEXT, first_notified_at REAL, "
+                 "delivery TEXT NOT NULL DEFAULT 'pending', deleted INTEGER NOT NULL DEFAULT 0)")
+    conn.commit()
+    conn.close()
+
+    store = EventStore(path)
+    event_id = store.record_event(time.time(), confidence=0.8, motion_boxes=[(10, 20, 30, 40)])
+    row = store.get_event(event_id)
+    assert row["confidence"] == 0.8
+    assert row["motion_boxes"] == "[[10, 20, 30, 40]]"
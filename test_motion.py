@@ -0,0 +1,145 @@
+import numpy as np
+
+from motion import FrameDiffDetector, downscale_gray
+
+
+def _scene(block_at=None, width=1920, height=1080):
+    frame = np.full((height, width, 3), 90, dtype=np.uint8)
+    if block_at is not None:
+        x, y = block_at
+        frame[y:y + 300, x:x + 400] = 220
+    return frame
+
+
+def test_downscale_gray_reports_area_ratio():
+    gray, ratio = downscale_gray(_scene(), 320)
+    assert gray.shape == (180, 320)
+    assert ratio == (1920 * 1080) / (320 * 180)
+
+
+def test_downscaled_score_matches_full_resolution_units():
+    full = FrameDiffDetector(width=0)
+    small = FrameDiffDetector(width=320)
+    for detector in (full, small):
+        assert detector.score(_scene((200, 200))) is None  # first frame primes the reference
+
+    full_score = full.score(_scene((800, 500)))
+    small_score = small.score(_scene((800, 500)))
+
+    # Two 400x300 blocks changed: ~240000 pixels, 255 each
+    assert abs(small_score - full_score) / full_score < 0.1
+    assert small.score(_scene((800, 500))) == 0
+
+
+def test_background_models_catch_slow_movers_that_pair_diff_misses():
+    import pytest
+    from motion import create_detector
+
+    detectors = {name: create_detector(name, width=320) for name in ("diff", "average", "mog2")}
+    for detector in detectors.values():
+        for _ in range(20):
+            detector.score(_scene())
+
+    # An object creeping in a few pixels per step: consecutive frames barely differ
+    final = {}
+    for step in range(1, 6):
+        frame = _scene((100 + step * 4, 200))
+        final = {name: detector.score(frame) for name, detector in detectors.items()}
+
+    assert final["diff"] < final["average"]
+    assert final["diff"] < final["mog2"]
+    with pytest.raises(ValueError):
+        create_detector("optical-flow")
+
+
+def test_temporal_filter_needs_k_of_n_and_counts_rejected_bursts():
+    from motion import TemporalFilter
+
+    f = TemporalFilter(k=3, n=5)
+    # A lone noisy frame never fires and is counted once it leaves the window
+    assert [f.update(h) for h in (1, 0, 0, 0, 0, 0)] == [False] * 6
+    assert f.rejected == 1
+
+    # Sustained motion fires on the third hit within five frames
+    assert [f.update(h) for h in (1, 0, 1, 1)] == [False, False, False, True]
+    assert f.confidence == 0.6
+    assert f.stats() == {"k": 3, "n": 5, "fired": 1, "rejected": 1}
+
+
+def test_global_brightness_change_is_suppressed_but_local_motion_is_not():
+    from motion import create_detector
+
+    base = np.tile(np.linspace(40, 160, 1920, dtype=np.float32), (1080, 1))
+    base = np.dstack([base] * 3)
+
+    def lit(gain, block_at=None):
+        frame = np.clip(base * gain, 0, 255).astype(np.uint8)
+        if block_at is not None:
+            x, y = block_at
+            frame[y:y + 300, x:x + 400] = 250
+        return frame
+
+    for name in ("diff", "average"):
+        detector = create_detector(name, width=320)
+        unguarded = create_detector(name, width=320, illumination_shift=0)
+        for d in (detector, unguarded):
+            for _ in range(3):
+                d.score(lit(1.0))
+
+        # Lights on: every pixel brightens by ~40%
+        assert unguarded.score(lit(1.4)) > 200000
+        assert detector.score(lit(1.4)) == 0
+        assert detector.illumination_suppressed == 1
+
+        # A person walking in under the new lighting still scores
+        assert detector.score(lit(1.4, (800, 500))) > 200000
+        assert detector.illumination_suppressed == 1
+        assert 0 < detector.stats()["illumination_rate"] < 1
+
+
+def test_analyze_reports_boxes_and_centroid_in_full_frame_pixels():
+    from zones import Zone
+
+    detector = FrameDiffDetector(width=320)
+    assert detector.analyze(_scene()) is None
+
+    result = detector.analyze(_scene((800, 500)))
+    assert len(result.boxes) == 1
+    x, y, w, h = result.boxes[0]
+    assert abs(x - 800) <= 12 and abs(y - 500) <= 12
+    assert abs(w - 400) <= 24 and abs(h - 300) <= 24
+    assert abs(result.centroid[0] - 1000) <= 12 and abs(result.centroid[1] - 650) <= 12
+    assert 0.05 < result.changed_fraction < 0.07  # 400x300 of 1920x1080
+    still = detector.analyze(_scene((800, 500)))
+    assert still.score == 0 and still.boxes == ()  # no change, no boxes
+
+    # Change made only of regions below min_area still scores; callers test .score, not the result
+    small = detector.analyze(_scene((900, 600)), min_area=10 ** 7)
+    assert small.score > 0 and small.boxes == () and small
+
+    # Cropped to a zone, boxes still come back in full-frame coordinates
+    zoned = FrameDiffDetector(width=320)
+    zoned.set_zones([Zone("right", "include", [(0.5, 0), (1, 0), (1, 1), (0.5, 1)])])
+    zoned.analyze(_scene())
+    x, y, w, h = zoned.analyze(_scene((1200, 100))).boxes[0]
+    assert abs(x - 1200) <= 12 and abs(y - 100) <= 12
+
+
+def test_tiled_detector_matches_full_resolution_diff_on_active_tiles_only():
+    from motion import create_detector
+
+    full = create_detector("diff", width=0)
+    tiled = create_detector("tiled", width=160, tile=128, workers=2)
+    try:
+        for detector in (full, tiled):
+            assert detector.analyze(_scene()) is None
+            assert detector.analyze(_scene()).score == 0  # idle: no tiles examined
+
+        assert tiled.tiles_checked == 0
+        expected = full.analyze(_scene((800, 500)))
+        result = tiled.analyze(_scene((800, 500)))
+        assert result.score == expected.score
+        assert result.boxes == expected.boxes
+        assert 0 < tiled.stats()["tile_ratio"] < 0.2
+    finally:
+        tiled.close()
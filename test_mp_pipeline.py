@@ -0,0 +1,185 @@
+import multiprocessing as mp
+import os
+import threading
+import time
+
+import numpy as np
+
+from mp_pipeline import ProcessPipeline
+from mp_stages import SharedFrameRing
+
+
+class MovingCamera:
+    """Capture-like source with a bright block sweeping across a still scene; picklable by reference."""
+
+    def __init__(self):
+        self.step = 0
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        time.sleep(0.01)
+        self.step += 1
+        frame = np.full((240, 320, 3), 80, np.uint8)
+        x = (self.step * 12) % 200
+        frame[60:180, x:x + 100] = 230
+        return True, frame
+
+    def get(self, prop):
+        return 0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        pass
+
+
+def _produce(spec, count):
+    ring = SharedFrameRing.attach(spec)
+    for i in range(count):
+        ring.push(np.full((4, 6, 3), i, np.uint8), timestamp=float(i))
+    ring.close()
+
+
+def test_shared_ring_carries_frames_between_processes_and_counts_overwrites():
+    ring = SharedFrameRing.for_shape((4, 6, 3), capacity=4)
+    try:
+        reader = ring.reader("test")
+        producer = mp.get_context("spawn").Process(target=_produce, args=(ring.spec, 6))
+        producer.start()
+        producer.join(timeout=30)
+        assert producer.exitcode == 0
+
+        entries = reader.read_new()
+        assert [seq for seq, _, _ in entries] == [2, 3, 4, 5]
+        assert [ts for _, ts, _ in entries] == [2.0, 3.0, 4.0, 5.0]
+        assert entries[-1][2].shape == (4, 6, 3) and int(entries[-1][2][0, 0, 0]) == 5
+        assert reader.dropped == 2
+        assert ring.get(1) is None  # overwritten
+
+        ring.push(np.full((4, 6, 2), 9, np.uint8))  # packed YUYV frames fit BGR-sized slots
+        assert ring.latest()[2].shape == (4, 6, 2)
+    finally:
+        ring.close()
+
+
+def test_process_pipeline_fires_events_and_restarts_a_killed_stage():
+    fired = []
+    overrides = {"pre_roll_seconds": 0, "temporal_k": 1, "temporal_n": 1, "motion_score": 1000,
+                 "illumination_shift": 0, "cooldown": 1000}
+
+    def on_motion(recorder, cooldown, frame, confidence, result, zones, camera):
+        fired.append((camera, frame.shape))
+        return False  # no clip; this test is about the stage plumbing
+
+    active = threading.Event()
+    active.set()
+    pipeline = ProcessPipeline("porch", MovingCamera, overrides, on_motion=on_motion)
+    pipeline.start()
+    pipeline.start_thread(active)
+    try:
+        deadline = time.time() + 60
+        while not fired and time.time() < deadline:
+            time.sleep(0.1)
+        assert fired and fired[0] == ("porch", (240, 320, 3))
+
+        capture = pipeline._stages["capture"].process
+        os.kill(capture.pid, 9)
+        capture.join(timeout=5)
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            restarted = pipeline._stages["capture"].process
+            if restarted is not None and restarted.is_alive() and restarted is not capture:
+                break
+            time.sleep(0.1)
+        produced = pipeline.ring.produced
+        deadline = time.time() + 30
+        while pipeline.ring.produced <= produced + 10 and time.time() < deadline:
+            time.sleep(0.1)
+        stats = pipeline.stats()
+        assert stats["detection"]["restarts"] == {"capture": 1, "analysis": 0, "recorder": 0}
+        assert stats["capture"]["produced"] > produced + 10
+        assert stats["latency_ms"] is not None
+    finally:
+        active.clear()
+        pipeline._thread.join(timeout=30)
+    assert not pipeline.is_alive() and pipeline.ring is None
+
+
+def test_recorder_reset_drops_pending_events_and_marks_them_failed(tmp_path, monkeypatch):
+    import events
+    from events import EventStore
+    from mp_pipeline import RecorderProxy
+
+    store = EventStore(str(tmp_path / "events.db"))
+    monkeypatch.setattr(events, "_store", store)
+    ctx = mp.get_context("spawn")
+    proxy = RecorderProxy(ctx.Queue(), ctx.Value("b", 0))
+    event = {"detected_at": time.time()}
+    assert proxy.trigger(event)
+    event["id"] = store.record_event(event["detected_at"])  # indexed after the trigger, like detection does
+
+    assert proxy.reset() == 1
+    assert not proxy.is_recording and proxy.reset() == 0
+    assert store.get_event(event["id"])["delivery"] == "failed"
+    # A clip the dead process never reported can no longer be merged into the event
+    assert proxy.finish({"token": 1, "clip_bytes": 5}) == {"clip_bytes": 5}
+
+
+def test_stage_processes_do_not_load_the_gui_or_bot():
+    import subprocess
+    import sys
+
+    # A spawned stage re-imports the main script, then the module holding its target
+    check = ("import sys, main, mp_stages; "
+             "print(sorted({'PyQt5', 'qasync', 'gui', 'telegram_bot', 'detection'} & set(sys.modules)))")
+    out = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, timeout=60,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip() == "[]"
+
+
+def test_reloaded_motion_score_reaches_the_analysis_process_and_stop_is_thread_safe(monkeypatch):
+    import dataclasses
+    import config
+
+    base = dataclasses.replace(config.get_settings(), motion_score=1000)
+    monkeypatch.setattr(config, "_settings", base)
+    fired = []
+    overrides = {"pre_roll_seconds": 0, "temporal_k": 1, "temporal_n": 1, "illumination_shift": 0}
+
+    def on_motion(recorder, cooldown, frame, confidence, result, zones, camera):
+        fired.append(time.time())
+        return False
+
+    active = threading.Event()
+    active.set()
+    pipeline = ProcessPipeline("porch", MovingCamera, overrides, on_motion=on_motion)
+    pipeline.start()
+    thread = pipeline.start_thread(active)
+    errors = []
+    monkeypatch.setattr(threading, "excepthook", lambda args: errors.append(args.exc_value))
+    try:
+        deadline = time.time() + 60
+        while not fired and time.time() < deadline:
+            time.sleep(0.1)
+        assert fired
+
+        # Hot reload: nothing scores this high, so events stop without restarting the stage
+        monkeypatch.setattr(config, "_settings", dataclasses.replace(base, motion_score=10 ** 12))
+        time.sleep(1.0)
+        applied_at = time.time()
+        time.sleep(1.5)
+        assert not [t for t in fired if t > applied_at]
+        assert pipeline.stats()["detection"]["restarts"]["analysis"] == 0
+
+        pipeline.stop()  # from another thread, while run() is still going
+        thread.join(timeout=30)
+        assert not thread.is_alive() and pipeline.ring is None
+    finally:
+        active.clear()
+        thread.join(timeout=30)
+    pipeline.stop()  # and again: a no-op
+    assert not errors
@@ -8,7 +8,6 @@ from unittest.mock import patch, MagicMock
     "APP_PASSWORD": "app_pwd",
     "FASTMAIL_RECIPIENT": "receiver@test.com"
 })
-@patch('notifications.load_dotenv', new=MagicMock())
 @patch('notifications.threading.Thread')
 @patch('notifications.os.path.getsize', return_value=0)
 @patch('notifications.os.path.exists', return_value=True)
@@ -31,3 +30,62 @@ def test_motion_count_threading(mock_thread, mock_getsize, mock_exists):
     assert get_motion_count() == 0
 
 
+
+
+def test_snapshot_falls_back_to_text_and_returns_message_id(monkeypatch):
+    import numpy as np
+    import notifications
+
+    monkeypatch.setattr(notifications, "TELEGRAM_TOKEN", "T_TOKEN")
+    monkeypatch.setattr(notifications, "TELEGRAM_CHAT_ID", "T_CHAT")
+    rejected = MagicMock(status_code=400)
+    rejected.json.return_value = {"ok": False}
+    accepted = MagicMock(status_code=200)
+    accepted.json.return_value = {"ok": True, "result": {"message_id": 42}}
+    mock_requests = MagicMock()
+    mock_requests.post.side_effect = [rejected, accepted]
+    monkeypatch.setattr(notifications, "requests", mock_requests)
+
+    message_id = notifications.send_telegram_snapshot(np.zeros((48, 64, 3), dtype=np.uint8))
+
+    photo_call, text_call = mock_requests.post.call_args_list
+    assert photo_call[0][0].endswith("/sendPhoto") and "photo" in photo_call[1]["files"]
+    assert text_call[0][0].endswith("/sendMessage")
+    assert message_id == 42
+
+
+def test_snapshot_reports_a_rejected_text_fallback(monkeypatch):
+    import numpy as np
+    import notifications
+
+    monkeypatch.setattr(notifications, "TELEGRAM_TOKEN", "T_TOKEN")
+    monkeypatch.setattr(notifications, "TELEGRAM_CHAT_ID", "T_CHAT")
+    rejected = MagicMock(status_code=400)
+    rejected.json.return_value = {"ok": False}
+    mock_requests = MagicMock()
+    mock_requests.post.return_value = rejected
+    monkeypatch.setattr(notifications, "requests", mock_requests)
+    mock_log = MagicMock()
+    monkeypatch.setattr(notifications, "T", mock_log)
+
+    assert notifications.send_telegram_snapshot(np.zeros((48, 64, 3), dtype=np.uint8)) is None
+    assert mock_requests.post.call_count == 2
+    mock_log.info.assert_not_called()
+    assert "sendMessage rejected" in mock_log.error.call_args[0][0]
+
+
+def test_video_replies_to_snapshot_without_repeating_text(monkeypatch, tmp_path):
+    import notifications
+
+    clip = tmp_path / "clip.mp4"
+    clip.write_bytes(b"mp4")
+    monkeypatch.setattr(notifications, "TELEGRAM_TOKEN", "T_TOKEN")
+    monkeypatch.setattr(notifications, "TELEGRAM_CHAT_ID", "T_CHAT")
+    mock_requests = MagicMock()
+    monkeypatch.setattr(notifications, "requests", mock_requests)
+
+    notifications._send_telegram_alert("Motion detected!", str(clip), reply_to=42)
+
+    (call,) = mock_requests.post.call_args_list
+    assert call[0][0].endswith("/sendVideo")
+    assert call[1]["data"]["reply_to_message_id"] == 42
@@ -0,0 +1,149 @@
+import numpy as np
+
+from recorder import PreRollBuffer, estimate_preroll_bytes, MB
+
+
+def _frame(value=0, width=64, height=48):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+def test_preroll_evicts_frames_older_than_window():
+    buf = PreRollBuffer(seconds=1.0)
+    for i in range(30):
+        buf.push(_frame(i), timestamp=i * 0.25)
+
+    stats = buf.stats()
+    assert stats["seconds"] == 1.0
+    assert len(buf) == 5  # 6.25 .. 7.25 inclusive
+
+
+def test_preroll_respects_byte_budget():
+    frame_bytes = _frame().nbytes
+    buf = PreRollBuffer(seconds=60, max_bytes=frame_bytes * 5)
+    for i in range(20):
+        buf.push(_frame(i), timestamp=float(i))
+
+    assert len(buf) == 5
+    assert buf.nbytes <= frame_bytes * 5
+    assert buf.stats()["budget_evictions"] == 15
+
+
+def test_jpeg_preroll_drains_full_size_frames_and_empties():
+    buf = PreRollBuffer(seconds=10, scale=0.5, jpeg_quality=80)
+    for i in range(4):
+        buf.push(_frame(100), timestamp=float(i))
+
+    assert buf.nbytes < _frame().nbytes * 4
+    frames = buf.drain()
+
+    assert len(frames) == 4
+    assert all(f.shape == (48, 64, 3) for f in frames)
+    assert len(buf) == 0 and buf.nbytes == 0
+
+
+def test_for_resolution_switches_to_jpeg_when_raw_exceeds_budget():
+    raw_1080p = estimate_preroll_bytes(1920, 1080, 30, 5)
+    assert raw_1080p > 256 * MB
+
+    big = PreRollBuffer.for_resolution(1920, 1080, 30, 5, max_bytes=256 * MB)
+    small = PreRollBuffer.for_resolution(320, 240, 15, 5, max_bytes=256 * MB)
+
+    assert big.jpeg_quality > 0
+    assert small.jpeg_quality == 0
+
+
+def test_recorder_writes_clip_off_thread_and_rejects_overlapping_triggers(tmp_path):
+    import threading
+    import time
+    from capture import FrameRingBuffer
+    from recorder import Recorder
+
+    ring = FrameRingBuffer(capacity=16)
+    done = threading.Event()
+    clips = []
+
+    def on_clip(event, path):
+        clips.append((event, path))
+        done.set()
+
+    rec = Recorder(ring, preroll=PreRollBuffer(seconds=1.0), min_seconds=0.3, post_roll_seconds=0.1,
+                   on_clip=on_clip, clips_dir=str(tmp_path))
+    rec.start()
+
+    stop = threading.Event()
+
+    def produce():
+        while not stop.is_set():
+            ring.push(_frame(50))
+            time.sleep(0.01)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    time.sleep(0.2)  # let the pre-roll fill
+
+    assert rec.trigger({"detected_at": time.time()}) is True
+    assert rec.trigger({"detected_at": time.time()}) is False
+    assert done.wait(timeout=5)
+
+    stop.set()
+    rec.stop()
+    producer.join()
+
+    assert rec.clips_written == 1
+    assert clips[0][1].startswith(str(tmp_path)) and clips[0][1].endswith(".avi")
+    assert not rec.is_recording
+
+
+def test_recorder_extends_clip_while_motion_continues_up_to_max():
+    from capture import FrameRingBuffer
+    from recorder import Recorder
+
+    rec = Recorder(FrameRingBuffer(capacity=4), min_seconds=5, post_roll_seconds=3, max_seconds=60)
+    assert rec.notify_motion(1.0) is False  # nothing recording yet
+
+    rec.trigger({"detected_at": 100.0})
+    start = 100.0
+    assert not rec._should_stop(start, 104.0)  # still inside the minimum length
+    assert rec._should_stop(start, 105.0)  # min reached and 5s of quiet
+
+    rec.notify_motion(120.0)
+    assert not rec._should_stop(start, 122.0)  # motion 2s ago keeps the clip open
+    assert rec._should_stop(start, 123.0)  # post-roll of quiet elapsed
+
+    rec.notify_motion(159.5)
+    assert rec._should_stop(start, 160.0)  # hard cap wins over ongoing motion
+
+
+def test_keyframe_tracker_keeps_distinct_peaks():
+    from recorder import KeyframeTracker
+
+    tracker = KeyframeTracker(count=2, min_gap=1.0)
+    tracker.offer(10, "a", 0.0)
+    tracker.offer(50, "b", 0.5)  # same moment as "a" but stronger: replaces it
+    tracker.offer(30, "c", 2.0)
+    tracker.offer(20, "d", 4.0)  # weaker than both kept frames
+    tracker.offer(40, "e", 2.4)  # beats "c" within its window
+
+    assert tracker.best() == "b"
+    assert [frame for _, _, frame in tracker.keyframes()] == ["b", "e"]
+
+
+def test_recorder_saves_peak_frame_as_poster_and_thumbnail(tmp_path):
+    import cv2
+    from capture import FrameRingBuffer
+    from recorder import Recorder
+
+    rec = Recorder(FrameRingBuffer(capacity=4))
+    assert rec.observe(5, _frame(10), 0.0) is False  # ignored while idle
+
+    rec.trigger({"detected_at": 0.0})
+    rec.observe(5, _frame(10, width=640, height=480), 0.0)
+    rec.observe(9, _frame(200, width=640, height=480), 2.0)
+    event = {}
+    rec._save_keyframes(str(tmp_path / "motion"), event)
+
+    poster = cv2.imread(event["poster"])
+    thumb = cv2.imread(event["thumbnail"])
+    assert poster.shape == (480, 640, 3) and abs(int(poster.mean()) - 200) < 3
+    assert thumb.shape == (240, 320, 3)
+    assert [score for score, _ in event["keyframes"]] == [5, 9]
@@ -54,3 +54,41 @@ def test_compress_video_success(monkeypatch, tmp_path, mocker):
     # compress_video returns an output path (endswith .mp4)
     assert out is not None and out.endswith(".mp4")
 
+
+
+def test_ffmpeg_pipe_writer_encodes_a_playable_clip(tmp_path):
+    import cv2
+    import numpy as np
+    import utils
+
+    path = str(tmp_path / "out.mp4")
+    writer = utils.FfmpegPipeWriter(path, 30, (64, 48))
+    for i in range(10):
+        writer.write(np.full((48, 64, 3), i * 20, dtype=np.uint8))
+    writer.write(np.zeros((60, 80, 3), dtype=np.uint8))  # resized to the clip size
+
+    assert writer.release() is True
+    assert writer.frames_written == 11
+    cap = cv2.VideoCapture(path)
+    try:
+        assert cap.isOpened()
+        assert int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) == 64 and int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) == 48
+        assert cap.read()[0]
+    finally:
+        cap.release()
+
+
+def test_alert_rendition_is_small_fast_and_keeps_master(tmp_path, monkeypatch, mocker):
+    import utils
+
+    master = tmp_path / "motion.avi"
+    master.write_bytes(b"avi")
+    monkeypatch.setattr(utils, "get_ffmpeg_exe", lambda: "/usr/bin/ffmpeg")
+    mock_run = mocker.patch.object(utils.subprocess, "run")
+
+    out = utils.encode_alert_rendition(str(master), width=480)
+
+    cmd = mock_run.call_args[0][0]
+    assert out == str(tmp_path / "motion_alert.mp4") and cmd[-1] == out
+    assert "ultrafast" in cmd and "scale='min(480,iw)':-2" in cmd
+    assert master.exists()
@@ -0,0 +1,69 @@
+import numpy as np
+
+from zones import Zone, ZoneMask, parse_zones
+
+
+def test_parse_zones_reads_json_and_ignores_bad_specs():
+    zones = parse_zones('[{"name": "drive", "type": "include", "points": [[0, 0.5], [1, 0.5], [1, 1], [0, 1]]}]')
+    assert zones == [Zone("drive", "include", [(0, 0.5), (1, 0.5), (1, 1), (0, 1)])]
+    assert parse_zones('[{"type": "include", "points": [[0, 0], [2, 0], [0, 1]]}]') == []
+    assert parse_zones("") == []
+
+
+def test_roi_is_include_bounds_and_mask_is_cached():
+    lower_half = Zone("drive", "include", [(0, 0.5), (1, 0.5), (1, 1), (0, 1)])
+    street = Zone("street", "exclude", [(0, 0.5), (0.25, 0.5), (0.25, 1), (0, 1)])
+    tree = Zone("tree", "exclude", [(0.5, 0.6), (0.6, 0.6), (0.6, 0.8), (0.5, 0.8)])
+    zones = ZoneMask([lower_half, street, tree])
+
+    x0, y0, x1, y1 = zones.roi((480, 640, 3))
+    assert (y0, y1) == (240, 480) and x0 > 150 and x1 == 640
+
+    mask = zones.mask((480, 640, 3), (60, 120))
+    assert mask.shape == (60, 120) and 0 < np.count_nonzero(mask) < mask.size
+    assert zones.mask((480, 640, 3), (60, 120)) is mask
+    # Excluding only the crop's outside leaves nothing to mask
+    assert ZoneMask([lower_half, street]).mask((480, 640, 3), (60, 120)) is None
+
+
+def test_detector_ignores_motion_outside_zones():
+    from motion import create_detector
+
+    lower_half = Zone("drive", "include", [(0, 0.5), (1, 0.5), (1, 1), (0, 1)])
+    detector = create_detector("diff", zones=[lower_half], width=320)
+    still = np.full((480, 640, 3), 80, np.uint8)
+    top = still.copy()
+    top[20:200, 100:400] = 230
+    bottom = still.copy()
+    bottom[300:460, 100:400] = 230
+
+    detector.score(still)
+    assert detector.score(top) == 0
+    assert detector.score(bottom) > 0
+
+
+def test_each_zone_is_scored_and_judged_by_its_own_threshold():
+    from motion import create_detector
+    from detection import _alert_channels
+
+    zones = parse_zones('[{"name": "door", "points": [[0, 0], [0.5, 0], [0.5, 1], [0, 1]], '
+                        '"threshold": 1000, "notify": "telegram"}, '
+                        '{"name": "street", "points": [[0.5, 0], [1, 0], [1, 1], [0.5, 1]], "threshold": 1e9}]')
+    assert zones[0].notify == ("telegram",) and zones[1].threshold == 1e9
+    assert parse_zones('[{"points": [[0, 0], [1, 0], [1, 1]], "notify": ["pager"]}]') == []
+
+    detector = create_detector("diff", zones=zones, width=320)
+    still = np.full((480, 640, 3), 80, np.uint8)
+    moved = still.copy()
+    moved[100:200, 50:150] = 230    # door
+    moved[100:200, 400:500] = 230   # street
+    detector.analyze(still)
+    result = detector.analyze(moved)
+
+    # 100x100 changed pixels in each zone, 255 apiece (blur softens the edges)
+    assert abs(result.zone_scores["door"] - 100 * 100 * 255) / (100 * 100 * 255) < 0.1
+    assert abs(result.zone_scores["door"] - result.zone_scores["street"]) < 1
+    assert detector.fired_zones(result, default_threshold=200000) == [zones[0]]
+    assert _alert_channels([zones[0]]) == ("telegram",)
+    assert _alert_channels(zones) == ("telegram", "email")
+    assert create_detector("diff", width=320).fired_zones(result, 200000) is None
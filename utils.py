@@ -15,19 +15,6 @@ from imageio_ffmpeg import get_ffmpeg_exe
 daily_summary_enabled = True
 active_timers = []
 
-from dotenv import load_dotenv
-# Load environment variables
-dotenv_path = os.path.join(os.getcwd(), ".env")
-if not os.path.exists(dotenv_path):
-    # Fallback for when the .desktop file's Path setting is ignored or failed
-    dotenv_path = "/opt/motion-detector/.env"
-
-load_dotenv(dotenv_path=dotenv_path)
-
-# Telegram and Email Configuration (Read from .env)
-TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-
 # utils.py
 def gui_after(ms, func):
     from PyQt5.QtCore import QTimer
@@ -61,7 +48,91 @@ def open_video_writer(path, fourcc, fps, frame_size):
             writer.release()
 
 
-def compress_video(input_path, target_size_mb=10):
+class FfmpegPipeWriter:
+    """
+    cv2.VideoWriter-compatible writer that streams raw BGR frames into a
+    long-lived ffmpeg process, producing the final MP4 in a single pass.
+    """
+
+    def __init__(self, path, fps, frame_size, codec="libx264", preset="veryfast", crf=23):
+        width, height = frame_size
+        self.path = path
+        self.frame_size = frame_size
+        self.frames_written = 0
+        self.failed = False
+        cmd = [
+            get_ffmpeg_exe(), "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps),
+            "-i", "-", "-an",
+            "-c:v", codec, "-preset", preset, "-crf", str(crf), "-pix_fmt", "yuv420p",
+        ]
+        if width % 2 or height % 2:
+            # yuv420p needs even dimensions
+            cmd += ["-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2"]
+        if codec == "libx265":
+            cmd += ["-tag:v", "hvc1"]  # Apple-compatible H.265
+        cmd += ["-movflags", "+faststart", path]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                      stderr=subprocess.PIPE)
+
+    def isOpened(self):
+        return self._proc is not None and self._proc.poll() is None and not self.failed
+
+    def write(self, frame):
+        if self.failed:
+            return
+        if (frame.shape[1], frame.shape[0]) != self.frame_size:
+            frame = cv2.resize(frame, self.frame_size)
+        try:
+            self._proc.stdin.write(frame.tobytes())
+            self.frames_written += 1
+        except (BrokenPipeError, OSError) as e:
+            self.failed = True
+            T.error(f"ffmpeg pipe closed while writing {self.path}: {e}")
+
+    def release(self):
+        """Closes the pipe and waits for ffmpeg to finalize the file. Returns True on success."""
+        if self._proc is None:
+            return not self.failed
+        try:
+            # communicate() flushes and closes stdin itself; closing it first makes its flush raise
+            _, stderr = self._proc.communicate(timeout=120)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+            _, stderr = self._proc.communicate()
+            self.failed = True
+        if self._proc.returncode != 0:
+            self.failed = True
+            T.error(f"ffmpeg exited with {self._proc.returncode} for {self.path}: "
+                    f"{(stderr or b'').decode(errors='replace').strip()[-300:]}")
+        self._proc = None
+        return not self.failed
+
+
+def encode_alert_rendition(input_path, width=640, preset="ultrafast", crf=28):
+    """Quickly encodes a small H.264 copy of a clip for Telegram/email, keeping the original."""
+    if not input_path or not os.path.exists(input_path):
+        T.warning("Input video path is invalid or missing.")
+        return None
+
+    output_path = f"{Path(input_path).with_suffix('')}_alert.mp4"
+    ffmpeg_cmd = [
+        get_ffmpeg_exe(), "-y", "-loglevel", "error", "-i", input_path, "-an",
+        "-vf", f"scale='min({width},iw)':-2",
+        "-c:v", "libx264", "-preset", preset, "-crf", str(crf), "-pix_fmt", "yuv420p",
+        "-movflags", "+faststart", output_path
+    ]
+    try:
+        subprocess.run(ffmpeg_cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return output_path
+    except Exception as e:
+        T.error(f"Alert rendition failed: {e}. Sending original clip.")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return input_path
+
+
+def compress_video(input_path, target_size_mb=10, preset="medium"):
     """Compresses and converts video to MP4 using imageio-ffmpeg with H.265 codec (Apple-compatible)."""
     if not input_path or not os.path.exists(input_path):
         T.warning("Input video path is invalid or missing.")
@@ -95,7 +166,7 @@ def compress_video(input_path, target_size_mb=10):
         ffmpeg_cmd = [
             ffmpeg_path, "-y", "-i", input_path,
             "-c:v", "libx265", "-tag:v", "hvc1", "-b:v", f"{int(target_bitrate_kbps)}k",
-            "-c:a", "aac", "-preset", "medium",
+            "-c:a", "aac", "-preset", preset,
             output_path
         ]
 
@@ -117,21 +188,24 @@ def compress_video(input_path, target_size_mb=10):
 def send_daily_summary():
     """Compiles and sends a summary of motion events for the day."""
     from notifications import send_telegram_alert
+    from events import get_store, day_bounds, format_event
     try:
-        with open("motion_log.txt", "r") as f:
-            lines = f.readlines()
+        store = get_store()
+        start, end = day_bounds()
+        count = store.count_between(start, end)
+        recent = store.events_between(start, end, limit=10)
 
         today = datetime.now().strftime("%Y-%m-%d")
-        summary_lines = [
-            line for line in lines if today in line and "Motion detected" in line
-        ]
-
-        if summary_lines:
-            summary = f"📹 Motion Summary for {today} (Last 10 Events):\n" + "".join(
-                summary_lines[-10:]
+        if recent:
+            summary = f"📹 Motion Summary for {today} ({count} events, last {len(recent)}):\n" + "\n".join(
+                format_event(row) for row in reversed(recent)
             )
         else:
             summary = f"📹 No motion detected on {today}."
+        outages = store.outages_between(start, end)
+        if outages:
+            downtime = sum(row["ended_at"] - row["started_at"] for row in outages)
+            summary += f"\n📷 Camera outages: {len(outages)}, {downtime:.0f}s without frames."
 
         send_telegram_alert(summary)
         T.info("Daily summary sent via Telegram.")
@@ -181,7 +255,17 @@ def schedule_daily_summary():
 
 
 def clean_old_clips(folder="./clips", days=7):
-    """Deletes video clips older than a specified number of days."""
+    """
+    Deletes the files of motion events older than a specified number of days.
+
+    Expired events and files come from the event index, so no directory
+    scan is needed. Files already under folder when it was first cleaned
+    (clips from before the index existed, strays) are indexed once by
+    mtime and expire the same way. Index rows themselves are purged after
+    EVENT_RETENTION_DAYS.
+    """
+    from events import get_store, FILE_COLUMNS
+    from config import get_settings
     if not os.path.exists(folder):
         T.error(f"[🧹] Clip folder '{folder}' does not exist. Skipping cleanup.")
         return
@@ -190,12 +274,34 @@ def clean_old_clips(folder="./clips", days=7):
     cutoff = now - (days * 86400)  # 7 days in seconds
     T.info(f"Starting cleanup of clips older than {days} days.")
 
-    for filename in os.listdir(folder):
-        filepath = os.path.join(folder, filename)
-        if os.path.isfile(filepath):
+    store = get_store()
+    added = store.backfill_files(folder)
+    if added:
+        T.info(f"[🧹] Indexed {added} existing files in '{folder}' that no event tracks.")
+    for row in store.expired(cutoff):
+        for column in FILE_COLUMNS:
+            filepath = row[column]
+            if not filepath or not os.path.exists(filepath):
+                continue
             try:
-                if os.path.getmtime(filepath) < cutoff:
-                    os.remove(filepath)
-                    T.info(f"[🧹] Deleted old clip: {filename}")
+                os.remove(filepath)
+                T.info(f"[🧹] Deleted old clip: {os.path.basename(filepath)}")
             except Exception as e:
-                T.error(f"[!] Failed to delete {filename}: {e}")
+                T.error(f"[!] Failed to delete {filepath}: {e}")
+        store.update_event(row["id"], deleted=1)
+
+    gone = []
+    for filepath in store.expired_files(cutoff):
+        try:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+                T.info(f"[🧹] Deleted old untracked clip: {os.path.basename(filepath)}")
+            gone.append(filepath)
+        except Exception as e:
+            T.error(f"[!] Failed to delete {filepath}: {e}")
+    store.forget_files(gone)
+
+    retention_days = get_settings().event_retention_days
+    purged = store.purge(now - retention_days * 86400)
+    if purged:
+        T.info(f"[🧹] Purged {purged} event index rows older than {retention_days} days.")
@@ -0,0 +1,138 @@
+# zones.py
+import json
+import numpy as np
+import cv2
+import tracelog as T
+
+INCLUDE = "include"
+EXCLUDE = "exclude"
+CHANNELS = ("telegram", "email")
+
+
+class Zone:
+    """
+    A named polygon in normalized (0..1) frame coordinates that includes or excludes pixels.
+
+    Include zones may carry their own score threshold (full-resolution
+    units, like MOTION_SCORE; None uses MOTION_SCORE) and the alert
+    channels their events go to (None means all of them).
+    """
+
+    __slots__ = ("name", "kind", "points", "threshold", "notify")
+
+    def __init__(self, name, kind, points, threshold=None, notify=None):
+        if kind not in (INCLUDE, EXCLUDE):
+            raise ValueError(f"Zone '{name}': type must be '{INCLUDE}' or '{EXCLUDE}', not '{kind}'")
+        if len(points) < 3:
+            raise ValueError(f"Zone '{name}': a polygon needs at least 3 points")
+        if any(not (0.0 <= x <= 1.0 and 0.0 <= y <= 1.0) for x, y in points):
+            raise ValueError(f"Zone '{name}': points must be normalized to 0..1")
+        if isinstance(notify, str):
+            notify = [notify]
+        unknown = set(notify or ()) - set(CHANNELS)
+        if unknown:
+            raise ValueError(f"Zone '{name}': unknown alert channel(s) {', '.join(sorted(unknown))}")
+        self.name = name
+        self.kind = kind
+        self.points = tuple((float(x), float(y)) for x, y in points)
+        self.threshold = float(threshold) if threshold is not None else None
+        self.notify = tuple(notify) if notify is not None else None
+
+    def _key(self):
+        return self.name, self.kind, self.points, self.threshold, self.notify
+
+    def __eq__(self, other):
+        return isinstance(other, Zone) and self._key() == other._key()
+
+    def __repr__(self):
+        return f"Zone({self.name!r}, {self.kind!r}, {len(self.points)} points)"
+
+
+def parse_zones(spec):
+    """
+    Parses MOTION_ZONES JSON, e.g.
+    [{"name": "driveway", "type": "include", "points": [[0.1, 0.5], [0.6, 0.5], [0.6, 1], [0.1, 1]],
+      "threshold": 50000, "notify": ["telegram"]}]
+    threshold and notify are optional. Returns [] for an empty spec and
+    logs (rather than raises) on malformed input.
+    """
+    if not spec:
+        return []
+    try:
+        entries = json.loads(spec) if isinstance(spec, str) else spec
+        return [Zone(e.get("name", f"zone{i + 1}"), e.get("type", INCLUDE), e["points"],
+                     e.get("threshold"), e.get("notify"))
+                for i, e in enumerate(entries)]
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        T.error(f"[🗺️] Ignoring invalid MOTION_ZONES: {e}")
+        return []
+
+
+class ZoneMask:
+    """
+    Rasterizes zones once per resolution into a cropped analysis mask.
+
+    roi() gives the bounding rectangle of the analyzed area in full-frame
+    pixels so callers can crop before any per-pixel work; mask() gives the
+    matching uint8 mask at the analysis resolution, or None when every
+    pixel in the rectangle is analyzed. Both are cached until the frame or
+    analysis size changes.
+
+    rects() gives each include zone's bounding rectangle for per-zone
+    scoring, which sums the change map over it from an integral image.
+    """
+
+    def __init__(self, zones):
+        self.zones = list(zones)
+        self._roi_cache = {}
+        self._mask_cache = {}
+        self._rect_cache = {}
+
+    def _full_mask(self, height, width):
+        includes = [z for z in self.zones if z.kind == INCLUDE]
+        mask = np.zeros((height, width), np.uint8) if includes else np.full((height, width), 255, np.uint8)
+        scale = np.array([width - 1, height - 1], dtype=np.float32)
+        for zone in includes + [z for z in self.zones if z.kind == EXCLUDE]:
+            polygon = np.round(np.array(zone.points, dtype=np.float32) * scale).astype(np.int32)
+            cv2.fillPoly(mask, [polygon], 255 if zone.kind == INCLUDE else 0)
+        return mask
+
+    def roi(self, frame_shape):
+        """Returns (x0, y0, x1, y1) bounding the analyzed pixels of a frame of frame_shape."""
+        height, width = frame_shape[:2]
+        key = (height, width)
+        if key not in self._roi_cache:
+            mask = self._full_mask(height, width)
+            x, y, w, h = cv2.boundingRect(mask)
+            if w == 0 or h == 0:
+                T.warning("[🗺️] Zones exclude the whole frame; nothing will be analyzed.")
+                x, y, w, h = 0, 0, width, height
+            self._roi_cache[key] = (x, y, x + w, y + h)
+            T.info(f"[🗺️] Zone mask built for {width}x{height}: analyzing {w}x{h} at ({x}, {y}).")
+        return self._roi_cache[key]
+
+    def mask(self, frame_shape, analysis_shape):
+        """Returns the analysis-resolution mask for the roi() crop, or None if it is all analyzed."""
+        key = (tuple(frame_shape[:2]), tuple(analysis_shape[:2]))
+        if key not in self._mask_cache:
+            x0, y0, x1, y1 = self.roi(frame_shape)
+            crop = self._full_mask(*frame_shape[:2])[y0:y1, x0:x1]
+            small = cv2.resize(crop, (analysis_shape[1], analysis_shape[0]), interpolation=cv2.INTER_NEAREST)
+            self._mask_cache[key] = None if cv2.countNonZero(small) == small.size else small
+        return self._mask_cache[key]
+
+    def rects(self, frame_shape):
+        """Returns [(zone, x0, y0, x1, y1)] for each include zone, in full-frame pixels (end-exclusive)."""
+        key = tuple(frame_shape[:2])
+        if key not in self._rect_cache:
+            height, width = key
+            scale = np.array([width - 1, height - 1], dtype=np.float32)
+            rects = []
+            for zone in self.zones:
+                if zone.kind != INCLUDE:
+                    continue
+                polygon = np.round(np.array(zone.points, dtype=np.float32) * scale).astype(np.int32)
+                x, y, w, h = cv2.boundingRect(polygon)
+                rects.append((zone, x, y, x + w, y + h))
+            self._rect_cache[key] = rects
+        return self._rect_cache[key]